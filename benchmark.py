@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from scrap import EnhancedTCASScraper, ScrapeMetrics, SelectorRegistry
+
+# ใช้วัด RSS ของเบราว์เซอร์ (process ลูก) ด้วย (ไม่บังคับติดตั้ง)
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ไม่มีบน Windows - ใช้เมื่อไม่มี psutil (วัดได้เฉพาะ process นี้)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+UNIVERSITIES = ['จุฬาลงกรณ์มหาวิทยาลัย', 'มหาวิทยาลัยเกษตรศาสตร์', 'มหาวิทยาลัยมหิดล',
+                'มหาวิทยาลัยเชียงใหม่', 'มหาวิทยาลัยขอนแก่น', 'สถาบันเทคโนโลยีพระจอมเกล้าเจ้าคุณทหารลาดกระบัง']
+MAJORS = ['วิศวกรรมคอมพิวเตอร์', 'วิศวกรรมปัญญาประดิษฐ์', 'วิศวกรรมซอฟต์แวร์', 'วิศวกรรมข้อมูล']
+PROGRAM_TYPES = ['ภาษาไทย ปกติ', 'นานาชาติ', 'ภาษาไทย พิเศษ', 'สองภาษา']
+# รูปแบบข้อความค่าใช้จ่ายที่พบบนเว็บจริง (ครอบคลุมทุกหน่วยที่ fee_normalizer รองรับ)
+FEE_TEMPLATES = ['{:,} บาท/ภาคการศึกษา', 'ค่าเล่าเรียน {:,} บาทต่อปี', 'ตลอดหลักสูตร {:,} บาท', 'ภาคเรียนละ {:,} บาท']
+
+class StandInSite:
+    """เว็บจำลอง MyTCAS สำหรับ benchmark: หน้าค้นหา/ผลการค้นหา/รายละเอียด ในโครงสร้างเดียวกับที่ scrap.py ใช้
+    ทุกค่า (ข้อมูล ความหน่วง หน้าที่ตอบผิดพลาด) คำนวณจาก seed จึงได้ผลเหมือนเดิมทุกครั้ง"""
+
+    def __init__(self, programs=50, latency=0.05, jitter=0.02, error_rate=0.0, seed=0):
+        self.programs = programs
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = 0
+        self.errors = 0
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self.url = None
+
+    def _fraction(self, *parts):
+        """ค่า 0-1 ที่กำหนดได้ล่วงหน้าจาก seed และ parts (ไม่ขึ้นกับลำดับของ thread)"""
+        key = ':'.join(str(part) for part in (self.seed,) + parts)
+        return zlib.crc32(key.encode('utf-8')) / 0xFFFFFFFF
+
+    def program(self, i):
+        university = UNIVERSITIES[i % len(UNIVERSITIES)]
+        major = MAJORS[i % len(MAJORS)]
+        fee = 15000 + int(self._fraction('fee', i) * 20) * 5000
+        return {
+            'name': f"{major} (หลักสูตร {i + 1})",
+            'faculty': f"คณะวิศวกรรมศาสตร์ › {major}",
+            'university': university,
+            'type': PROGRAM_TYPES[i % len(PROGRAM_TYPES)],
+            'fee': FEE_TEMPLATES[i % len(FEE_TEMPLATES)].format(fee)
+        }
+
+    def home_page(self):
+        # กด Enter ในช่องค้นหาแล้วไปหน้าผลการค้นหา เหมือนเว็บจริง
+        return ("<html><body><input placeholder='พิมพ์ชื่อมหาวิทยาลัย คณะ หรือหลักสูตร' "
+                "onkeydown=\"if (event.key === 'Enter') { location = '/search?q=' + encodeURIComponent(this.value); }\">"
+                "</body></html>")
+
+    def search_page(self, keyword):
+        items = ''.join(
+            f"<li><a href='/program/{i}'><h3>{info['name']}</h3>"
+            f"<div>{info['faculty']}</div><div>{info['university']}</div></a></li>"
+            for i, info in ((i, self.program(i)) for i in range(self.programs))
+        )
+        return f"<html><body><ul class='t-programs'>{items}</ul></body></html>"
+
+    def detail_page(self, i):
+        info = self.program(i)
+        # สลับสองโครงสร้าง: dt/dd และตารางค่าธรรมเนียม (ทดสอบทั้ง selector หลักและ fallback)
+        if i % 2 == 0:
+            body = (f"<dl><dt>ประเภทหลักสูตร</dt><dd>{info['type']}</dd>"
+                    f"<dt>ค่าใช้จ่าย</dt><dd>{info['fee']}</dd></dl>")
+        else:
+            body = (f"<table class='fee-table'><tr><th>ประเภท</th><td>{info['type']}</td></tr>"
+                    f"<tr><th>ค่าธรรมเนียมการศึกษา</th><td>{info['fee']}</td></tr></table>")
+        return f"<html><body><h1>{info['name']}</h1><p>{info['university']}</p>{body}</body></html>"
+
+    def respond(self, path):
+        """คืน (status, html) ของ path - นับ request และสุ่มข้อผิดพลาดตาม error_rate"""
+        parsed = urlparse(path)
+        with self._lock:
+            self.requests += 1
+            attempt = self._attempts.get(parsed.path, 0)
+            self._attempts[parsed.path] = attempt + 1
+
+        time.sleep(max(0.0, self.latency + self.jitter * (2 * self._fraction('latency', path, attempt) - 1)))
+
+        # ครึ่งหนึ่งเป็น 429 อีกครึ่งเป็น 503 - หน้าหลักไม่ผิดพลาดเพื่อให้การค้นหาเริ่มได้เสมอ
+        failure = self._fraction('error', parsed.path, attempt)
+        if parsed.path != '/' and failure < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return (429 if failure < self.error_rate / 2 else 503), ''
+
+        if parsed.path == '/':
+            return 200, self.home_page()
+        if parsed.path == '/search':
+            return 200, self.search_page(parse_qs(parsed.query).get('q', [''])[0])
+        if parsed.path.startswith('/program/'):
+            i = int(parsed.path.rsplit('/', 1)[1])
+            if i < self.programs:
+                return 200, self.detail_page(i)
+        return 404, 'not found'
+
+    def start(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, html = site.respond(self.path)
+                body = html.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+class PeakRSS:
+    """วัด RSS สูงสุดระหว่าง benchmark - มี psutil จะรวม process ลูก (เบราว์เซอร์) ด้วย"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_bytes = 0
+        self.includes_children = psutil is not None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        process = psutil.Process()
+        while not self._stop.is_set():
+            total = 0
+            for proc in [process] + process.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak_bytes = max(self.peak_bytes, total)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        elif resource is not None:
+            # ru_maxrss เป็น KB บน Linux แต่เป็นไบต์บน macOS
+            scale = 1 if platform.system() == 'Darwin' else 1024
+            self.peak_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        return False
+
+    @property
+    def peak_mb(self):
+        return round(self.peak_bytes / (1024 * 1024), 1)
+
+def page_phase(scraper_options):
+    """ขั้นตอนที่ใช้วัดเวลาต่อหน้า: โหมด HTTP วัดที่ fetch โหมดเบราว์เซอร์วัดทั้งหน้ารายละเอียด"""
+    return 'fetch' if scraper_options.get('http_mode') else 'detail'
+
+async def run_once(site, keywords, scraper_options, verbose=False):
+    """รัน EnhancedTCASScraper หนึ่งรอบกับเว็บจำลอง - คืนผลวัดของรอบนั้น"""
+    scraper = EnhancedTCASScraper(
+        selectors=SelectorRegistry(),
+        metrics=ScrapeMetrics(),
+        headless=True,
+        **scraper_options
+    )
+    scraper.base_url = site.url
+    requests_before = site.requests
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with PeakRSS() as rss, output:
+        started = time.perf_counter()
+        rows = await scraper.run_scraping(keywords)
+        elapsed = time.perf_counter() - started
+
+    histogram = scraper.metrics.histograms.get(page_phase(scraper_options))
+    return {
+        'programs': rows,
+        'elapsed_seconds': round(elapsed, 3),
+        'programs_per_second': round(rows / elapsed, 3) if elapsed > 0 else 0.0,
+        'page_p50_seconds': round(histogram.percentile(0.5), 4) if histogram else None,
+        'page_p95_seconds': round(histogram.percentile(0.95), 4) if histogram else None,
+        'peak_rss_mb': rss.peak_mb,
+        'requests': site.requests - requests_before,
+        'retries': scraper.metrics.count('retries'),
+        'errors': scraper.metrics.count('errors'),
+        'fees_found': sum(1 for row in scraper.programs_data if row['ค่าใช้จ่าย'] != 'ไม่พบข้อมูล')
+    }
+
+def summarize(runs):
+    """ค่ากลาง (median) ของทุกรอบ - ลดผลของรอบที่ช้าผิดปกติ"""
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = statistics.median(values) if values else None
+    return summary
+
+def git_revision():
+    """commit ปัจจุบัน (+dirty ถ้ามีไฟล์ที่ยังไม่ commit) - None ถ้าไม่ใช่ git repo"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}+dirty" if dirty else commit
+
+def previous_result(path, config):
+    """ผลล่าสุดใน path ที่ใช้ config เดียวกัน (ใช้เทียบกับ commit ก่อนหน้า)"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get('config') == config:
+                    previous = record
+    return previous
+
+def print_result(record, previous):
+    result = record['result']
+    print(f"\n📊 Benchmark ({record['revision'] or 'ไม่ทราบ commit'}) - {record['config']['repeat']} รอบ (median)")
+    rows = [
+        ('programs_per_second', 'หลักสูตร/วินาที', True),
+        ('elapsed_seconds', 'เวลารวม (วินาที)', False),
+        ('page_p50_seconds', 'p50 ต่อหน้า (วินาที)', False),
+        ('page_p95_seconds', 'p95 ต่อหน้า (วินาที)', False),
+        ('peak_rss_mb', 'RSS สูงสุด (MB)', False),
+        ('requests', 'request ทั้งหมด', False),
+        ('retries', 'ลองใหม่', False),
+        ('programs', 'หลักสูตรที่ได้', True),
+        ('fees_found', 'มีข้อมูลค่าใช้จ่าย', True)
+    ]
+    for key, label, higher_is_better in rows:
+        value = result[key]
+        line = f"   {label:<22} {value if value is not None else '-':>10}"
+        old = previous['result'].get(key) if previous else None
+        if value is not None and old:
+            change = (value - old) / old * 100
+            better = change > 0 if higher_is_better else change < 0
+            mark = '🟢' if better else ('🔴' if change else '⚪')
+            line += f"   {mark} {change:+.1f}% (เทียบ {previous['revision']})"
+        print(line)
+    if not PeakRSS().includes_children:
+        print("   ⚠️ ไม่พบ psutil - RSS ไม่รวมเบราว์เซอร์")
+
+def parse_args():
+    """อ่านตัวเลือกจาก command line"""
+    parser = argparse.ArgumentParser(description="Benchmark EnhancedTCASScraper กับเว็บจำลองในเครื่อง")
+    parser.add_argument("--programs", type=int, default=50, help="จำนวนหลักสูตรในเว็บจำลอง")
+    parser.add_argument("--latency", type=float, default=0.05, help="ความหน่วงต่อ request ของเว็บจำลอง (วินาที)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="ความหน่วงที่แกว่งได้ ± (วินาที)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="สัดส่วน request ที่ตอบ 429/503 (0-1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed ของข้อมูลและข้อผิดพลาดในเว็บจำลอง")
+    parser.add_argument("--keywords", default="วิศวกรรม คอมพิวเตอร์", help="คำค้น คั่นด้วยจุลภาค")
+    parser.add_argument("--repeat", type=int, default=3, help="จำนวนรอบ (รายงานค่า median)")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="หน่วงเวลาระหว่างหน้าของ scraper (ค่าเริ่มต้น 0 เพื่อวัดเฉพาะตัว scraper)")
+    parser.add_argument("--fast", action="store_true")
+    parser.add_argument("--http", action="store_true")
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--output", default="bench_results.jsonl",
+                        help="ไฟล์เก็บผลทุกครั้ง (ใช้เทียบกับ commit ก่อนหน้าที่ใช้ config เดียวกัน)")
+    parser.add_argument("--verbose", action="store_true", help="แสดง output ของ scraper")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    keywords = [k.strip() for k in args.keywords.split(',') if k.strip()]
+    scraper_options = {
+        'concurrency': args.concurrency,
+        'delay': args.delay,
+        'fast_mode': args.fast,
+        'http_mode': args.http,
+        'pipeline': args.pipeline,
+        'adaptive': args.adaptive
+    }
+    config = {
+        'programs': args.programs,
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'seed': args.seed,
+        'keywords': keywords,
+        'repeat': args.repeat,
+        **scraper_options
+    }
+
+    site = StandInSite(args.programs, args.latency, args.jitter, args.error_rate, args.seed).start()
+    print(f"🧪 เว็บจำลอง: {site.url} ({args.programs} หลักสูตร, หน่วง {args.latency}s, error {args.error_rate:.0%})")
+    runs = []
+    try:
+        for i in range(args.repeat):
+            run = await run_once(site, keywords, scraper_options, verbose=args.verbose)
+            print(f"   รอบ {i + 1}: {run['programs']} หลักสูตร ใน {run['elapsed_seconds']}s "
+                  f"({run['programs_per_second']} หลักสูตร/วินาที)")
+            runs.append(run)
+    finally:
+        site.stop()
+
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'result': summarize(runs),
+        'runs': runs
+    }
+    previous = previous_result(args.output, config)
+    print_result(record, previous)
+
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    print(f"\n💾 บันทึกผล: {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
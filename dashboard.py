@@ -1,18 +1,82 @@
+import os
 import pandas as pd
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash import Patch, dash_table, dcc, html
+from dash.dependencies import Input, Output, State
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+from dash.exceptions import PreventUpdate
+from dashboard_data import (AggregateStore, DataWatcher, DatasetHolder, FILTER_COLUMNS, LRUCache, RANGE_COLUMN,
+                            SEARCH_COLUMNS, SEARCH_FILTER, TableQuery, WATCH_DIR_ENV, WATCH_INTERVAL_ENV, filters_key, open_directory, open_source)
+from snapshot_store import DEFAULT_SNAPSHOT_DB, SNAPSHOT_DB_ENV, SnapshotStore
 
-# โหลดข้อมูลจาก CSV (ปรับ path ให้เหมาะกับเครื่องคุณ)
-df = pd.read_csv(r"D:\Ecosystme\enhanced_tcas_data_20250727_205010.csv", encoding='utf-8')
+# ชุดข้อมูลปัจจุบัน (Parquet/Arrow/CSV) - กำหนดตำแหน่งด้วย TCAS_DATA_PATH หรือ TCAS_WATCH_DIR
+# เปิดเมื่อใช้ครั้งแรก และสลับเป็นชุดใหม่ได้ทันทีเมื่อมีไฟล์ผลลัพธ์ใหม่
+_holder = None
+# ผลสรุป top-N ของทุกคอลัมน์ คำนวณครั้งเดียวต่อ version ของข้อมูล
+_aggregates = None
+# ประวัติค่าใช้จ่ายจาก snapshot_store.py (เปิดเมื่อมีไฟล์ฐานข้อมูล TCAS_SNAPSHOT_DB)
+_snapshots = None
+# แบ่งหน้า/เรียง/กรองตารางฝั่งเซิร์ฟเวอร์ - ส่งไปเบราว์เซอร์เฉพาะแถวของหน้าที่แสดง
+_table_query = TableQuery()
+# จำนวนแถวต่อหน้าของตาราง
+TABLE_PAGE_SIZE = 20
+# เปลี่ยนคอลัมน์ในเบราว์เซอร์จากผลนับที่ส่งไปครั้งเดียวตอนเปิดหน้า (TCAS_CLIENTSIDE=0 กลับไปให้เซิร์ฟเวอร์วาดทุกครั้ง)
+CLIENTSIDE_ENV = 'TCAS_CLIENTSIDE'
+CLIENTSIDE = os.environ.get(CLIENTSIDE_ENV, '1') != '0'
+# id ของ dropdown ตัวกรองแต่ละคอลัมน์ (ลำดับเดียวกับ FILTER_COLUMNS)
+FILTER_IDS = ['filter-university', 'filter-faculty', 'filter-keyword', 'filter-program-type']
+
+def get_holder():
+    global _holder
+    if _holder is None:
+        watch_dir = os.environ.get(WATCH_DIR_ENV)
+        _holder = DatasetHolder(open_directory(watch_dir) if watch_dir else open_source())
+    return _holder
+
+def get_source():
+    """ชุดข้อมูลปัจจุบัน - callback เรียกครั้งเดียวแล้วใช้ชุดนั้นจนจบ"""
+    return get_holder().source
+
+def get_aggregates():
+    global _aggregates
+    if _aggregates is None:
+        _aggregates = AggregateStore(get_holder(), top_n=10)
+    return _aggregates
+
+def get_snapshots():
+    """SnapshotStore ของประวัติค่าใช้จ่าย - ยังไม่เคยนำเข้าข้อมูล (ไม่มีไฟล์) คืน None"""
+    global _snapshots
+    if _snapshots is None:
+        path = os.environ.get(SNAPSHOT_DB_ENV, DEFAULT_SNAPSHOT_DB)
+        if not os.path.exists(path):
+            return None
+        _snapshots = SnapshotStore(path)
+    return _snapshots
+
+def table_columns(source):
+    """คอลัมน์ของ DataTable - คอลัมน์ตัวเลขกรองด้วย >, <, = แบบตัวเลขได้"""
+    dtypes = source.head(1).dtypes
+    return [
+        {'name': column, 'id': column, 'type': 'numeric' if pd.api.types.is_numeric_dtype(dtypes[column]) else 'text'}
+        for column in source.columns
+    ]
+
+def start_watcher():
+    """เริ่มตรวจหาไฟล์ผลลัพธ์ใหม่ของ scrap.py (เมื่อกำหนด TCAS_WATCH_DIR)"""
+    watch_dir = os.environ.get(WATCH_DIR_ENV)
+    if not watch_dir:
+        return None
+    interval = float(os.environ.get(WATCH_INTERVAL_ENV, 5))
+    print(f"👀 ตรวจหาไฟล์ใหม่ใน {watch_dir} ทุก {interval:g} วินาที")
+    return DataWatcher(get_holder(), watch_dir, interval).start()
 
 # สร้าง Dash App
 app = dash.Dash(__name__)
 app.title = "TCAS Cyberpunk Dashboard"
-
-columns = df.columns.tolist()
+# Flask server ของ Dash สำหรับ WSGI server (ดู wsgi.py)
+server = app.server
 
 # Cyberpunk Color Palette
 CYBERPUNK_COLORS = {
@@ -90,141 +154,24 @@ dropdown_style = {
     'fontSize': '14px'
 }
 
-# Layout
-app.layout = html.Div(
-    style=main_bg_style,
-    children=[
-        # Header
-        html.Div([
-            html.H1(
-                "⚡ TCAS CYBER DASHBOARD ⚡", 
-                style=title_style
-            ),
-            html.P(
-                "// DATA VISUALIZATION MATRIX //", 
-                style={
-                    'color': '#000000',
-                    'fontSize': '1.2rem',
-                    'margin': '10px 0 0 0',
-                    'fontFamily': '"Courier New", monospace',
-                    'letterSpacing': '2px',
-                    'fontWeight': 'bold'
-                }
-            )
-        ], style=header_style),
-
-        # Main Content
-        html.Div([
-            # Control Panel
-            html.Div([
-                html.Label(
-                    '>> SELECT DATA COLUMN:', 
-                    style={
-                        'fontWeight': 'bold',
-                        'color': CYBERPUNK_COLORS['neon_green'],
-                        'fontSize': '1.2rem',
-                        'marginBottom': '15px',
-                        'display': 'block',
-                        'textTransform': 'uppercase',
-                        'letterSpacing': '1px',
-                        'textShadow': f'0 0 10px {CYBERPUNK_COLORS["neon_green"]}'
-                    }
-                ),
-                dcc.Dropdown(
-                    id='column-dropdown',
-                    options=[{'label': f'◉ {col}', 'value': col} for col in columns],
-                    value=columns[0],
-                    style=dropdown_style
-                )
-            ], style=get_card_style(CYBERPUNK_COLORS["neon_green"])),
-            
-            # Charts Container
-            html.Div([
-                # Bar Chart
-                html.Div([
-                    html.H3("📊 BAR CHART", style={
-                        'color': CYBERPUNK_COLORS['neon_cyan'],
-                        'textAlign': 'center',
-                        'marginBottom': '20px',
-                        'textShadow': f'0 0 10px {CYBERPUNK_COLORS["neon_cyan"]}'
-                    }),
-                    dcc.Graph(id='bar-chart', style={'backgroundColor': 'transparent'})
-                ], style={**get_card_style(CYBERPUNK_COLORS["neon_cyan"]), 'width': '48%', 'display': 'inline-block'}),
-
-                # Pie Chart
-                html.Div([
-                    html.H3("🥧 PIE CHART", style={
-                        'color': CYBERPUNK_COLORS['neon_pink'],
-                        'textAlign': 'center',
-                        'marginBottom': '20px',
-                        'textShadow': f'0 0 10px {CYBERPUNK_COLORS["neon_pink"]}'
-                    }),
-                    dcc.Graph(id='pie-chart', style={'backgroundColor': 'transparent'})
-                ], style={**get_card_style(CYBERPUNK_COLORS["neon_pink"]), 'width': '48%', 'display': 'inline-block', 'marginLeft': '2%'}),
-            ]),
-
-            # Data Table
-            html.Div([
-                html.H3(
-                    "⚡ DATA MATRIX PREVIEW ⚡", 
-                    style={
-                        'marginBottom': '20px',
-                        'color': CYBERPUNK_COLORS['neon_purple'],
-                        'textAlign': 'center',
-                        'fontSize': '1.5rem',
-                        'textTransform': 'uppercase',
-                        'letterSpacing': '2px',
-                        'textShadow': f'0 0 15px {CYBERPUNK_COLORS["neon_purple"]}'
-                    }
-                ),
-                html.Div(id='data-table', style={'overflowX': 'auto'})
-            ], style=get_card_style(CYBERPUNK_COLORS["neon_purple"])),
-        ], style={'maxWidth': '1400px', 'margin': '0 auto'})
-    ]
-)
-
-# Callback สำหรับอัปเดตกราฟและตาราง
-@app.callback(
-    [Output('bar-chart', 'figure'),
-     Output('pie-chart', 'figure'),
-     Output('data-table', 'children')],
-    [Input('column-dropdown', 'value')]
-)
-def update_dashboard(selected_column):
-    value_counts = df[selected_column].value_counts().nlargest(10)
-
-    # Cyberpunk color sequence
-    cyber_colors = [
-        CYBERPUNK_COLORS['neon_cyan'], 
-        CYBERPUNK_COLORS['neon_pink'], 
-        CYBERPUNK_COLORS['neon_purple'], 
-        CYBERPUNK_COLORS['neon_green'],
-        CYBERPUNK_COLORS['neon_orange'],
-        '#ff1493',  # Deep pink
-        '#00ff7f',  # Spring green
-        '#ff4500',  # Orange red
-        '#9400d3',  # Violet
-        '#00bfff'   # Deep sky blue
-    ]
+# Cyberpunk color sequence (สีของแท่ง/ชิ้นพายตามลำดับ)
+CYBER_COLORS = [
+    CYBERPUNK_COLORS['neon_cyan'], 
+    CYBERPUNK_COLORS['neon_pink'], 
+    CYBERPUNK_COLORS['neon_purple'], 
+    CYBERPUNK_COLORS['neon_green'],
+    CYBERPUNK_COLORS['neon_orange'],
+    '#ff1493',  # Deep pink
+    '#00ff7f',  # Spring green
+    '#ff4500',  # Orange red
+    '#9400d3',  # Violet
+    '#00bfff'   # Deep sky blue
+]
 
-    # Bar Chart with Enhanced Cyberpunk styling
-    bar_fig = go.Figure()
-    
-    for i, (category, count) in enumerate(value_counts.items()):
-        bar_fig.add_trace(go.Bar(
-            x=[category],
-            y=[count],
-            name=str(category),
-            marker=dict(
-                color=cyber_colors[i % len(cyber_colors)],
-                line=dict(color='white', width=2)
-            ),
-            hovertemplate=f'<b>{category}</b><br>Count: {count}<extra></extra>'
-        ))
-    
-    bar_fig.update_layout(
+# Plotly template แบบ Cyberpunk - สไตล์ทั้งหมดอยู่ที่นี่ ส่งไปเบราว์เซอร์ครั้งเดียวพร้อม layout
+pio.templates['cyberpunk'] = go.layout.Template(
+    layout=dict(
         title=dict(
-            text=f'⚡ DATA COUNT: {selected_column.upper()} ⚡',
             font=dict(
                 color='white', 
                 size=20, 
@@ -241,7 +188,6 @@ def update_dashboard(selected_column):
         xaxis=dict(
             gridcolor='rgba(0,255,255,0.3)',
             title=dict(
-                text=selected_column.upper(), 
                 font=dict(
                     color=CYBERPUNK_COLORS['neon_green'],
                     family="Courier New",
@@ -253,7 +199,6 @@ def update_dashboard(selected_column):
         yaxis=dict(
             gridcolor='rgba(255,0,128,0.3)',
             title=dict(
-                text='COUNT', 
                 font=dict(
                     color=CYBERPUNK_COLORS['neon_pink'],
                     family="Courier New",
@@ -262,19 +207,15 @@ def update_dashboard(selected_column):
             ),
             tickfont=dict(color='white', size=12)
         ),
-        margin=dict(l=60, r=40, t=80, b=60),
         showlegend=False
-    )
-
-    # Pie Chart with Enhanced Cyberpunk styling
-    pie_fig = go.Figure(data=[
-        go.Pie(
-            labels=value_counts.index,
-            values=value_counts.values,
-            marker=dict(
-                colors=cyber_colors[:len(value_counts)],
-                line=dict(color='white', width=3)
-            ),
+    ),
+    data=dict(
+        bar=[go.Bar(
+            marker=dict(line=dict(color='white', width=2)),
+            hovertemplate='<b>%{x}</b><br>Count: %{y}<extra></extra>'
+        )],
+        pie=[go.Pie(
+            marker=dict(line=dict(color='white', width=3)),
             hovertemplate='<b>%{label}</b><br>Value: %{value}<br>Percent: %{percent}<extra></extra>',
             textfont=dict(
                 color='white', 
@@ -282,78 +223,527 @@ def update_dashboard(selected_column):
                 size=12
             ),
             textinfo='label+percent'
+        )]
+    )
+)
+
+# กราฟเริ่มต้น (ยังไม่มีข้อมูล) - callback ส่งแค่ Patch ของ x/y/labels/values และชื่อคอลัมน์มาเติม
+def base_bar_figure():
+    return go.Figure(
+        data=[go.Bar(x=[], y=[])],
+        layout=dict(
+            template='cyberpunk',
+            title=dict(text='⚡ DATA COUNT ⚡'),
+            xaxis=dict(type='category'),
+            yaxis=dict(title=dict(text='COUNT')),
+            margin=dict(l=60, r=40, t=80, b=60)
         )
-    ])
+    )
+
+def base_pie_figure():
+    return go.Figure(
+        data=[go.Pie(labels=[], values=[])],
+        layout=dict(
+            template='cyberpunk',
+            title=dict(text='⚡ DATA DISTRIBUTION ⚡'),
+            showlegend=True,
+            margin=dict(l=40, r=40, t=80, b=40)
+        )
+    )
+
+def base_trend_figure():
+    return go.Figure(
+        layout=dict(
+            template='cyberpunk',
+            title=dict(text='⚡ FEE TREND ⚡'),
+            xaxis=dict(title=dict(text='DATE')),
+            yaxis=dict(title=dict(text='บาท/ปี')),
+            showlegend=True,
+            margin=dict(l=60, r=40, t=80, b=60)
+        )
+    )
+
+# ค่าที่ต้องส่งของแต่ละคอลัมน์ (list ที่พร้อมแปลงเป็น JSON) เก็บตาม (คอลัมน์, version ของข้อมูล)
+_figure_cache = LRUCache(256)
+
+def figure_payload(column, source, filters=None):
+    def build():
+        value_counts = get_aggregates().top_counts(column, filters, source=source)
+        labels = [str(label) for label in value_counts.index]
+        return {
+            'labels': labels,
+            'values': value_counts.tolist(),
+            'colors': [CYBER_COLORS[i % len(CYBER_COLORS)] for i in range(len(labels))]
+        }
+    return _figure_cache.get_or_compute((column, source.version, filters_key(filters)), build)
+
+def counts_payload(source, filters=None):
+    """ผล top-N ของทุกคอลัมน์แบบย่อสำหรับโหมด clientside: {version, colors, columns: {คอลัมน์: [labels, values]}}"""
+    columns = {}
+    for column in source.columns:
+        payload = figure_payload(column, source, filters)
+        columns[column] = [payload['labels'], payload['values']]
+    return {'version': source.version, 'colors': CYBER_COLORS, 'columns': columns}
+
+def current_filters(filter_values):
+    """ตัวกรองจากค่าของ FILTER_INPUTS (dropdown แต่ละคอลัมน์, range slider, ช่องค้นหา)
+    ช่วงเต็มของ slider ถือว่าไม่กรองราคา"""
+    *selections, fee_range, search = filter_values
+    filters = {column: values for column, values in zip(FILTER_COLUMNS, selections) if values}
+    bounds = get_aggregates().filter_index().range_bounds()
+    if fee_range and bounds and (fee_range[0] > bounds[0] or fee_range[1] < bounds[1]):
+        filters[RANGE_COLUMN] = (fee_range[0], fee_range[1])
+    if search and search.strip():
+        filters[SEARCH_FILTER] = search.strip()
+    return filters
+
+def filter_panel():
+    """dropdown เลือกได้หลายค่าของแต่ละคอลัมน์ใน FILTER_COLUMNS และ slider ช่วงค่าใช้จ่ายต่อปี"""
+    index = get_aggregates().filter_index()
+    label_style = {
+        'color': CYBERPUNK_COLORS['neon_cyan'],
+        'fontWeight': 'bold',
+        'display': 'block',
+        'margin': '10px 0 5px 0',
+        'textTransform': 'uppercase'
+    }
+    dropdowns = []
+    for column, component_id in zip(FILTER_COLUMNS, FILTER_IDS):
+        dropdowns.append(html.Div([
+            html.Label(f'>> {column}', style=label_style),
+            dcc.Dropdown(
+                id=component_id,
+                options=[{'label': f'{value} ({count})', 'value': value} for value, count in index.options(column)],
+                value=[],
+                multi=True,
+                placeholder='ทั้งหมด',
+                style=dropdown_style
+            )
+        ], style={'width': '48%', 'display': 'inline-block', 'verticalAlign': 'top', 'marginRight': '2%'}))
     
-    pie_fig.update_layout(
-        title=dict(
-            text=f'⚡ DATA DISTRIBUTION: {selected_column.upper()} ⚡',
-            font=dict(
-                color='white', 
-                size=20, 
-                family="Courier New"
-            ),
-            x=0.5
+    low, high = index.range_bounds() or (0, 0)
+    return html.Div([
+        html.Label('>> SEARCH', style=label_style),
+        dcc.Input(
+            id='search-input',
+            type='search',
+            value='',
+            debounce=True,
+            placeholder=f'ค้นหา{" / ".join(SEARCH_COLUMNS)} (พิมพ์บางส่วนหรือสะกดผิดเล็กน้อยได้)',
+            style={**dropdown_style, 'width': '96%', 'marginBottom': '10px'}
         ),
-        plot_bgcolor='rgba(10,10,10,0.8)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(
-            color='white', 
-            family="Courier New"
+        *dropdowns,
+        html.Label(f'>> {RANGE_COLUMN} (บาท)', style=label_style),
+        dcc.RangeSlider(
+            id='filter-fee',
+            min=low,
+            max=high,
+            value=[low, high],
+            step=500,
+            marks=None,
+            disabled=low == high,
+            tooltip={'placement': 'bottom', 'always_visible': True}
         ),
-        margin=dict(l=40, r=40, t=80, b=40)
-    )
+        html.Div(id='filter-summary', style={'color': CYBERPUNK_COLORS['neon_green'], 'marginTop': '25px'})
+    ])
 
-    # สร้างตารางข้อมูล 10 แถวแรก แบบ Cyberpunk สุดเข้ม
-    table_rows = []
-    for i in range(min(len(df), 10)):
-        row_cells = []
-        for col in df.columns:
-            cell_style = {
-                'padding': '15px',
-                'border': f'1px solid {CYBERPUNK_COLORS["neon_cyan"]}',
-                'backgroundColor': f'rgba(22, 22, 50, {0.8 if i % 2 == 0 else 0.6})',
+def trend_panel():
+    """เลือกหลักสูตรเพื่อดูค่าใช้จ่ายตามเวลา และตารางหลักสูตรที่ค่าใช้จ่ายเปลี่ยนตั้งแต่วันที่เลือก"""
+    store = get_snapshots()
+    programs = store.programs() if store is not None else pd.DataFrame(columns=['url', 'name', 'university'])
+    runs = store.runs() if store is not None else pd.DataFrame(columns=['scraped_at'])
+    last_run = pd.Timestamp(runs['scraped_at'].iloc[-1]) if len(runs) else pd.Timestamp.now()
+    
+    message = (
+        f'◉ {len(programs):,} PROGRAMS / {len(runs):,} RUNS'
+        if store is not None else
+        '◉ ยังไม่มีประวัติ - นำเข้าด้วย python snapshot_store.py ingest enhanced_tcas_data_*.csv'
+    )
+    return html.Div([
+        html.Div(message, style={'color': CYBERPUNK_COLORS['neon_green'], 'marginBottom': '15px'}),
+        dcc.Dropdown(
+            id='trend-program',
+            options=[
+                {'label': f'{row.name} — {row.university}', 'value': row.url}
+                for row in programs.itertuples(index=False)
+            ],
+            value=[],
+            multi=True,
+            placeholder='เลือกหลักสูตร (หลายหลักสูตรเพื่อเปรียบเทียบ)',
+            style=dropdown_style
+        ),
+        dcc.Graph(id='trend-chart', figure=base_trend_figure(), style={'backgroundColor': 'transparent'}),
+        html.Label('>> FEE CHANGED SINCE:', style={
+            'color': CYBERPUNK_COLORS['neon_pink'],
+            'fontWeight': 'bold',
+            'marginRight': '15px'
+        }),
+        dcc.DatePickerSingle(
+            id='trend-since',
+            date=(last_run - pd.Timedelta(days=30)).date().isoformat(),
+            display_format='YYYY-MM-DD'
+        ),
+        dash_table.DataTable(
+            id='trend-changes',
+            columns=[
+                {'name': 'วันที่', 'id': 'valid_from'},
+                {'name': 'หลักสูตร', 'id': 'name'},
+                {'name': 'มหาวิทยาลัย', 'id': 'university'},
+                {'name': 'ค่าใช้จ่ายเดิม', 'id': 'previous_fee'},
+                {'name': 'ค่าใช้จ่ายใหม่', 'id': 'fee'},
+                {'name': 'ต่อปี (เดิม)', 'id': 'previous_fee_annual', 'type': 'numeric'},
+                {'name': 'ต่อปี (ใหม่)', 'id': 'fee_annual', 'type': 'numeric'}
+            ],
+            data=[],
+            page_size=10,
+            sort_action='native',
+            style_table={'overflowX': 'auto', 'marginTop': '15px'},
+            style_header={
+                'backgroundColor': CYBERPUNK_COLORS['neon_pink'],
+                'color': 'black',
+                'fontWeight': 'bold',
+                'fontFamily': '"Courier New", monospace'
+            },
+            style_cell={
+                'backgroundColor': 'rgba(22, 22, 50, 0.8)',
                 'color': 'white',
+                'border': f'1px solid {CYBERPUNK_COLORS["neon_pink"]}',
                 'fontFamily': '"Courier New", monospace',
-                'textAlign': 'center',
+                'textAlign': 'left',
                 'fontSize': '13px'
             }
-            row_cells.append(html.Td(str(df.iloc[i][col]), style=cell_style))
-        table_rows.append(html.Tr(row_cells))
-
-    table_html = html.Table([
-        html.Thead(
-            html.Tr([
-                html.Th(
-                    f'◉ {col}', 
+        )
+    ])
+
+# Layout - สร้างเมื่อมีผู้เปิดหน้าเว็บ อ่านแค่ชื่อคอลัมน์จาก schema ไม่ต้องโหลดข้อมูลตอนเริ่มเซิร์ฟเวอร์
+def serve_layout():
+    source = get_source()
+    columns = source.columns
+    return html.Div(
+        style=main_bg_style,
+        children=[
+            # Header
+            html.Div([
+                html.H1(
+                    "⚡ TCAS CYBER DASHBOARD ⚡", 
+                    style=title_style
+                ),
+                html.P(
+                    "// DATA VISUALIZATION MATRIX //", 
                     style={
-                        'padding': '20px',
-                        'background': f'linear-gradient(45deg, {CYBERPUNK_COLORS["neon_cyan"]}, {CYBERPUNK_COLORS["neon_purple"]})',
-                        'color': 'black',
-                        'fontWeight': 'bold',
-                        'textAlign': 'center',
+                        'color': '#000000',
+                        'fontSize': '1.2rem',
+                        'margin': '10px 0 0 0',
                         'fontFamily': '"Courier New", monospace',
-                        'textTransform': 'uppercase',
-                        'letterSpacing': '1px',
-                        'border': f'2px solid {CYBERPUNK_COLORS["neon_cyan"]}',
-                        'fontSize': '14px'
+                        'letterSpacing': '2px',
+                        'fontWeight': 'bold'
                     }
-                ) for col in df.columns
-            ])
-        ),
-        html.Tbody(table_rows)
-    ], 
-    style={
-        'width': '100%',
-        'borderCollapse': 'collapse',
-        'border': f'3px solid {CYBERPUNK_COLORS["neon_cyan"]}',
-        'borderRadius': '10px',
-        'overflow': 'hidden',
-        'boxShadow': f'0 0 20px {CYBERPUNK_COLORS["neon_cyan"]}50'
-    })
+                )
+            ], style=header_style),
+
+            # Main Content
+            html.Div([
+                # Control Panel
+                html.Div([
+                    html.Label(
+                        '>> SELECT DATA COLUMN:', 
+                        style={
+                            'fontWeight': 'bold',
+                            'color': CYBERPUNK_COLORS['neon_green'],
+                            'fontSize': '1.2rem',
+                            'marginBottom': '15px',
+                            'display': 'block',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '1px',
+                            'textShadow': f'0 0 10px {CYBERPUNK_COLORS["neon_green"]}'
+                        }
+                    ),
+                    dcc.Dropdown(
+                        id='column-dropdown',
+                        options=[{'label': f'◉ {col}', 'value': col} for col in columns],
+                        value=columns[0] if columns else None,
+                        style=dropdown_style
+                    ),
+                    dcc.Store(id='counts-store', data=counts_payload(source) if CLIENTSIDE else None)
+                ], style=get_card_style(CYBERPUNK_COLORS["neon_green"])),
+
+                # Filters - ทุกกราฟและตารางแสดงเฉพาะแถวที่ผ่านตัวกรอง
+                html.Div([
+                    html.Label(
+                        '>> FILTER MATRIX:', 
+                        style={
+                            'fontWeight': 'bold',
+                            'color': CYBERPUNK_COLORS['neon_orange'],
+                            'fontSize': '1.2rem',
+                            'display': 'block',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '1px',
+                            'textShadow': f'0 0 10px {CYBERPUNK_COLORS["neon_orange"]}'
+                        }
+                    ),
+                    filter_panel()
+                ], style=get_card_style(CYBERPUNK_COLORS["neon_orange"])),
+                
+                # Charts Container
+                html.Div([
+                    # Bar Chart
+                    html.Div([
+                        html.H3("📊 BAR CHART", style={
+                            'color': CYBERPUNK_COLORS['neon_cyan'],
+                            'textAlign': 'center',
+                            'marginBottom': '20px',
+                            'textShadow': f'0 0 10px {CYBERPUNK_COLORS["neon_cyan"]}'
+                        }),
+                        dcc.Graph(id='bar-chart', figure=base_bar_figure(), style={'backgroundColor': 'transparent'})
+                    ], style={**get_card_style(CYBERPUNK_COLORS["neon_cyan"]), 'width': '48%', 'display': 'inline-block'}),
+
+                    # Pie Chart
+                    html.Div([
+                        html.H3("🥧 PIE CHART", style={
+                            'color': CYBERPUNK_COLORS['neon_pink'],
+                            'textAlign': 'center',
+                            'marginBottom': '20px',
+                            'textShadow': f'0 0 10px {CYBERPUNK_COLORS["neon_pink"]}'
+                        }),
+                        dcc.Graph(id='pie-chart', figure=base_pie_figure(), style={'backgroundColor': 'transparent'})
+                    ], style={**get_card_style(CYBERPUNK_COLORS["neon_pink"]), 'width': '48%', 'display': 'inline-block', 'marginLeft': '2%'}),
+                ]),
+
+                # Data Table
+                html.Div([
+                    html.H3(
+                        "⚡ DATA MATRIX PREVIEW ⚡", 
+                        style={
+                            'marginBottom': '20px',
+                            'color': CYBERPUNK_COLORS['neon_purple'],
+                            'textAlign': 'center',
+                            'fontSize': '1.5rem',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '2px',
+                            'textShadow': f'0 0 15px {CYBERPUNK_COLORS["neon_purple"]}'
+                        }
+                    ),
+                    dash_table.DataTable(
+                        id='data-table',
+                        columns=table_columns(source),
+                        data=[],
+                        page_current=0,
+                        page_size=TABLE_PAGE_SIZE,
+                        page_action='custom',
+                        sort_action='custom',
+                        sort_mode='multi',
+                        sort_by=[],
+                        filter_action='custom',
+                        filter_query='',
+                        style_table={'overflowX': 'auto'},
+                        style_header={
+                            'background': f'linear-gradient(45deg, {CYBERPUNK_COLORS["neon_cyan"]}, {CYBERPUNK_COLORS["neon_purple"]})',
+                            'color': 'black',
+                            'fontWeight': 'bold',
+                            'textAlign': 'center',
+                            'fontFamily': '"Courier New", monospace',
+                            'textTransform': 'uppercase',
+                            'border': f'2px solid {CYBERPUNK_COLORS["neon_cyan"]}'
+                        },
+                        style_filter={
+                            'backgroundColor': CYBERPUNK_COLORS['secondary_bg'],
+                            'color': CYBERPUNK_COLORS['neon_green'],
+                            'border': f'1px solid {CYBERPUNK_COLORS["neon_cyan"]}'
+                        },
+                        style_cell={
+                            'padding': '10px',
+                            'border': f'1px solid {CYBERPUNK_COLORS["neon_cyan"]}',
+                            'backgroundColor': 'rgba(22, 22, 50, 0.8)',
+                            'color': 'white',
+                            'fontFamily': '"Courier New", monospace',
+                            'textAlign': 'center',
+                            'fontSize': '13px',
+                            'maxWidth': '320px',
+                            'overflow': 'hidden',
+                            'textOverflow': 'ellipsis'
+                        },
+                        style_data_conditional=[
+                            {'if': {'row_index': 'odd'}, 'backgroundColor': 'rgba(22, 22, 50, 0.6)'}
+                        ]
+                    )
+                ], style=get_card_style(CYBERPUNK_COLORS["neon_purple"])),
+
+                # Fee Trend - ประวัติค่าใช้จ่ายจาก snapshot_store.py
+                html.Div([
+                    html.H3(
+                        "⚡ FEE TREND MATRIX ⚡", 
+                        style={
+                            'marginBottom': '20px',
+                            'color': CYBERPUNK_COLORS['neon_pink'],
+                            'textAlign': 'center',
+                            'fontSize': '1.5rem',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '2px',
+                            'textShadow': f'0 0 15px {CYBERPUNK_COLORS["neon_pink"]}'
+                        }
+                    ),
+                    trend_panel()
+                ], style=get_card_style(CYBERPUNK_COLORS["neon_pink"])),
+            ], style={'maxWidth': '1400px', 'margin': '0 auto'})
+        ]
+    )
+
+app.layout = serve_layout
+
+# Callback สำหรับอัปเดตกราฟ (โหมดเซิร์ฟเวอร์)
+def update_dashboard(selected_column, *filter_values):
+    source = get_source()
+    if not selected_column or selected_column not in source.columns:
+        raise PreventUpdate
+    
+    # ไม่มีตัวกรองใช้ top-10 ที่คำนวณไว้แล้วตอนโหลดข้อมูล มีตัวกรอง/คำค้นนับจาก bitmap index
+    filters = current_filters(filter_values)
+    payload = figure_payload(selected_column, source, filters)
+
+    # ส่งเฉพาะส่วนที่เปลี่ยน - สไตล์อยู่ใน template ของกราฟเริ่มต้นแล้ว
+    bar_fig = Patch()
+    bar_fig['data'][0]['x'] = payload['labels']
+    bar_fig['data'][0]['y'] = payload['values']
+    bar_fig['data'][0]['marker']['color'] = payload['colors']
+    bar_fig['layout']['title']['text'] = f'⚡ DATA COUNT: {selected_column.upper()} ⚡'
+    bar_fig['layout']['xaxis']['title']['text'] = selected_column.upper()
+
+    pie_fig = Patch()
+    pie_fig['data'][0]['labels'] = payload['labels']
+    pie_fig['data'][0]['values'] = payload['values']
+    pie_fig['data'][0]['marker']['colors'] = payload['colors']
+    pie_fig['layout']['title']['text'] = f'⚡ DATA DISTRIBUTION: {selected_column.upper()} ⚡'
+
+    return bar_fig, pie_fig
+
+# โหมด clientside: วาดกราฟใหม่ในเบราว์เซอร์จาก counts-store ไม่ต้องเรียกเซิร์ฟเวอร์
+UPDATE_FIGURES_JS = """
+function(column, counts, barFigure, pieFigure) {
+    if (!column || !counts || !counts.columns[column]) {
+        return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+    }
+    const [labels, values] = counts.columns[column];
+    const colors = labels.map((_, i) => counts.colors[i % counts.colors.length]);
+    const title = column.toUpperCase();
+
+    const bar = {...barFigure, layout: {...barFigure.layout}};
+    bar.data = [{...barFigure.data[0], x: labels, y: values, marker: {...barFigure.data[0].marker, color: colors}}];
+    bar.layout.title = {...bar.layout.title, text: `⚡ DATA COUNT: ${title} ⚡`};
+    bar.layout.xaxis = {...bar.layout.xaxis, title: {...(bar.layout.xaxis || {}).title, text: title}};
+
+    const pie = {...pieFigure, layout: {...pieFigure.layout}};
+    pie.data = [{...pieFigure.data[0], labels: labels, values: values, marker: {...pieFigure.data[0].marker, colors: colors}}];
+    pie.layout.title = {...pie.layout.title, text: `⚡ DATA DISTRIBUTION: ${title} ⚡`};
+    return [bar, pie];
+}
+"""
+
+FILTER_INPUTS = ([Input(component_id, 'value') for component_id in FILTER_IDS]
+                 + [Input('filter-fee', 'value'), Input('search-input', 'value')])
+
+if CLIENTSIDE:
+    # ตัวกรองเปลี่ยน: เซิร์ฟเวอร์ส่งผลนับชุดใหม่ของทุกคอลัมน์มาครั้งเดียว แล้วเปลี่ยนคอลัมน์ในเบราว์เซอร์ได้เหมือนเดิม
+    @app.callback(
+        Output('counts-store', 'data'),
+        FILTER_INPUTS,
+        prevent_initial_call=True
+    )
+    def update_counts(*filter_values):
+        return counts_payload(get_source(), current_filters(filter_values))
 
-    return bar_fig, pie_fig, table_html
+    app.clientside_callback(
+        UPDATE_FIGURES_JS,
+        [Output('bar-chart', 'figure'),
+         Output('pie-chart', 'figure')],
+        [Input('column-dropdown', 'value'),
+         Input('counts-store', 'data')],
+        [State('bar-chart', 'figure'),
+         State('pie-chart', 'figure')]
+    )
+else:
+    app.callback(
+        [Output('bar-chart', 'figure'),
+         Output('pie-chart', 'figure')],
+        [Input('column-dropdown', 'value')] + FILTER_INPUTS
+    )(update_dashboard)
+
+# Callback สำหรับตาราง: ดึงเฉพาะหน้าที่แสดงจากข้อมูลทั้งชุด (มีคำค้นเรียงตามคะแนนการค้นหา)
+@app.callback(
+    [Output('data-table', 'data'),
+     Output('data-table', 'page_count'),
+     Output('filter-summary', 'children')],
+    [Input('data-table', 'page_current'),
+     Input('data-table', 'page_size'),
+     Input('data-table', 'sort_by'),
+     Input('data-table', 'filter_query')] + FILTER_INPUTS
+)
+def update_table(page_current, page_size, sort_by, filter_query, *filter_values):
+    source = get_source()
+    index = get_aggregates().filter_index(source)
+    filters = current_filters(filter_values)
+    rows, total = _table_query.page(source, page_current, page_size, sort_by, filter_query, filters, index)
+    # total รวมตัวกรองของตาราง (filter_query) แล้ว - กราฟใช้เฉพาะตัวกรองของแดชบอร์ด จึงแสดงแยกเมื่อต่างกัน
+    summary = f'◉ MATCHED {total:,} / {index.rows:,} ROWS'
+    if filter_query:
+        summary += f' · CHARTS {index.count(filters):,} (NO TABLE FILTER)'
+    return rows, max(1, -(-total // page_size)), summary
+
+# ตัวกรองเปลี่ยนแล้วกลับไปหน้าแรกของตาราง
+@app.callback(
+    Output('data-table', 'page_current'),
+    FILTER_INPUTS + [Input('data-table', 'filter_query')],
+    prevent_initial_call=True
+)
+def reset_table_page(*_):
+    return 0
+
+# Callback สำหรับกราฟค่าใช้จ่ายตามเวลา: อ่านเฉพาะจุดที่ค่าใช้จ่ายเปลี่ยนของหลักสูตรที่เลือก
+@app.callback(
+    Output('trend-chart', 'figure'),
+    [Input('trend-program', 'value')],
+    prevent_initial_call=True
+)
+def update_trend(urls):
+    store = get_snapshots()
+    figure = base_trend_figure()
+    if store is None or not urls:
+        return figure
+    
+    last_run = store.runs()['scraped_at'].iloc[-1]
+    for i, url in enumerate(urls):
+        history = store.fee_history(url)
+        if len(history) == 0:
+            continue
+        # ลากเส้นค่าล่าสุดไปถึงรอบล่าสุด (เก็บเฉพาะจุดที่เปลี่ยน)
+        x = history['valid_from'].tolist() + [last_run]
+        y = history['fee_annual'].tolist() + [history['fee_annual'].iloc[-1]]
+        text = history['fee'].tolist() + [history['fee'].iloc[-1]]
+        figure.add_trace(go.Scatter(
+            x=x,
+            y=y,
+            text=text,
+            name=f"{history['name'].iloc[-1]} — {history['university'].iloc[-1]}",
+            mode='lines+markers',
+            line=dict(shape='hv', color=CYBER_COLORS[i % len(CYBER_COLORS)], width=3),
+            hovertemplate='<b>%{x}</b><br>%{y:,.0f} บาท/ปี<br>%{text}<extra></extra>'
+        ))
+    return figure
+
+# Callback สำหรับตารางหลักสูตรที่ค่าใช้จ่ายเปลี่ยน
+@app.callback(
+    Output('trend-changes', 'data'),
+    [Input('trend-since', 'date')]
+)
+def update_fee_changes(since):
+    store = get_snapshots()
+    if store is None or not since:
+        return []
+    changes = store.fee_changes_since(since)
+    return changes.astype('object').where(changes.notna(), None).to_dict('records')
 
 # รันแอป
 if __name__ == '__main__':
+    # debug mode รันไฟล์นี้สองรอบ (ตัว reloader และตัวเซิร์ฟเวอร์) - เริ่ม watcher เฉพาะในตัวเซิร์ฟเวอร์
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_watcher()
     app.run(debug=True, port=8051)  # เปลี่ยน port เพื่อ clear cache
\ No newline at end of file
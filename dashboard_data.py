@@ -0,0 +1,1087 @@
+import glob
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from fee_normalizer import FEE_ANNUAL, FEE_CONFIDENCE, FEE_UNIT
+
+# ใช้อ่าน Parquet/Arrow แบบ memory-map (ไม่บังคับติดตั้ง - ไม่มีจะอ่านได้เฉพาะ CSV)
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    feather = None
+    pq = None
+
+# ตัดคำภาษาไทยสำหรับการค้นหา (ไม่บังคับติดตั้ง - ไม่มีจะแยกคำด้วยช่องว่างและใช้ n-gram ตัวอักษรอย่างเดียว)
+try:
+    from pythainlp.tokenize import word_tokenize
+except ImportError:
+    word_tokenize = None
+
+# ล็อกไฟล์ตอนสร้างไฟล์ข้อมูลร่วม (ไม่มีบน Windows - ใช้ --preload แทน)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ตั้งค่าผ่าน environment variable
+DATA_PATH_ENV = 'TCAS_DATA_PATH'      # ไฟล์ .parquet/.arrow/.feather/.csv หรือโฟลเดอร์ Parquet
+MEMORY_MAP_ENV = 'TCAS_MEMORY_MAP'    # 0 = อ่านเข้าหน่วยความจำทั้งหมด ไม่ใช้ memory-map
+WATCH_DIR_ENV = 'TCAS_WATCH_DIR'      # โฟลเดอร์ที่ scrap.py บันทึกผล - เพิ่มไฟล์ใหม่เข้าแดชบอร์ดอัตโนมัติ
+WATCH_INTERVAL_ENV = 'TCAS_WATCH_INTERVAL'  # ตรวจหาไฟล์ใหม่ทุกกี่วินาที (ค่าเริ่มต้น 5)
+SHARED_PATH_ENV = 'TCAS_SHARED_PATH'  # ไฟล์ Arrow ที่ทุก worker ของ wsgi.py memory-map ร่วมกัน
+
+# ค่าเริ่มต้น: โฟลเดอร์ Parquet ของ scrap.py หรือ CSV ล่าสุดในโฟลเดอร์ปัจจุบัน
+DEFAULT_PARQUET_DIR = 'tcas_parquet'
+CSV_PATTERN = 'enhanced_tcas_data_*.csv'
+# ไฟล์ผลลัพธ์ของ scrap.py ทุกชนิดที่แดชบอร์ดอ่านได้ (ค้นหาในโฟลเดอร์ย่อยด้วย)
+OUTPUT_PATTERN = 'enhanced_tcas_data_*'
+OUTPUT_EXTENSIONS = ('.csv', '.parquet', '.arrow', '.feather')
+# ไฟล์ข้อมูลร่วมของ wsgi.py: ข้อมูลทั้งชุด (ไม่บีบอัด memory-map ได้โดยตรง) และผลสรุปใน schema metadata
+DEFAULT_SHARED_PATH = 'tcas_shared.arrow'
+AGGREGATES_METADATA_KEY = b'tcas_aggregates'
+
+# คอลัมน์ที่ค่าซ้ำกันมาก เก็บเป็น categorical (ตรงกับ DICTIONARY_COLUMNS ใน scrap.py)
+CATEGORICAL_COLUMNS = ['คำค้น', 'มหาวิทยาลัย', 'คณะ', 'ประเภทหลักสูตร', FEE_UNIT, FEE_CONFIDENCE]
+# คอลัมน์ที่กรองข้อมูลได้พร้อมกันหลายคอลัมน์ (cross-filter) และช่วงค่าใช้จ่ายต่อปี
+FILTER_COLUMNS = ['มหาวิทยาลัย', 'คณะ', 'คำค้น', 'ประเภทหลักสูตร']
+RANGE_COLUMN = FEE_ANNUAL
+# คอลัมน์คำค้นเก็บหลายคำคั่นด้วย ' | ' (ตรงกับ KEYWORD_SEPARATOR ใน scrap.py) - กรองทีละคำ
+KEYWORD_COLUMN = 'คำค้น'
+KEYWORD_SEPARATOR = ' | '
+# คอลัมน์ที่ค้นหาข้อความได้และน้ำหนักของคะแนน - ตรงกับชื่อหลักสูตรสำคัญกว่าคณะและมหาวิทยาลัย
+SEARCH_COLUMNS = {'ชื่อหลักสูตร': 3.0, 'คณะ': 1.5, 'มหาวิทยาลัย': 1.0}
+# key ของคำค้นใน filters (ใช้คู่กับตัวกรองคอลัมน์อื่นได้)
+SEARCH_FILTER = 'search'
+# n-gram ตัวอักษรสำหรับ inverted index และจำนวน n-gram ที่ขาดได้ (พิมพ์ผิด/ตกหล่นหนึ่งตัวอักษร) - ต้องตรงอย่างน้อยครึ่งหนึ่ง
+NGRAM_SIZE = 3
+FUZZY_MISSES = 2
+# เวลาที่เก็บข้อมูล: CSV เก็บเป็นข้อความ Parquet/Arrow เป็น timestamp - รวมหลายไฟล์แล้วแปลงเป็น datetime64
+DATE_COLUMN = 'วันที่เก็บข้อมูล'
+# แถวหนึ่งของ scrap.py ระบุด้วยลิงก์และเวลาที่เก็บ - ใช้หาไฟล์ของรอบเดียวกันที่บันทึกหลายรูปแบบ
+ROW_KEY_COLUMNS = ['ลิงก์', DATE_COLUMN]
+# จำนวน bit ที่เป็น 1 ของทุกค่า uint8 (NumPy 1.x ไม่มี np.bitwise_count)
+POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+# คอลัมน์ที่ได้จากโฟลเดอร์แบ่งตามวันที่ (scrape_date=YYYY-MM-DD) ไม่ใช่ข้อมูลที่ scrape มา
+PARTITION_COLUMNS = ['scrape_date']
+
+
+class DataSource:
+    """แหล่งข้อมูลแบบตาราง: อ่านเฉพาะคอลัมน์ที่ต้องใช้ และเก็บคอลัมน์ที่อ่านแล้วไว้ใช้ซ้ำ"""
+
+    def __init__(self, path, memory_map=True):
+        self.path = path
+        self.memory_map = memory_map
+        # เพิ่มขึ้นทุกครั้งที่ข้อมูลเปลี่ยน - ใช้เป็นส่วนหนึ่งของ key ของแคชทุกชั้น
+        self.version = 1
+        self._columns = None
+        self._cache = {}
+
+    @property
+    def columns(self):
+        """ชื่อคอลัมน์จาก schema อย่างเดียว (ไม่อ่านข้อมูล)"""
+        if self._columns is None:
+            self._columns = [c for c in self._read_schema() if c not in PARTITION_COLUMNS]
+        return self._columns
+
+    def read(self, columns=None, cache=True):
+        """DataFrame ของคอลัมน์ที่ขอ - อ่านจากไฟล์เฉพาะคอลัมน์ที่ยังไม่เคยอ่าน
+        cache=False ไม่เก็บคอลัมน์ที่อ่านใหม่ไว้ (ใช้เมื่ออ่านครั้งเดียว เช่นตอนสร้าง aggregate)"""
+        columns = list(columns or self.columns)
+        missing = [c for c in columns if c not in self._cache]
+        loaded = _categorize(self._read(missing)) if missing else None
+        if cache and loaded is not None:
+            for column in missing:
+                self._cache[column] = loaded[column]
+        return pd.DataFrame({
+            column: self._cache[column] if column in self._cache else loaded[column]
+            for column in columns
+        }, copy=False)
+
+    def invalidate(self):
+        """ข้อมูลในไฟล์เปลี่ยน: ล้างคอลัมน์ที่อ่านไว้และเพิ่ม version"""
+        self._columns = None
+        self._cache = {}
+        self.version += 1
+
+    def head(self, n=10):
+        """n แถวแรกทุกคอลัมน์ - อ่านแค่ส่วนต้นของไฟล์"""
+        return self._read_head(n)[self.columns]
+
+    def stored_summaries(self, top_n):
+        """ผลสรุปที่คำนวณไว้แล้วในไฟล์ (ถ้ามีและใช้ top_n เดียวกัน) - ไม่มีคืน None"""
+        return None
+
+    def _read_schema(self):
+        raise NotImplementedError
+
+    def _read(self, columns):
+        raise NotImplementedError
+
+    def _read_head(self, n):
+        return self._read(self.columns).head(n)
+
+
+class ParquetSource(DataSource):
+    """ไฟล์ Parquet หรือโฟลเดอร์ที่แบ่งตามวันที่ (ParquetRowWriter ใน scrap.py)"""
+
+    def _dataset(self):
+        return ds.dataset(self.path, format='parquet', partitioning='hive')
+
+    def _read_schema(self):
+        return self._dataset().schema.names
+
+    def _read(self, columns):
+        table = pq.read_table(
+            self.path,
+            columns=columns,
+            memory_map=self.memory_map,
+            read_dictionary=[c for c in columns if c in CATEGORICAL_COLUMNS]
+        )
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    def _read_head(self, n):
+        return self._dataset().head(n, columns=self.columns).to_pandas()
+
+
+class ArrowSource(DataSource):
+    """ไฟล์ Arrow IPC / Feather v2 - memory-map แล้วใช้ข้อมูลจากไฟล์โดยตรงไม่ต้องคัดลอก"""
+
+    def _read_schema(self):
+        with pa.memory_map(self.path) as source:
+            return pa.ipc.open_file(source).schema.names
+
+    def _read(self, columns):
+        # เลือกคอลัมน์หลังเปิดไฟล์ - ส่ง columns ให้ read_table จะคัดลอกข้อมูลออกจาก memory-map
+        table = feather.read_table(self.path, memory_map=self.memory_map).select(columns)
+        return table.to_pandas(split_blocks=True)
+
+    def _read_head(self, n):
+        table = feather.read_table(self.path, memory_map=self.memory_map).select(self.columns)
+        return table.slice(0, n).to_pandas()
+
+    def stored_summaries(self, top_n):
+        with pa.memory_map(self.path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        if AGGREGATES_METADATA_KEY not in metadata:
+            return None
+        stored = json.loads(metadata[AGGREGATES_METADATA_KEY])
+        return stored['summaries'] if stored['top_n'] == top_n else None
+
+
+class CsvSource(DataSource):
+    """ไฟล์ CSV จาก save_to_csv - อ่านได้โดยไม่ต้องมี pyarrow แต่ช้ากว่าและใช้หน่วยความจำมากกว่า"""
+
+    def _read_schema(self):
+        return pd.read_csv(self.path, nrows=0, encoding='utf-8-sig').columns.tolist()
+
+    def _read(self, columns):
+        dtype = {c: 'category' for c in columns if c in CATEGORICAL_COLUMNS}
+        return pd.read_csv(self.path, usecols=columns, dtype=dtype, encoding='utf-8-sig')
+
+    def _read_head(self, n):
+        return pd.read_csv(self.path, nrows=n, encoding='utf-8-sig')
+
+
+class MultiFileSource(DataSource):
+    """ผลของ scrap.py หลายไฟล์ต่อกันเป็นชุดเดียว - เพิ่มไฟล์ใหม่ได้โดยไม่ต้องอ่านไฟล์เดิมซ้ำ
+    ไฟล์ที่ทุกแถวมีอยู่แล้วในชุด (รอบเดียวกันที่บันทึกหลายรูปแบบ เช่น --formats parquet,csv) จะถูกข้าม"""
+
+    def __init__(self, paths, memory_map=True, parts=None):
+        super().__init__(list(paths), memory_map)
+        # version ของชุดก่อนหน้าและไฟล์ที่เพิ่มจากชุดนั้น (ให้ AggregateStore นับเพิ่มเฉพาะส่วนใหม่)
+        self.base_version = None
+        self.added = []
+        # ไฟล์ที่ข้ามเพราะซ้ำกับไฟล์ในชุด และ hash ของ (ลิงก์, วันที่เก็บข้อมูล) ทุกแถว (คำนวณเมื่อต้องใช้)
+        self.skipped = []
+        self._keys = None
+        if parts is None:
+            self.path, self.parts, self._keys = [], [], np.empty(0, dtype=np.uint64)
+            self._add_unique(paths, [open_source(path, memory_map) for path in paths])
+        else:
+            self.parts = parts
+
+    def _read_schema(self):
+        names = []
+        for part in self.parts:
+            names.extend(column for column in part.columns if column not in names)
+        return names
+
+    def _read(self, columns):
+        frames = []
+        for part in self.parts:
+            present = [c for c in columns if c in part.columns]
+            frame = part._read(present or part.columns[:1])
+            frames.append(frame[present] if present else frame.iloc[:, :0])
+        return _concat_frames(frames, columns)
+
+    def _read_head(self, n):
+        if not self.parts:
+            return pd.DataFrame(columns=self.columns)
+        return _concat_frames([self.parts[0].head(n)], self.columns)
+
+    def _known_keys(self):
+        if self._keys is None:
+            keys = [_row_keys(part) for part in self.parts]
+            keys = [k for k in keys if k is not None]
+            self._keys = np.unique(np.concatenate(keys)) if keys else np.empty(0, dtype=np.uint64)
+        return self._keys
+
+    def _add_unique(self, paths, parts):
+        """ต่อท้ายไฟล์ที่มีแถวใหม่ - ไฟล์ที่ทุกแถวซ้ำกับชุดเดิม (หรือไฟล์ก่อนหน้าในรายการเดียวกัน) เก็บไว้ใน skipped"""
+        added = []
+        known = self._known_keys()
+        for path, part in zip(paths, parts):
+            keys = _row_keys(part)
+            if keys is not None and len(keys) and np.isin(keys, known, assume_unique=True).all():
+                self.skipped.append(path)
+                continue
+            if keys is not None:
+                known = np.union1d(known, keys)
+            self.path.append(path)
+            self.parts.append(part)
+            added.append(path)
+        self._keys = known
+        return added
+
+    def appended(self):
+        """เฉพาะไฟล์ที่เพิ่มจากชุดก่อนหน้า"""
+        return MultiFileSource(self.added, self.memory_map, parts=self.parts[len(self.parts) - len(self.added):])
+
+    def append(self, paths):
+        """ชุดใหม่ = ชุดนี้ + ไฟล์ใหม่ (ชุดนี้ไม่เปลี่ยน) - คอลัมน์ที่อ่านไว้แล้วอ่านเพิ่มเฉพาะไฟล์ใหม่
+        เปิดทุกไฟล์ก่อนสร้างชุดใหม่: ไฟล์ที่อ่านไม่ได้ (เช่น Parquet ที่ยังไม่มี footer) raise และชุดเดิมไม่เปลี่ยน
+        ถ้าทุกไฟล์ซ้ำกับชุดเดิมคืนชุดเดิม"""
+        paths = list(paths)
+        parts = [open_source(path, self.memory_map) for path in paths]
+        for part in parts:
+            part.columns
+        source = MultiFileSource(list(self.path), self.memory_map, parts=list(self.parts))
+        source.skipped = list(self.skipped)
+        source._keys = self._known_keys()
+        added = source._add_unique(paths, parts)
+        if not added:
+            return self
+        source.version = self.version + 1
+        source.base_version = self.version
+        source.added = added
+        
+        cached = list(self._cache)
+        if cached:
+            new_rows = source.appended().read(cached, cache=False)
+            old_rows = pd.DataFrame(self._cache)
+            combined = _concat_frames([old_rows, new_rows], cached)
+            source._cache = {column: combined[column] for column in cached}
+        return source
+
+
+class DatasetHolder:
+    """ถือ DataSource ที่ callback ใช้อยู่ - เปลี่ยนเป็นชุดใหม่ด้วยการสลับ reference ครั้งเดียว
+    callback ที่กำลังทำงานใช้ชุดเดิมจนจบ จึงไม่เห็นข้อมูลที่โหลดไม่ครบ"""
+
+    def __init__(self, source):
+        self._source = source
+        self._lock = threading.Lock()
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def version(self):
+        return self._source.version
+
+    def update(self, build):
+        """สร้างชุดใหม่จากชุดปัจจุบันด้วย build(source) แล้วสลับเข้าไป (ผู้เขียนทีละราย)"""
+        with self._lock:
+            source = build(self._source)
+            self._source = source
+        return source
+
+
+class DataWatcher:
+    """thread เบื้องหลังที่ตรวจหาไฟล์ผลลัพธ์ใหม่ของ scrap.py แล้วต่อท้ายข้อมูลใน DatasetHolder
+    ไฟล์ต้องขนาดไม่เปลี่ยนระหว่างการตรวจสองครั้งติดกันก่อน (เขียนเสร็จแล้ว) และเปิดอ่านได้ จึงจะถูกเพิ่ม
+    ไฟล์ที่เปิดไม่ได้ (เช่น Parquet ที่ยังไม่มี footer) ลองใหม่ทุกรอบจนกว่าจะอ่านได้"""
+
+    def __init__(self, holder, directory, interval=5.0):
+        self.holder = holder
+        self.directory = directory
+        self.interval = interval
+        source = holder.source
+        self.seen = set(getattr(source, 'path', [])) | set(getattr(source, 'skipped', []))
+        self._pending = {}
+        self._unreadable = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """ตรวจหนึ่งรอบ - คืนรายการไฟล์ที่เพิ่มเข้าไปในรอบนี้ (ไม่นับไฟล์ที่ซ้ำกับข้อมูลเดิม)"""
+        ready = []
+        for path in find_outputs(self.directory):
+            if path in self.seen:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            if self._pending.get(path) == signature and self._readable(path):
+                ready.append(path)
+            else:
+                self._pending[path] = signature
+        if not ready:
+            return []
+        
+        current = self.holder.source
+        try:
+            source = self.holder.update(lambda current: current.append(ready))
+        except Exception as e:
+            print(f"⚠️ ยังอ่านไฟล์ใหม่ไม่ได้: {str(e)}")
+            return []
+        
+        for path in ready:
+            self.seen.add(path)
+            self._pending.pop(path, None)
+        if source is current:
+            print(f"⏭️ ข้าม {len(ready)} ไฟล์ที่ซ้ำกับข้อมูลเดิม")
+            return []
+        added = [path for path in ready if path in source.added]
+        if len(added) < len(ready):
+            print(f"⏭️ ข้าม {len(ready) - len(added)} ไฟล์ที่ซ้ำกับข้อมูลเดิม")
+        print(f"🔄 เพิ่มข้อมูลจาก {len(added)} ไฟล์ใหม่ (version {source.version})")
+        return added
+
+    def _readable(self, path):
+        """เปิดไฟล์อ่าน schema ได้ - ไฟล์ที่ยังเขียนไม่เสร็จหรือเสียแจ้งเตือนครั้งแรกครั้งเดียว"""
+        try:
+            open_source(path, memory_map=False).columns
+        except Exception as e:
+            if path not in self._unreadable:
+                self._unreadable.add(path)
+                print(f"⚠️ ยังอ่านไฟล์ {path} ไม่ได้ จะลองใหม่: {str(e)}")
+            return False
+        self._unreadable.discard(path)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️ ตรวจหาไฟล์ใหม่ล้มเหลว: {str(e)}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='tcas-data-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class LRUCache:
+    """แคชขนาดจำกัด ลบรายการที่ไม่ได้ใช้นานที่สุดเมื่อเต็ม (ใช้ได้จากหลาย thread)"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        # คำนวณนอก lock - callback อื่นไม่ต้องรอ (อาจคำนวณซ้ำได้ถ้าขอพร้อมกัน)
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class AggregateStore:
+    """ผลสรุปของทุกคอลัมน์ที่คำนวณครั้งเดียวต่อ version ของข้อมูล (top-N และสถิติของคอลัมน์ตัวเลข)
+    ข้อมูลที่ต่อท้าย (MultiFileSource.append) นับเพิ่มเฉพาะไฟล์ใหม่ ผลที่ต้องกรองข้อมูลก่อนเก็บใน LRU"""
+
+    def __init__(self, holder, top_n=10, cache_size=256):
+        self.holder = holder
+        self.top_n = top_n
+        self.filtered = LRUCache(cache_size)
+        self._state = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._state['version'] if self._state else None
+
+    def _summaries(self, source):
+        """ผลสรุปของ source - สร้างใหม่ถ้ายังไม่มี หรือข้อมูลเปลี่ยน version แล้ว"""
+        state = self._state
+        if state is not None and state['version'] == source.version:
+            return state['summaries']
+        with self._lock:
+            state = self._state
+            if state is not None and state['version'] == source.version:
+                return state['summaries']
+            
+            stored = source.stored_summaries(self.top_n) if state is None else None
+            if stored is not None:
+                # ไฟล์ข้อมูลร่วมของ wsgi.py มีผลสรุปมาแล้ว ไม่ต้องอ่านข้อมูลมานับ
+                self._state = {'version': source.version, 'counts': None, 'missing': None, 'summaries': stored}
+                return stored
+            
+            if state is not None and state['counts'] is not None and getattr(source, 'base_version', None) == state['version']:
+                counts, missing = _count_columns(source.appended().read(cache=False))
+                counts = {
+                    column: state['counts'][column].add(counts[column], fill_value=0).astype('int64')
+                    if column in state['counts'] and column in counts
+                    else state['counts'].get(column, counts.get(column))
+                    for column in source.columns
+                }
+                missing = {column: state['missing'].get(column, 0) + missing.get(column, 0) for column in source.columns}
+            else:
+                counts, missing = _count_columns(source.read(cache=False))
+            
+            # สถิติของคอลัมน์ตัวเลขรวมกันไม่ได้ - อ่านเฉพาะคอลัมน์ตัวเลขมาคำนวณใหม่
+            numeric = [c for c, values in counts.items() if pd.api.types.is_numeric_dtype(values.index)]
+            values = source.read(numeric) if numeric else pd.DataFrame()
+            summaries = {
+                column: summarize_counts(counts[column], missing[column], self.top_n,
+                                         values[column] if column in numeric else None)
+                for column in counts
+            }
+            self._state = {'version': source.version, 'counts': counts, 'missing': missing, 'summaries': summaries}
+            self.filtered.clear()
+            return summaries
+
+    def summary(self, column, source=None):
+        return self._summaries(source or self.holder.source)[column]
+
+    def top_counts(self, column, filters=None, source=None):
+        """pd.Series ของ top-N ค่าและจำนวน - filters ดู FilterIndex.mask
+        source คือชุดข้อมูลที่ callback ถืออยู่ (ค่าเริ่มต้นคือชุดปัจจุบัน)"""
+        source = source or self.holder.source
+        if not filters:
+            summary = self._summaries(source)[column]
+            return pd.Series(summary['counts'], index=pd.Index(summary['labels'], name=column), name='count')
+        
+        key = (source.version, column, filters_key(filters))
+        return self.filtered.get_or_compute(key, lambda: self.filter_index(source).counts(column, filters, self.top_n))
+
+    def filter_index(self, source=None):
+        """FilterIndex ของ source - สร้างครั้งเดียวต่อ version"""
+        source = source or self.holder.source
+        index = self._index
+        if index is not None and index.version == source.version:
+            return index
+        with self._lock:
+            if self._index is None or self._index.version != source.version:
+                self._index = FilterIndex(source)
+            return self._index
+
+
+class FilterIndex:
+    """ดัชนีสำหรับกรองหลายคอลัมน์พร้อมกัน: bitmap (np.packbits) ของแต่ละค่าใน FILTER_COLUMNS
+    และลำดับแถวเรียงตามค่าใช้จ่ายต่อปีสำหรับช่วงราคา - การกรองเป็นแค่ OR/AND ของ bitmap ไม่ต้องสแกน DataFrame"""
+
+    def __init__(self, source, columns=FILTER_COLUMNS, range_column=RANGE_COLUMN):
+        self.source = source
+        self.version = source.version
+        self.columns = [c for c in columns if c in source.columns]
+        self.range_column = range_column if range_column in source.columns else None
+        df = source.read(self.columns + ([self.range_column] if self.range_column else []))
+        self.rows = len(df)
+        
+        # ค่าที่กรองได้ของแต่ละคอลัมน์ -> code ของค่าในคอลัมน์ (คำค้นหนึ่งคำอยู่ได้หลาย code)
+        self._codes = {}
+        self._values = {}
+        self._value_counts = {}
+        for column in self.columns:
+            codes, uniques = self._factorize(column, df[column])
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            values = {}
+            for code, label in enumerate(uniques):
+                labels = str(label).split(KEYWORD_SEPARATOR) if column == KEYWORD_COLUMN else [str(label)]
+                for value in labels:
+                    value = value.strip()
+                    if value:
+                        values.setdefault(value, []).append(code)
+            self._values[column] = {value: np.array(value_codes) for value, value_codes in values.items()}
+            self._value_counts[column] = {value: int(counts[value_codes].sum()) for value, value_codes in values.items()}
+        
+        # ช่วงราคา: ตำแหน่งแถวเรียงตามค่า (ไม่รวมค่าว่าง) หาช่วงด้วย searchsorted
+        if self.range_column:
+            fee = df[self.range_column].to_numpy(dtype='float64', na_value=np.nan)
+            order = np.argsort(fee, kind='stable')
+            self._range_order = order[~np.isnan(fee[order])]
+            self._range_values = fee[self._range_order]
+        self._bitmaps = LRUCache(4096)
+        self._search_index = None
+
+    def _factorize(self, column, series=None):
+        """(codes, ค่าไม่ซ้ำ) ของคอลัมน์ - ค่าว่างได้ code -1 (เก็บไว้ใช้ซ้ำ)"""
+        if column not in self._codes:
+            if series is None:
+                series = self.source.read([column])[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                codes, uniques = pd.factorize(series)
+            self._codes[column] = (codes, uniques)
+        return self._codes[column]
+
+    def options(self, column):
+        """ค่าที่กรองได้ของคอลัมน์ เรียงจากพบบ่อยไปน้อย: [(ค่า, จำนวนแถว)]"""
+        counts = self._value_counts.get(column, {})
+        return sorted(((value, count) for value, count in counts.items() if count > 0), key=lambda item: (-item[1], item[0]))
+
+    def range_bounds(self):
+        """(ต่ำสุด, สูงสุด) ของคอลัมน์ช่วงราคา - ไม่มีข้อมูลคืน None"""
+        if not self.range_column or len(self._range_values) == 0:
+            return None
+        return float(self._range_values[0]), float(self._range_values[-1])
+
+    def bitmap(self, column, value):
+        """bitmap ของแถวที่คอลัมน์มีค่านี้ (สร้างเมื่อใช้ครั้งแรกแล้วเก็บไว้)"""
+        def build():
+            codes, _ = self._factorize(column)
+            value_codes = self._values[column].get(str(value))
+            if value_codes is None:
+                return np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+            return np.packbits(np.isin(codes, value_codes))
+        return self._bitmaps.get_or_compute((column, str(value)), build)
+
+    def range_bitmap(self, low=None, high=None):
+        """bitmap ของแถวที่ค่าอยู่ในช่วง [low, high]"""
+        start = 0 if low is None else np.searchsorted(self._range_values, low, side='left')
+        stop = len(self._range_values) if high is None else np.searchsorted(self._range_values, high, side='right')
+        selected = np.zeros(self.rows, dtype=bool)
+        selected[self._range_order[start:stop]] = True
+        return np.packbits(selected)
+
+    def mask(self, filters):
+        """bitmap ของแถวที่ผ่านทุกตัวกรอง - filters เป็น {คอลัมน์: [ค่าที่เลือก]} (ค่าในคอลัมน์เดียวกันเป็น OR
+        คอลัมน์ต่างกันเป็น AND) และ {RANGE_COLUMN: (ต่ำสุด, สูงสุด)} ไม่มีตัวกรองคืน None"""
+        result = None
+        for column, values in (filters or {}).items():
+            if column == self.range_column:
+                bitmap = self.range_bitmap(*values)
+            elif column == SEARCH_FILTER and values:
+                bitmap = np.packbits(self.search_index.scores(values) > 0)
+            elif column in self._values and values:
+                bitmap = np.bitwise_or.reduce([self.bitmap(column, value) for value in values])
+            else:
+                continue
+            result = bitmap if result is None else result & bitmap
+        return result
+
+    def positions(self, filters):
+        """ตำแหน่งแถว (เรียงจากน้อยไปมาก) ที่ผ่านตัวกรอง - ไม่มีตัวกรองคืน None"""
+        mask = self.mask(filters)
+        if mask is None:
+            return None
+        return np.flatnonzero(np.unpackbits(mask, count=self.rows))
+
+    def ranked(self, filters):
+        """เหมือน positions แต่ถ้ามีคำค้นเรียงตามคะแนนการค้นหามากไปน้อย"""
+        positions = self.positions(filters)
+        query = (filters or {}).get(SEARCH_FILTER)
+        if positions is None or not query:
+            return positions
+        scores = self.search_index.scores(query)[positions]
+        return positions[np.argsort(-scores, kind='stable')]
+
+    @property
+    def search_index(self):
+        """SearchIndex ของชุดข้อมูลนี้ (สร้างเมื่อค้นหาครั้งแรก)"""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self)
+        return self._search_index
+
+    def count(self, filters):
+        """จำนวนแถวที่ผ่านตัวกรอง (นับ bit โดยตรง)"""
+        mask = self.mask(filters)
+        return self.rows if mask is None else _popcount(mask)
+
+    def counts(self, column, filters, top_n=10):
+        """top-N ค่าของคอลัมน์ใดก็ได้เฉพาะแถวที่ผ่านตัวกรอง (รูปแบบเดียวกับ AggregateStore.top_counts)"""
+        codes, uniques = self._factorize(column)
+        positions = self.positions(filters)
+        selected = codes if positions is None else codes[positions]
+        counts = np.bincount(selected[selected >= 0], minlength=len(uniques))
+        top = np.argsort(-counts, kind='stable')[:top_n]
+        top = top[counts[top] > 0]
+        return pd.Series(counts[top], index=pd.Index(np.asarray(uniques)[top].tolist(), name=column), name='count')
+
+
+class SearchIndex:
+    """ค้นหาข้อความใน SEARCH_COLUMNS ด้วย inverted index ของ n-gram ตัวอักษร (ภาษาไทยไม่มีช่องว่างระหว่างคำ)
+    สร้างจากค่าที่ไม่ซ้ำของแต่ละคอลัมน์ แล้วกระจายคะแนนไปยังแถวด้วย code ของ FilterIndex
+    คะแนนต่อคำค้น: ตรงทั้งค่า > ตรงทั้งคำ > ขึ้นต้นคำ > มีคำค้นอยู่ในค่า > n-gram ตรงบางส่วน (พิมพ์ผิด)
+    คำค้นหลายคำต้องตรงทุกคำ และได้คะแนนเพิ่มถ้าคำค้นทั้งข้อความตรงกับค่าทั้งค่า"""
+
+    def __init__(self, index, columns=SEARCH_COLUMNS):
+        self.rows = index.rows
+        self.fields = []
+        for column, weight in columns.items():
+            if column not in index.source.columns:
+                continue
+            codes, uniques = index._factorize(column)
+            values = [normalize_text(value) for value in uniques]
+            postings = {}
+            prefixes = []
+            for value_id, value in enumerate(values):
+                for gram in set(_ngrams(value)):
+                    postings.setdefault(gram, []).append(value_id)
+                prefixes.extend((word, value_id) for word in set(_words(value)))
+            prefixes.sort()
+            self.fields.append({
+                'weight': weight,
+                'codes': codes,
+                'values': values,
+                'lookup': {value: value_id for value_id, value in enumerate(values)},
+                'postings': {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()},
+                # คำทั้งหมดเรียงตามตัวอักษรคู่กับ value_id - คำที่ขึ้นต้นด้วยคำค้นอยู่ติดกัน หาช่วงด้วย searchsorted
+                'words': np.array([word for word, _ in prefixes], dtype=object),
+                'word_values': np.array([value_id for _, value_id in prefixes], dtype=np.int64)
+            })
+        self._scores = LRUCache(256)
+
+    def scores(self, query):
+        """คะแนนของทุกแถว (np.ndarray) - 0 คือไม่ตรง"""
+        query = normalize_text(query)
+        return self._scores.get_or_compute(query, lambda: self._row_scores(query))
+
+    def search(self, query, limit=None):
+        """ตำแหน่งแถวที่ตรงกับคำค้น เรียงตามคะแนนมากไปน้อย"""
+        scores = self.scores(query)
+        positions = np.flatnonzero(scores)
+        positions = positions[np.argsort(-scores[positions], kind='stable')]
+        return positions[:limit] if limit else positions
+
+    def _row_scores(self, query):
+        total = np.zeros(self.rows)
+        matched = np.ones(self.rows, dtype=bool)
+        terms = _words(query)
+        for term in terms:
+            term_scores = np.zeros(self.rows)
+            for field in self.fields:
+                value_scores = self._value_scores(field, term)
+                # code -1 (ค่าว่าง) ชี้ไปที่ช่องสุดท้ายซึ่งเป็น 0
+                np.maximum(term_scores, field['weight'] * value_scores[field['codes']], out=term_scores)
+            total += term_scores
+            matched &= term_scores > 0
+        
+        if len(terms) > 1:
+            for field in self.fields:
+                value_id = field['lookup'].get(query)
+                if value_id is not None:
+                    total += 3.0 * field['weight'] * (field['codes'] == value_id)
+        total[~matched] = 0
+        return total if terms else np.zeros(self.rows)
+
+    def _value_scores(self, field, term):
+        """คะแนนของค่าที่ไม่ซ้ำแต่ละค่าในคอลัมน์ (ช่องท้ายสุดสำหรับค่าว่าง = 0)"""
+        count = len(field['values'])
+        scores = np.zeros(count + 1)
+        grams = set(_ngrams(term))
+        if grams:
+            found = [field['postings'][gram] for gram in grams if gram in field['postings']]
+            if found:
+                hits = np.bincount(np.concatenate(found), minlength=count)
+                required = max(-(-len(grams) // 2), len(grams) - FUZZY_MISSES)
+                scores[:count] = np.where(hits >= required, hits / len(grams), 0)
+                # มี n-gram ครบทุกตัว ถือว่ามีคำค้นอยู่ในค่า
+                scores[:count][hits == len(grams)] = 1.5
+        
+        # ขึ้นต้นคำ (ใช้ได้กับคำค้นสั้นกว่า n-gram ด้วย) ตรงทั้งคำ และตรงทั้งค่า
+        words, word_values = field['words'], field['word_values']
+        start, exact_end = words.searchsorted(term, 'left'), words.searchsorted(term, 'right')
+        end = words.searchsorted(term + '\U0010ffff', 'left')
+        for ids, score in ((word_values[start:end], 2.0), (word_values[start:exact_end], 2.5)):
+            scores[ids] = np.maximum(scores[ids], score)
+        value_id = field['lookup'].get(term)
+        if value_id is not None:
+            scores[value_id] = 3.0
+        return scores
+
+
+def normalize_text(text):
+    """ข้อความสำหรับค้นหา: Unicode NFC ตัวพิมพ์เล็ก เครื่องหมายวรรคตอนเป็นช่องว่าง ช่องว่างเดียว
+    (ไม่ใช้ \\W เพราะสระและวรรณยุกต์ไทยไม่นับเป็นตัวอักษร)"""
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ''
+    text = unicodedata.normalize('NFC', str(text)).lower()
+    text = ''.join(' ' if unicodedata.category(char)[0] in 'PSZC' else char for char in text)
+    return ' '.join(text.split())
+
+
+def _words(text):
+    """แยกคำ - ใช้ pythainlp ถ้าติดตั้งไว้ ไม่มีแยกด้วยช่องว่าง"""
+    if word_tokenize is not None:
+        return [word for word in word_tokenize(text, keep_whitespace=False) if word.strip()]
+    return text.split()
+
+
+def _ngrams(text, n=NGRAM_SIZE):
+    """n-gram ตัวอักษรของแต่ละคำ (ไม่ข้ามช่องว่าง)"""
+    return [word[i:i + n] for word in text.split() for i in range(len(word) - n + 1)]
+
+
+def filters_key(filters):
+    """key ของชุดตัวกรองสำหรับแคช (ไม่ขึ้นกับลำดับค่าที่เลือก)"""
+    return tuple(sorted(
+        (column, values if isinstance(values, str) else
+         tuple(values) if column == RANGE_COLUMN else tuple(sorted(map(str, values))))
+        for column, values in (filters or {}).items() if values
+    ))
+
+
+class TableQuery:
+    """แบ่งหน้า เรียงลำดับ และกรองข้อมูลทั้งชุดฝั่งเซิร์ฟเวอร์สำหรับ DataTable (page/sort/filter_action='custom')
+    ลำดับแถวหลังกรองและเรียงเก็บใน LRU ตาม (version, sort_by, filter_query) - เปลี่ยนหน้าจึงแค่ตัดช่วงแถว"""
+
+    def __init__(self, cache_size=64):
+        self.orders = LRUCache(cache_size)
+
+    def page(self, source, page_current=0, page_size=20, sort_by=None, filter_query='', filters=None, index=None):
+        """คืน (แถวของหน้านั้นเป็น list ของ dict, จำนวนแถวทั้งหมดหลังกรอง)
+        filters/index คือตัวกรองหลายคอลัมน์ของแดชบอร์ดและ FilterIndex ที่ใช้หาแถว"""
+        sort_by = sort_by or []
+        filter_query = filter_query or ''
+        key = (
+            source.version,
+            tuple((item['column_id'], item['direction']) for item in sort_by),
+            filter_query,
+            filters_key(filters)
+        )
+        rows = index.ranked(filters) if index is not None and filters else None
+        order = self.orders.get_or_compute(key, lambda: self._order(source, sort_by, filter_query, rows))
+
+        start = max(0, int(page_current or 0)) * page_size
+        positions = order[start:start + page_size]
+        if len(positions) == 0:
+            return [], len(order)
+        rows = source.read().iloc[positions]
+        # Categorical/วันที่/NA แปลงเป็นค่าที่ส่งเป็น JSON ได้
+        rows = rows.apply(lambda s: s.astype('string') if pd.api.types.is_datetime64_any_dtype(s) else s)
+        rows = rows.astype('object').where(rows.notna(), None)
+        return rows.to_dict('records'), len(order)
+
+    def _order(self, source, sort_by, filter_query, rows=None):
+        """ตำแหน่งแถว (numpy array) ที่ผ่านตัวกรองเรียงตาม sort_by - rows จำกัดเฉพาะแถวเหล่านี้"""
+        columns = [item['column_id'] for item in sort_by]
+        conditions = parse_filter_query(filter_query)
+        columns += [column for column, _, _, _ in conditions if column not in columns]
+        df = source.read([c for c in columns if c in source.columns]) if columns else None
+
+        mask = None
+        for column, operator, value, case_sensitive in conditions:
+            if column not in source.columns:
+                continue
+            condition = _filter_mask(df[column], operator, value, case_sensitive)
+            mask = condition if mask is None else mask & condition
+
+        if rows is None:
+            rows = np.arange(len(df) if df is not None else len(source.read(source.columns[:1])))
+        positions = rows
+        if mask is not None:
+            positions = positions[mask[positions]]
+        if sort_by:
+            sort_columns = [item['column_id'] for item in sort_by if item['column_id'] in source.columns]
+            ascending = [item['direction'] == 'asc' for item in sort_by if item['column_id'] in source.columns]
+            if sort_columns:
+                subset = df[sort_columns].iloc[positions]
+                # categorical เรียงตามลำดับตัวอักษร ไม่ใช่ลำดับ category
+                subset = subset.apply(lambda s: s.astype('object') if isinstance(s.dtype, pd.CategoricalDtype) else s)
+                positions = positions[_argsort(subset, ascending)]
+        return positions
+
+
+# ตัวกรองของ DataTable เช่น {มหาวิทยาลัย} icontains มหิดล && {ค่าใช้จ่าย_ต่อปี} >= 50000
+FILTER_PART_RE = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s+(?P<case>[si])?(?P<operator>contains|datestartswith|eq|ne|lt|le|gt|ge|<=|>=|!=|=|<|>)\s*(?P<value>.*)$"
+)
+FILTER_OPERATORS = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+
+
+def parse_filter_query(filter_query):
+    """แยก filter_query เป็นรายการ (คอลัมน์, operator, ค่า, ตรงตัวพิมพ์เล็ก/ใหญ่) - ส่วนที่อ่านไม่ออกข้ามไป"""
+    conditions = []
+    for part in filter(None, (p.strip() for p in (filter_query or '').split(' && '))):
+        match = FILTER_PART_RE.match(part)
+        if not match:
+            continue
+        value = match['value'].strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        else:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        operator = FILTER_OPERATORS.get(match['operator'], match['operator'])
+        conditions.append((match['column'], operator, value, match['case'] != 'i'))
+    return conditions
+
+
+def _filter_mask(series, operator, value, case_sensitive=True):
+    """numpy bool array ของแถวที่ตรงเงื่อนไข - ค่าว่าง (NA) ถือว่าไม่ตรง
+    แปลงเป็น numpy ทุกเงื่อนไข: BooleanArray กับ bool[pyarrow] ที่มี NA ใช้ & ด้วยกันไม่ได้"""
+    condition = _filter_condition(series, operator, value, case_sensitive)
+    return condition.to_numpy(dtype=bool, na_value=False)
+
+
+def _filter_condition(series, operator, value, case_sensitive):
+    if operator in ('contains', 'datestartswith'):
+        text = series.astype('string')
+        if operator == 'datestartswith':
+            return text.str.startswith(_filter_text(value))
+        return text.str.contains(_filter_text(value), case=case_sensitive, regex=False)
+    
+    if pd.api.types.is_numeric_dtype(series) and isinstance(value, float):
+        values = series
+    else:
+        values = series.astype('string')
+        value = _filter_text(value)
+        if not case_sensitive:
+            values = values.str.lower()
+            value = value.lower()
+    return {
+        'eq': values == value,
+        'ne': values != value,
+        'lt': values < value,
+        'le': values <= value,
+        'gt': values > value,
+        'ge': values >= value
+    }[operator]
+
+
+def _filter_text(value):
+    """ค่าในตัวกรองเป็นข้อความ - ตัวเลขที่พิมพ์โดยไม่มีทศนิยม (เช่น 1) ไม่กลายเป็น '1.0'"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _argsort(df, ascending):
+    """ตำแหน่งหลังเรียงหลายคอลัมน์ (stable, ค่าว่างอยู่ท้ายเสมอ)"""
+    return df.reset_index(drop=True).sort_values(
+        list(df.columns), ascending=ascending, kind='stable', na_position='last'
+    ).index.to_numpy()
+
+
+def _top_counts(series, top_n):
+    counts = series.value_counts().nlargest(top_n)
+    return counts[counts > 0]
+
+
+def _count_columns(df):
+    """จำนวนครั้งของทุกค่าในทุกคอลัมน์ (ไม่รวมค่าว่าง) และจำนวนค่าว่าง - รวมข้ามไฟล์ได้ด้วยการบวก"""
+    counts = {}
+    missing = {}
+    for column in df.columns:
+        values = df[column].value_counts()
+        values = values[values > 0]
+        if isinstance(values.index, pd.CategoricalIndex):
+            values.index = pd.Index(values.index.tolist())
+        counts[column] = values
+        missing[column] = int(df[column].isna().sum())
+    return counts, missing
+
+
+def summarize_counts(counts, missing=0, top_n=10, values=None):
+    """ผลสรุปหนึ่งคอลัมน์: top-N ค่าที่พบบ่อย จำนวนค่าไม่ซ้ำ ค่าว่าง และสถิติถ้าส่งค่าตัวเลขมา"""
+    top = counts.nlargest(top_n)
+    summary = {
+        'labels': [str(label) for label in top.index],
+        'counts': [int(count) for count in top.values],
+        'total': int(counts.sum()),
+        'distinct': int(len(counts)),
+        'missing': int(missing),
+        'stats': None
+    }
+    if values is not None and summary['total'] > 0:
+        stats = values.astype('float64').describe(percentiles=[0.25, 0.5, 0.75])
+        summary['stats'] = {name: round(float(value), 2) for name, value in stats.items()}
+    return summary
+
+
+def _popcount(bitmap):
+    """จำนวน bit ที่เป็น 1 ใน bitmap (uint8) - ใช้ np.bitwise_count ถ้ามี (NumPy 2.0 ขึ้นไป)"""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bitmap).sum())
+    return int(POPCOUNT_TABLE[bitmap].sum(dtype=np.int64))
+
+
+def _row_keys(source):
+    """hash ของ (ลิงก์, วันที่เก็บข้อมูล) ทุกแถวในไฟล์ ไม่ซ้ำและเรียงแล้ว - ไม่มีคอลัมน์ครบคืน None
+    เวลาแปลงเป็นข้อความรูปแบบเดียวกันก่อน (CSV เก็บเป็นข้อความ Parquet/Arrow เก็บเป็น timestamp)"""
+    if not all(column in source.columns for column in ROW_KEY_COLUMNS):
+        return None
+    frame = source._read(ROW_KEY_COLUMNS)
+    keys = pd.DataFrame({
+        'link': frame[ROW_KEY_COLUMNS[0]].astype(str),
+        'time': pd.to_datetime(frame[ROW_KEY_COLUMNS[1]], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+    })
+    return np.unique(pd.util.hash_pandas_object(keys, index=False).to_numpy())
+
+
+def _concat_frames(frames, columns):
+    """ต่อ DataFrame หลายชุด - คอลัมน์ categorical รวม categories ด้วย union_categoricals
+    คอลัมน์วันที่แปลงเป็น datetime64 ทุกชุด (ไม่อย่างนั้นได้ object ที่ปน str กับ Timestamp ซึ่งเรียงไม่ได้)"""
+    result = {}
+    for column in columns:
+        parts = [
+            frame[column] if column in frame.columns else pd.Series(pd.NA, index=range(len(frame)), dtype='object')
+            for frame in frames
+        ]
+        if column in CATEGORICAL_COLUMNS:
+            # categories เป็น object ทุกชุด - CSV ได้ object (หรือ float ถ้าว่างทั้งคอลัมน์) Parquet ได้ string
+            result[column] = pd.Series(union_categoricals(
+                [pd.Categorical(part.astype('object')) if not isinstance(part.dtype, pd.CategoricalDtype)
+                 else part.array.set_categories(part.cat.categories.astype('object'), rename=True)
+                 for part in parts],
+                ignore_order=True
+            ))
+        elif column == DATE_COLUMN and parts:
+            result[column] = pd.concat([pd.to_datetime(part, errors='coerce') for part in parts], ignore_index=True)
+        elif parts:
+            result[column] = pd.concat(parts, ignore_index=True)
+        else:
+            result[column] = pd.Series(dtype='object')
+    return pd.DataFrame(result)
+
+
+def _categorize(df):
+    """แปลงคอลัมน์ที่ค่าซ้ำกันมากเป็น categorical (ถ้ายังไม่ได้เป็น)"""
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def resolve_data_path(path=None):
+    """ตำแหน่งข้อมูล: path ที่ส่งมา > TCAS_DATA_PATH > tcas_parquet/ > CSV ล่าสุดในโฟลเดอร์ปัจจุบัน"""
+    path = path or os.environ.get(DATA_PATH_ENV)
+    if path:
+        return path
+    if os.path.isdir(DEFAULT_PARQUET_DIR) and pq is not None:
+        return DEFAULT_PARQUET_DIR
+    candidates = sorted(glob.glob(CSV_PATTERN))
+    if candidates:
+        return candidates[-1]
+    raise FileNotFoundError(f"ไม่พบข้อมูล - กำหนดตำแหน่งไฟล์ด้วย {DATA_PATH_ENV}")
+
+
+def find_outputs(directory):
+    """ไฟล์ผลลัพธ์ของ scrap.py ทั้งหมดในโฟลเดอร์ (รวมโฟลเดอร์ย่อย) เรียงตามชื่อซึ่งมีเวลาที่บันทึก"""
+    paths = glob.glob(os.path.join(directory, '**', OUTPUT_PATTERN), recursive=True)
+    return sorted(
+        (path for path in paths if os.path.splitext(path)[1].lower() in OUTPUT_EXTENSIONS),
+        key=os.path.basename
+    )
+
+
+def open_directory(directory, memory_map=None):
+    """รวมไฟล์ผลลัพธ์ทุกไฟล์ในโฟลเดอร์เป็น MultiFileSource (ใช้คู่กับ DataWatcher)"""
+    if memory_map is None:
+        memory_map = os.environ.get(MEMORY_MAP_ENV, '1') != '0'
+    paths = []
+    for path in find_outputs(directory):
+        try:
+            open_source(path, memory_map).columns
+        except Exception as e:
+            # เช่น Parquet ที่ scrap.py ยังเขียนไม่เสร็จ - DataWatcher จะเพิ่มเมื่ออ่านได้
+            print(f"⚠️ ข้ามไฟล์ {path} ที่ยังอ่านไม่ได้: {str(e)}")
+            continue
+        paths.append(path)
+    return MultiFileSource(paths, memory_map)
+
+
+def export_shared(source, path=DEFAULT_SHARED_PATH, top_n=10):
+    """เขียนข้อมูลทั้งชุดเป็น Arrow IPC ไม่บีบอัด พร้อมผลสรุป top-N ใน schema metadata
+    เขียนลงไฟล์ชั่วคราวแล้วสลับชื่อ worker ที่เปิดไฟล์เดิมอยู่จึงไม่เห็นไฟล์ที่เขียนไม่ครบ"""
+    summaries = AggregateStore(DatasetHolder(source), top_n=top_n)
+    stored = {'top_n': top_n, 'summaries': {column: summaries.summary(column) for column in source.columns}}
+    table = pa.Table.from_pandas(source.read(cache=False), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        AGGREGATES_METADATA_KEY: json.dumps(stored, ensure_ascii=False).encode('utf-8')
+    })
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(table, temp_path, compression='uncompressed')
+    os.replace(temp_path, path)
+    return path
+
+
+def _latest_mtime(path):
+    """เวลาแก้ไขล่าสุดของไฟล์ หรือของไฟล์ใดๆ ในโฟลเดอร์"""
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    return max(
+        (os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names),
+        default=os.path.getmtime(path)
+    )
+
+
+def prepare_shared(path=None, shared_path=None, top_n=10):
+    """ไฟล์ข้อมูลร่วมสำหรับหลาย worker - สร้างใหม่เฉพาะเมื่อข้อมูลต้นทางใหม่กว่า (worker แรกสร้าง ที่เหลือรอแล้วใช้ไฟล์เดียวกัน)"""
+    if pa is None:
+        raise ImportError("ต้องติดตั้ง pyarrow เพื่อใช้ไฟล์ข้อมูลร่วม")
+    path = resolve_data_path(path)
+    shared_path = shared_path or os.environ.get(SHARED_PATH_ENV, DEFAULT_SHARED_PATH)
+    if os.path.abspath(path) == os.path.abspath(shared_path):
+        return shared_path
+
+    with open(f'{shared_path}.lock', 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(shared_path) and os.path.getmtime(shared_path) >= _latest_mtime(path):
+            return shared_path
+        print(f"🗂️ สร้างไฟล์ข้อมูลร่วม {shared_path} จาก {path}")
+        return export_shared(open_source(path, memory_map=True), shared_path, top_n)
+
+
+def open_source(path=None, memory_map=None):
+    """สร้าง DataSource ตามชนิดไฟล์ (ยังไม่อ่านข้อมูลจนกว่าจะเรียก read/head)"""
+    path = resolve_data_path(path)
+    if memory_map is None:
+        memory_map = os.environ.get(MEMORY_MAP_ENV, '1') != '0'
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return CsvSource(path, memory_map)
+    if pa is None:
+        raise ImportError(f"ต้องติดตั้ง pyarrow เพื่ออ่าน {path}")
+    if extension in ('.arrow', '.feather', '.ipc'):
+        return ArrowSource(path, memory_map)
+    return ParquetSource(path, memory_map)
@@ -0,0 +1,76 @@
+import pandas as pd
+
+# คอลัมน์ตัวเลขที่ได้จากการแปลงข้อความ 'ค่าใช้จ่าย'
+FEE_AMOUNT = 'ค่าใช้จ่าย_จำนวนเงิน'
+FEE_UNIT = 'ค่าใช้จ่าย_หน่วย'
+FEE_ANNUAL = 'ค่าใช้จ่าย_ต่อปี'
+FEE_CONFIDENCE = 'ค่าใช้จ่าย_ความเชื่อมั่น'
+FEE_COLUMNS = [FEE_AMOUNT, FEE_UNIT, FEE_ANNUAL, FEE_CONFIDENCE]
+
+# หน่วยของค่าใช้จ่าย
+UNIT_SEMESTER = 'ภาคการศึกษา'
+UNIT_YEAR = 'ปี'
+UNIT_PROGRAM = 'หลักสูตร'
+
+# ระดับความเชื่อมั่นของการแปลง
+CONFIDENCE_HIGH = 'สูง'          # มีจำนวนเงิน (บาท) และหน่วยชัดเจน
+CONFIDENCE_MEDIUM = 'กลาง'       # มีจำนวนเงินแต่ไม่ระบุหน่วย หรือเป็นช่วงราคา
+CONFIDENCE_LOW = 'ต่ำ'            # เดาจากตัวเลขที่ไม่มีคำว่าบาท
+CONFIDENCE_NONE = 'ไม่มีข้อมูล'
+CONFIDENCE_LEVELS = [CONFIDENCE_HIGH, CONFIDENCE_MEDIUM, CONFIDENCE_LOW, CONFIDENCE_NONE]
+
+# จำนวนเงินที่ตามด้วย "บาท" (เอาจำนวนแรกที่พบ)
+BAHT_AMOUNT_RE = r'(\d+(?:\.\d+)?)\s*(?:บาท|฿|baht)'
+# ตัวเลขที่มี comma คั่นหลักพัน หรือตั้งแต่ 4 หลักขึ้นไป ใช้เมื่อไม่มีคำว่าบาท (จับจากข้อความก่อนตัด comma)
+# ยกเว้นเลข 4 หลัก 25xx ที่ไม่มี comma - เป็นปี พ.ศ. ไม่ใช่จำนวนเงิน
+BARE_AMOUNT_RE = r'(?<![\d,])(\d{1,3}(?:,\d{3})+(?:\.\d+)?|(?!25\d\d(?![\d.]))\d{4,}(?:\.\d+)?)'
+# ช่วงราคา เช่น 20,000 - 25,000
+RANGE_RE = r'\d+\s*[-–~]\s*\d+'
+# หน่วย: กลุ่มแรกที่พบในข้อความเป็นหน่วยของค่าใช้จ่าย
+UNIT_RE = (
+    r'(?P<program>ตลอดหลักสูตร|ทั้งหลักสูตร|หลักสูตรละ|entire program|whole program)'
+    r'|(?P<semester>ภาค(?:การ)?(?:ศึกษา|เรียน)|ภาคละ|ต่อภาค|เทอม|semester|term)'
+    r'|(?P<year>ต่อปี|ปีละ|/\s*ปี|per year|annual|/\s*year)'
+)
+# เหมาจ่าย (lump sum) ไม่มีหน่วยอื่น = ทั้งหลักสูตร - ถ้ามีหน่วยอื่นด้วย เช่น "เหมาจ่ายภาคการศึกษาละ" ใช้หน่วยนั้น
+LUMP_SUM_RE = r'เหมาจ่าย|lump sum'
+
+
+def normalize_fees(df, column='ค่าใช้จ่าย', program_years=4):
+    """แปลงข้อความค่าใช้จ่ายทั้งคอลัมน์เป็นจำนวนเงิน หน่วย ค่าต่อปี และความเชื่อมั่น (คืน DataFrame ใหม่)"""
+    text = df[column].astype('string').fillna('')
+    # ตัด comma คั่นหลักพัน และทำตัวพิมพ์เล็กสำหรับหน่วยภาษาอังกฤษ
+    cleaned = text.str.replace(r'(?<=\d),(?=\d{3})', '', regex=True).str.lower()
+
+    baht_amount = pd.to_numeric(cleaned.str.extract(BAHT_AMOUNT_RE, expand=False), errors='coerce')
+    bare_amount = pd.to_numeric(
+        text.str.lower().str.extract(BARE_AMOUNT_RE, expand=False).str.replace(',', '', regex=False),
+        errors='coerce'
+    )
+    amount = baht_amount.astype('Float64').fillna(bare_amount.astype('Float64'))
+
+    units = cleaned.str.extract(UNIT_RE)
+    unit = pd.Series(pd.NA, index=df.index, dtype='object')
+    for group, label in [('year', UNIT_YEAR), ('semester', UNIT_SEMESTER), ('program', UNIT_PROGRAM)]:
+        unit = unit.mask(units[group].notna(), label)
+    unit = unit.mask(unit.isna() & cleaned.str.contains(LUMP_SUM_RE, regex=True), UNIT_PROGRAM)
+    unit = unit.where(amount.notna())
+
+    # ไม่ระบุหน่วย: ถือเป็นต่อภาคการศึกษาตามรูปแบบที่ MyTCAS ใช้เป็นส่วนใหญ่ (ความเชื่อมั่นต่ำลง)
+    multiplier = pd.Series(2.0, index=df.index)
+    multiplier = multiplier.mask(unit == UNIT_YEAR, 1.0)
+    multiplier = multiplier.mask(unit == UNIT_PROGRAM, 1.0 / program_years)
+    annual = (amount * multiplier).round(2)
+
+    is_range = cleaned.str.contains(RANGE_RE, regex=True)
+    confidence = pd.Series(CONFIDENCE_NONE, index=df.index, dtype='object')
+    confidence = confidence.mask(bare_amount.notna(), CONFIDENCE_LOW)
+    confidence = confidence.mask(baht_amount.notna(), CONFIDENCE_MEDIUM)
+    confidence = confidence.mask(baht_amount.notna() & unit.notna() & ~is_range, CONFIDENCE_HIGH)
+
+    result = df.copy()
+    result[FEE_AMOUNT] = amount
+    result[FEE_UNIT] = pd.Categorical(unit, categories=[UNIT_SEMESTER, UNIT_YEAR, UNIT_PROGRAM])
+    result[FEE_ANNUAL] = annual.astype('Float64')
+    result[FEE_CONFIDENCE] = pd.Categorical(confidence, categories=CONFIDENCE_LEVELS)
+    return result
@@ -1,198 +1,1802 @@
+import argparse
 import asyncio
-from playwright.async_api import async_playwright
+import hashlib
+import multiprocessing
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+import zlib
+from bisect import bisect_left
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import pandas as pd
 from datetime import datetime
+from fee_normalizer import FEE_ANNUAL, normalize_fees
+
+# ใช้สำหรับโหมดดึงผ่าน HTTP โดยตรง (ไม่บังคับติดตั้ง)
+try:
+    import httpx
+    from lxml import html as lxml_html
+except ImportError:
+    httpx = None
+    lxml_html = None
+
+# ใช้สำหรับบันทึกไฟล์ Parquet (ไม่บังคับติดตั้ง)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+NOT_FOUND = 'ไม่พบข้อมูล'
+# ตัวคั่นคำค้นในคอลัมน์ 'คำค้น' เมื่อหลักสูตรตรงกับหลายคำค้น
+KEYWORD_SEPARATOR = ' | '
+# หน่วงเวลาระหว่างคำค้น (วินาที) ก่อนปรับตามอัตราปัจจุบัน
+KEYWORD_DELAY = 2.0
+# คอลัมน์ที่ค่าซ้ำกันมาก เก็บแบบ dictionary encoding ใน Parquet
+DICTIONARY_COLUMNS = ['คำค้น', 'มหาวิทยาลัย', 'คณะ', 'ประเภทหลักสูตร']
+# จำนวนแถวต่อช่วงตอนสร้าง DataFrame จากแถวใน journal (ไม่ต้องเก็บ list ของแถวทั้งหมด)
+EXPORT_CHUNK_ROWS = 5000
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# รูปแบบ selector ที่ตัวแยก HTML แบบ static รองรับ
+LABEL_SELECTOR_RE = re.compile(r"^(\w+):has-text\('(.+)'\) \+ (\w+)$")
+CLASS_SELECTOR_RE = re.compile(r"^\.([\w-]+)$")
+ATTR_SELECTOR_RE = re.compile(r"^\[([\w-]+)='([^']*)'\]$")
+
+# ดึงข้อความและลิงก์ของทุกรายการผลลัพธ์ในครั้งเดียว (1 round trip ต่อหน้า)
+RESULT_LIST_JS = """
+(selector) => Array.from(document.querySelectorAll(selector)).map(li => {
+    const link = li.querySelector('a');
+    return {text: li.innerText, href: link ? link.getAttribute('href') : null};
+})
+"""
+
+# รายการผลลัพธ์เพิ่มขึ้น หรือรายการแรกเปลี่ยน (ไปหน้าถัดไปแล้ว)
+RESULTS_CHANGED_JS = """
+([selector, count, firstHref]) => {
+    const items = document.querySelectorAll(selector);
+    if (items.length > count) {
+        return true;
+    }
+    const link = items.length ? items[0].querySelector('a') : null;
+    return items.length > 0 && (link ? link.getAttribute('href') : null) !== firstHref;
+}
+"""
+
+# ดึงทุกฟิลด์รายละเอียดและแถวตารางในครั้งเดียว ตามลำดับ selector เดียวกับ DETAIL_SELECTORS
+DETAIL_EXTRACT_JS = """
+({fields}) => {
+    const find = (spec) => {
+        if (spec.kind === 'label') {
+            for (const element of document.querySelectorAll(spec.tag)) {
+                if (element.textContent.includes(spec.label)) {
+                    const sibling = element.nextElementSibling;
+                    if (sibling && sibling.tagName.toLowerCase() === spec.sibling) {
+                        return sibling;
+                    }
+                }
+            }
+            return null;
+        }
+        return document.querySelector(spec.selector);
+    };
+
+    const found = {};
+    const matched = {};
+    for (const [field, specs] of Object.entries(fields)) {
+        for (const spec of specs) {
+            let element = null;
+            try {
+                element = find(spec);
+            } catch (e) {
+                continue;
+            }
+            const text = element ? (element.innerText || '').trim() : '';
+            if (text) {
+                found[field] = text;
+                matched[field] = spec.selector;
+                break;
+            }
+        }
+    }
+
+    const rows = [];
+    for (const row of document.querySelectorAll('table tr')) {
+        const cells = row.querySelectorAll('td, th');
+        if (cells.length >= 2) {
+            rows.push([cells[0].innerText, cells[1].innerText]);
+        }
+    }
+    return {fields: found, matched: matched, rows: rows};
+}
+"""
+
+def selector_spec(selector):
+    """แปลง selector ของ Playwright เป็นรูปแบบที่ตัวดึงข้อมูลใน DETAIL_EXTRACT_JS เข้าใจ"""
+    match = LABEL_SELECTOR_RE.match(selector)
+    if match:
+        tag, label, sibling_tag = match.groups()
+        return {'kind': 'label', 'tag': tag, 'label': label, 'sibling': sibling_tag, 'selector': selector}
+    return {'kind': 'css', 'selector': selector}
+
+def _clean_text(text):
+    """ตัดช่องว่างซ้ำในแต่ละบรรทัด ให้ใกล้เคียงกับ inner_text ของเบราว์เซอร์"""
+    lines = [' '.join(line.split()) for line in text.splitlines()]
+    return '\n'.join(line for line in lines if line)
+
+def _find_static(doc, selector):
+    """หา element แรกที่ตรงกับ selector ในเอกสาร lxml"""
+    match = LABEL_SELECTOR_RE.match(selector)
+    if match:
+        tag, label, sibling_tag = match.groups()
+        for element in doc.iter(tag):
+            if label in element.text_content():
+                sibling = element.getnext()
+                if sibling is not None and sibling.tag == sibling_tag:
+                    return sibling
+        return None
+    
+    match = CLASS_SELECTOR_RE.match(selector)
+    if match:
+        found = doc.xpath(f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {match.group(1)} ')]")
+        return found[0] if found else None
+    
+    match = ATTR_SELECTOR_RE.match(selector)
+    if match:
+        found = doc.xpath(f"//*[@{match.group(1)}='{match.group(2)}']")
+        return found[0] if found else None
+    
+    return None
+
+def extract_details_from_html(html, detail_selectors):
+    """แยกข้อมูลรายละเอียดจาก HTML แบบ static ด้วยกฎเดียวกับ detail_selectors"""
+    doc = lxml_html.fromstring(html)
+    
+    fields = {}
+    matched = {}
+    for field, selectors in detail_selectors.items():
+        for selector in selectors:
+            element = _find_static(doc, selector)
+            if element is not None:
+                text = _clean_text(element.text_content())
+                if text:
+                    fields[field] = text
+                    matched[field] = selector
+                    break
+    
+    rows = []
+    for tr in doc.iter('tr'):
+        cells = [cell for cell in tr if cell.tag in ('td', 'th')]
+        if len(cells) >= 2:
+            rows.append((_clean_text(cells[0].text_content()), _clean_text(cells[1].text_content())))
+    
+    return fields, rows, matched
+
+def normalize_url(url):
+    """ทำ URL ให้อยู่ในรูปเดียวกัน (host ตัวเล็ก, ไม่มี fragment/slash ท้าย, query เรียงลำดับ)"""
+    parts = urlparse(url.strip())
+    netloc = parts.netloc.lower()
+    if (parts.scheme == 'https' and netloc.endswith(':443')) or (parts.scheme == 'http' and netloc.endswith(':80')):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunparse((parts.scheme.lower(), netloc, path, '', query, ''))
+
+class ProgramIndex:
+    """รวมหลักสูตรจากหลายคำค้น โดยใช้ URL ที่ normalize แล้วเป็น key - ดึงแต่ละหลักสูตรครั้งเดียว"""
 
-class EnhancedTCASScraper:
     def __init__(self):
+        self._programs = {}
+        self.added = 0
+
+    def add(self, program_info):
+        """เพิ่มหลักสูตร - คืน True ถ้าเป็นหลักสูตรใหม่ ถ้าซ้ำจะรวมคำค้นเข้าแถวเดิม"""
+        self.added += 1
+        key = normalize_url(program_info['url'])
+        existing = self._programs.get(key)
+        if existing is None:
+            self._programs[key] = {**program_info, 'keywords': [program_info['keyword']]}
+            return True
+        
+        if program_info['keyword'] not in existing['keywords']:
+            existing['keywords'].append(program_info['keyword'])
+        return False
+
+    def __contains__(self, url):
+        return normalize_url(url) in self._programs
+
+    def get(self, url):
+        return self._programs.get(normalize_url(url))
+
+    def __len__(self):
+        return len(self._programs)
+
+    def programs(self):
+        """หลักสูตรทั้งหมดตามลำดับที่พบครั้งแรก"""
+        return list(self._programs.values())
+
+class SelectorRegistry:
+    """เก็บสถิติ hit/miss และเวลาของ selector แต่ละตัวต่อประเภทหน้า แล้วเรียงให้ตัวที่ได้ผลถูกลองก่อน"""
+
+    def __init__(self, path=None, stale_after=10):
+        # path=None = เก็บในหน่วยความจำอย่างเดียว ไม่บันทึกข้ามรอบ
+        self.path = path
+        # miss ติดกันกี่ครั้งจึงถือว่า selector ที่เคยใช้ได้ "หยุดทำงาน"
+        self.stale_after = stale_after
+        self.stats = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.stats = json.load(f)
+
+    def _entry(self, page_type, selector):
+        return self.stats.setdefault(page_type, {}).setdefault(selector, {
+            'hits': 0,
+            'misses': 0,
+            'miss_streak': 0,
+            'total_ms': 0.0,
+            'last_hit': None
+        })
+
+    def record(self, page_type, selector, hit, latency_ms=0.0):
+        """บันทึกผลการลอง selector หนึ่งครั้ง"""
+        entry = self._entry(page_type, selector)
+        entry['total_ms'] += latency_ms
+        if hit:
+            entry['hits'] += 1
+            entry['miss_streak'] = 0
+            entry['last_hit'] = datetime.now().isoformat(timespec='seconds')
+        else:
+            entry['misses'] += 1
+            entry['miss_streak'] += 1
+
+    def hit_rate(self, page_type, selector):
+        """อัตรา hit แบบ smoothing (selector ที่ยังไม่เคยลองได้ 0.5)"""
+        entry = self.stats.get(page_type, {}).get(selector)
+        if entry is None:
+            return 0.5
+        return (entry['hits'] + 1) / (entry['hits'] + entry['misses'] + 2)
+
+    def ranked(self, page_type, candidates):
+        """เรียง selector ตาม hit rate จากมากไปน้อย (เท่ากันใช้ลำดับเดิม)"""
+        return sorted(candidates, key=lambda selector: -self.hit_rate(page_type, selector))
+
+    def report(self):
+        """selector ที่เคยใช้ได้แต่ miss ติดกันเกินเกณฑ์ (สัญญาณว่าเว็บเปลี่ยนโครงสร้าง)"""
+        flagged = []
+        for page_type, selectors in self.stats.items():
+            for selector, entry in selectors.items():
+                if entry['hits'] > 0 and entry['miss_streak'] >= self.stale_after:
+                    flagged.append({
+                        'page_type': page_type,
+                        'selector': selector,
+                        'miss_streak': entry['miss_streak'],
+                        'last_hit': entry['last_hit']
+                    })
+        return flagged
+
+    def print_report(self):
+        """แสดงสถิติ selector และเตือน selector ที่หยุดทำงาน"""
+        print("\n🎯 สถิติ selector:")
+        for page_type, selectors in self.stats.items():
+            print(f"   [{page_type}]")
+            for selector in self.ranked(page_type, list(selectors)):
+                entry = selectors[selector]
+                attempts = entry['hits'] + entry['misses']
+                avg_ms = entry['total_ms'] / attempts if attempts else 0
+                print(f"      {entry['hits']:4d}/{attempts:<4d} {avg_ms:7.1f} ms  {selector}")
+        
+        for item in self.report():
+            print(f"   ⚠️ {item['page_type']}: {item['selector']} หยุดทำงาน "
+                  f"(miss ติดกัน {item['miss_streak']} ครั้ง, hit ล่าสุด {item['last_hit']})")
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, ensure_ascii=False, indent=2)
+
+class PageCache:
+    """แคชหน้าเว็บบนดิสก์ (SQLite) ใช้ URL เป็น key พร้อม TTL และการตรวจสอบซ้ำแบบมีเงื่อนไข"""
+
+    def __init__(self, path='tcas_cache.sqlite', ttl=24 * 3600, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        # หลาย process (shard) ใช้ไฟล์เดียวกัน: WAL อ่านได้ระหว่างมีการเขียน และรอ lock สูงสุด 30 วินาทีแทนการ error ทันที
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (accessed_at)")
+        self.conn.commit()
+
+    def get(self, url):
+        """คืนข้อมูลแคชของ URL (dict) หรือ None ถ้าไม่มี"""
+        row = self.conn.execute(
+            "SELECT body, etag, last_modified, content_hash, fetched_at FROM pages WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        self.conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+        body, etag, last_modified, content_hash, fetched_at = row
+        return {
+            'url': url,
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': content_hash,
+            'fetched_at': fetched_at
+        }
+
+    def is_fresh(self, entry):
+        """ยังไม่หมดอายุตาม TTL หรือไม่"""
+        return entry is not None and time.time() - entry['fetched_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        """header สำหรับ request แบบมีเงื่อนไข (If-None-Match / If-Modified-Since)"""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """บันทึกหน้าเว็บ - คืน True ถ้าเนื้อหาเปลี่ยนจากที่แคชไว้"""
+        content_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+        previous = self.conn.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        now = time.time()
+        self.conn.execute(
+            """INSERT OR REPLACE INTO pages
+               (url, body, etag, last_modified, content_hash, fetched_at, accessed_at, size)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (url, body, etag, last_modified, content_hash, now, now, len(body.encode('utf-8')))
+        )
+        self.conn.commit()
+        self._evict()
+        return previous is None or previous[0] != content_hash
+
+    def touch(self, url):
+        """ต่ออายุรายการที่ตรวจสอบแล้วว่าไม่เปลี่ยนแปลง (304)"""
+        now = time.time()
+        self.conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+        self.conn.commit()
+
+    def _evict(self):
+        """ลบรายการที่ใช้ล่าสุดนานที่สุดจนขนาดรวมไม่เกิน max_bytes"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        for url, size in self.conn.execute("SELECT url, size FROM pages ORDER BY accessed_at").fetchall():
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class RunJournal:
+    """บันทึกการ scrape แบบทำต่อได้: เขียนทุกแถวลงดิสก์ทันทีและจำ URL ที่ดึงเสร็จแล้ว"""
+
+    def __init__(self, run_id=None, root='runs'):
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.dir = os.path.join(root, self.run_id)
+        os.makedirs(self.dir, exist_ok=True)
+        
+        self.meta_path = os.path.join(self.dir, 'meta.json')
+        self.programs_path = os.path.join(self.dir, 'programs.json')
+        self.rows_path = os.path.join(self.dir, 'rows.jsonl')
+        self.done_path = os.path.join(self.dir, 'done.txt')
+        
+        self.done = set()
+        if os.path.exists(self.done_path):
+            with open(self.done_path, encoding='utf-8') as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        # ตัดบรรทัดสุดท้ายที่เขียนไม่ครบตอนโปรแกรมหยุด - ไม่อย่างนั้นแถวแรกหลัง resume จะต่อท้ายบรรทัดนั้น
+        self._truncate_partial_line(self.rows_path)
+        self._row_urls = {normalize_url(row['ลิงก์']) for row in self.iter_rows()}
+        self.row_count = len(self._row_urls)
+        
+        self._rows_file = open(self.rows_path, 'a', encoding='utf-8')
+        self._done_file = open(self.done_path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def exists(run_id, root='runs'):
+        return os.path.exists(os.path.join(root, run_id, 'meta.json'))
+
+    def load_meta(self):
+        if not os.path.exists(self.meta_path):
+            return {}
+        with open(self.meta_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_meta(self, **meta):
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump({**self.load_meta(), **meta}, f, ensure_ascii=False, indent=2)
+
+    def load_programs(self):
+        """รายการหลักสูตรจากขั้นตอนค้นหาที่บันทึกไว้ (None ถ้ายังไม่เคยค้นหา)"""
+        if not os.path.exists(self.programs_path):
+            return None
+        with open(self.programs_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_programs(self, programs):
+        with open(self.programs_path, 'w', encoding='utf-8') as f:
+            json.dump(programs, f, ensure_ascii=False)
+
+    def is_done(self, url):
+        return url in self.done
+
+    def has_row(self, url):
+        """มีแถวของ URL นี้ใน rows.jsonl แล้ว (เทียบแบบ normalize)"""
+        return normalize_url(url) in self._row_urls
+
+    def record(self, url, data):
+        """เขียนแถวและทำเครื่องหมาย URL ว่าเสร็จ (แถวที่ล้มเหลวจะถูกลองใหม่ตอน resume)"""
+        if not data:
+            return
+        
+        self._rows_file.write(json.dumps(data, ensure_ascii=False) + '\n')
+        self._rows_file.flush()
+        os.fsync(self._rows_file.fileno())
+        
+        self._done_file.write(url + '\n')
+        self._done_file.flush()
+        os.fsync(self._done_file.fileno())
+        
+        self.done.add(url)
+        row_url = normalize_url(data['ลิงก์'])
+        if row_url not in self._row_urls:
+            self._row_urls.add(row_url)
+            self.row_count += 1
+
+    def iter_rows(self):
+        """อ่านแถวทีละแถวจากดิสก์ - ข้ามบรรทัดที่เขียนไม่ครบ และแถวซ้ำของ URL เดียวกัน
+        (โปรแกรมหยุดหลังเขียนแถวแต่ก่อนบันทึก done.txt URL นั้นจะถูกดึงซ้ำตอน resume)"""
+        if not os.path.exists(self.rows_path):
+            return
+        seen = set()
+        with open(self.rows_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                url = normalize_url(row['ลิงก์'])
+                if url in seen:
+                    continue
+                seen.add(url)
+                yield row
+
+    @staticmethod
+    def _truncate_partial_line(path, chunk_size=65536):
+        """ตัดไฟล์ให้จบที่ '\n' ตัวสุดท้าย (อ่านย้อนจากท้ายไฟล์ทีละช่วง)"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - chunk_size)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                f.truncate(position)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self):
+        self._rows_file.close()
+        self._done_file.close()
+
+class ParquetRowWriter:
+    """เขียนแถวลง Parquet ทีละ row group ระหว่าง scrape แบ่งโฟลเดอร์ตามวันที่เก็บข้อมูล
+    เขียนลงไฟล์ชั่วคราว (ขึ้นต้นด้วย '.' - pyarrow และแดชบอร์ดไม่อ่าน) แล้วเปลี่ยนชื่อตอน close()
+    ไฟล์ที่ยังไม่มี footer จึงไม่ปรากฏในโฟลเดอร์ผลลัพธ์"""
+
+    def __init__(self, root='tcas_parquet', row_group_size=500, prefix='enhanced_tcas_data'):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.prefix = prefix
+        self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.rows_written = 0
+        self.paths = []
+        self._buffer = []
+        self._writers = {}
+        self._temp_paths = {}
+
+    def append(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def _to_table(self, df):
+        """แปลง DataFrame เป็นตาราง Arrow พร้อมชนิดข้อมูลจริง"""
+        columns = {}
+        for column in df.columns:
+            if column in DICTIONARY_COLUMNS:
+                columns[column] = pa.array(df[column].astype(str).tolist(), type=pa.string()).dictionary_encode()
+            elif column == 'วันที่เก็บข้อมูล':
+                columns[column] = pa.array(pd.to_datetime(df[column]).dt.to_pydatetime(), type=pa.timestamp('s'))
+            else:
+                columns[column] = pa.Array.from_pandas(df[column])
+        return pa.table(columns)
+
+    def flush(self):
+        """เขียนแถวที่ค้างอยู่เป็น row group (แยกไฟล์ตามวันที่เก็บข้อมูล)"""
+        if not self._buffer:
+            return
+        
+        df = normalize_fees(pd.DataFrame(self._buffer))
+        self._buffer = []
+        scrape_date = pd.to_datetime(df['วันที่เก็บข้อมูล']).dt.strftime('%Y-%m-%d')
+        for date, part in df.groupby(scrape_date, sort=True):
+            table = self._to_table(part.reset_index(drop=True))
+            writer = self._writers.get(date)
+            if writer is None:
+                directory = os.path.join(self.root, f"scrape_date={date}")
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"{self.prefix}_{self.timestamp}.parquet")
+                temp_path = os.path.join(directory, f".{self.prefix}_{self.timestamp}.parquet.tmp")
+                writer = pq.ParquetWriter(temp_path, table.schema, compression='zstd')
+                self._writers[date] = writer
+                self._temp_paths[path] = temp_path
+            writer.write_table(table.cast(writer.schema))
+            self.rows_written += len(part)
+
+    def close(self, keywords=None):
+        """เขียนแถวที่ค้างอยู่ ปิดไฟล์ (เขียน footer) แล้วเปลี่ยนเป็นชื่อจริง - คืนรายการไฟล์ทั้งหมด
+        keywords ({URL ที่ normalize แล้ว: [คำค้น]}) แก้คอลัมน์คำค้นของแถวที่เขียนไปก่อนรวมคำค้นครบ (โหมด pipeline)"""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        for path, temp_path in self._temp_paths.items():
+            if keywords:
+                self._rewrite_keywords(temp_path, keywords)
+            os.replace(temp_path, path)
+            self.paths.append(path)
+        self._writers = {}
+        self._temp_paths = {}
+        return self.paths
+
+    @staticmethod
+    def _rewrite_keywords(path, keywords):
+        """เขียนไฟล์ใหม่ทีละ row group โดยแทนคอลัมน์คำค้นด้วยคำค้นสุดท้ายของแต่ละลิงก์"""
+        source = pq.ParquetFile(path)
+        schema = source.schema_arrow
+        column = schema.get_field_index('คำค้น')
+        rewritten_path = f"{path}.keywords"
+        with pq.ParquetWriter(rewritten_path, schema, compression='zstd') as writer:
+            for i in range(source.num_row_groups):
+                table = source.read_row_group(i)
+                values = [
+                    KEYWORD_SEPARATOR.join(keywords[normalize_url(link)]) if normalize_url(link) in keywords else current
+                    for link, current in zip(table.column('ลิงก์').to_pylist(), table.column(column).to_pylist())
+                ]
+                updated = pa.array(values, type=pa.string()).dictionary_encode().cast(schema.field(column).type)
+                writer.write_table(table.set_column(column, schema.field(column), updated))
+        source.close()
+        os.replace(rewritten_path, path)
+
+class PagePool:
+    """หน้าเบราว์เซอร์ที่ worker ใช้ร่วมกัน - สร้างเมื่อต้องใช้จริงเท่านั้น ไม่เกิน size หน้า"""
+
+    def __init__(self, context, size):
+        self.context = context
+        self.size = size
+        self.pages = []
+        self._idle = asyncio.Queue()
+        # หน้าที่สร้างแล้วหรือกำลังสร้าง - จองก่อน await ไม่อย่างนั้นผู้เรียกพร้อมกันผ่านเงื่อนไขได้ทุกราย
+        self._reserved = 0
+
+    async def acquire(self):
+        if self._idle.empty() and self._reserved < self.size:
+            self._reserved += 1
+            try:
+                page = await self.context.new_page()
+            except BaseException:
+                self._reserved -= 1
+                raise
+            self.pages.append(page)
+            return page
+        return await self._idle.get()
+
+    def release(self, page):
+        self._idle.put_nowait(page)
+
+    async def close(self):
+        for page in self.pages:
+            await page.close()
+
+class RetryableError(Exception):
+    """ข้อผิดพลาดชั่วคราว (timeout, 429, 5xx) ที่ลองใหม่ได้"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class CircuitOpenError(Exception):
+    """อัตราข้อผิดพลาดสูงเกินเกณฑ์ซ้ำหลายรอบ - หยุด scrape เพื่อไม่ให้ถูกบล็อก"""
+
+class RateController:
+    """ควบคุมอัตราการดึงแบบ AIMD: ตอบปกติค่อยๆ เพิ่ม concurrency/ลดเวลาหน่วง
+    เจอ timeout/429/5xx ลด concurrency ครึ่งหนึ่งและหน่วงเพิ่มสองเท่า
+    และตัดวงจร (หยุดพัก) เมื่ออัตราข้อผิดพลาดในช่วงล่าสุดสูงเกินเกณฑ์"""
+
+    def __init__(self, concurrency=1, delay=1.5, adaptive=False, max_concurrency=None, min_delay=0.2,
+                 max_delay=30.0, increase_every=5, window=20, min_samples=10, error_threshold=0.5,
+                 cooldown=30.0, max_trips=3):
+        concurrency = max(1, int(concurrency))
+        # ไม่ใช้ --adaptive: ค่าที่ตั้งไว้เป็นเพดาน ลดลงเมื่อเว็บมีปัญหาแล้วค่อยๆ กลับมาเท่าเดิม
+        self.max_concurrency = max(concurrency, int(max_concurrency or concurrency * 4)) if adaptive else concurrency
+        self.min_delay = min(min_delay, delay) if adaptive else delay
+        self.max_delay = max(max_delay, delay)
+        self.base_delay = delay
+        self.limit = concurrency
+        self.delay = delay
+        self.increase_every = increase_every
+        self.min_samples = min_samples
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.active = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.trips = 0
+        self._streak = 0
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+        self._condition = None
+
+    def reset(self):
+        """เริ่มรอบใหม่ใน event loop ใหม่ (Condition ผูกกับ loop ที่สร้าง)"""
+        self.active = 0
+        self._condition = None
+
+    @asynccontextmanager
+    async def slot(self):
+        """จำกัดจำนวน request พร้อมกันตาม limit ปัจจุบัน (ปรับขึ้นลงได้ระหว่างรัน)"""
+        await self.wait_closed()
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+    async def wait_closed(self):
+        """วงจรเปิดอยู่ = รอจนพ้นช่วงพัก แล้วกลับมาแบบ half-open (concurrency 1)"""
+        remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    async def pace(self, base=None):
+        """หน่วงเวลาก่อน request ถัดไป - base คือเวลาหน่วงตั้งต้นของจุดนั้น (ปรับตามอัตราปัจจุบัน)"""
+        await self.wait_closed()
+        wait = self.delay
+        if base is not None:
+            wait = base * self.delay / self.base_delay if self.base_delay else base
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def backoff(self, attempt, retry_after=None):
+        """เวลารอก่อนลองใหม่: exponential backoff แบบสุ่ม (jitter) ไม่น้อยกว่า Retry-After ของเซิร์ฟเวอร์"""
+        wait = min(self.max_delay, max(self.base_delay, 1.0) * 2 ** attempt) * random.uniform(0.5, 1.5)
+        return max(wait, retry_after or 0)
+
+    def on_success(self):
+        """เพิ่มแบบบวก: ลดเวลาหน่วง 0.1 วินาทีทุกครั้ง และเพิ่ม concurrency 1 ทุก increase_every ครั้งติดกัน"""
+        self.successes += 1
+        self._outcomes.append(True)
+        self.delay = max(self.min_delay, round(self.delay - 0.1, 3))
+        self._streak += 1
+        if self._streak >= self.increase_every:
+            # worker ที่รอ slot จะถูกปลุกเมื่อ request ที่กำลังทำอยู่คืน slot
+            self._streak = 0
+            self.limit = min(self.max_concurrency, self.limit + 1)
+
+    def on_failure(self):
+        """ลดแบบคูณ: concurrency ลดครึ่งหนึ่ง เวลาหน่วงเพิ่มสองเท่า แล้วตรวจว่าต้องตัดวงจรหรือไม่"""
+        self.failures += 1
+        self._outcomes.append(False)
+        self._streak = 0
+        self.limit = max(1, self.limit // 2)
+        self.delay = min(self.max_delay, max(self.delay * 2, 0.5))
+        
+        errors = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_samples and errors / len(self._outcomes) >= self.error_threshold:
+            self.trips += 1
+            if self.trips > self.max_trips:
+                raise CircuitOpenError(
+                    f"อัตราข้อผิดพลาด {errors}/{len(self._outcomes)} เกินเกณฑ์ {self.max_trips + 1} รอบ"
+                )
+            print(f"\n🛑 ข้อผิดพลาด {errors}/{len(self._outcomes)} ครั้งล่าสุด - หยุดพัก {self.cooldown:.0f} วินาที")
+            self._open_until = time.monotonic() + self.cooldown
+            self._outcomes.clear()
+            self.limit = 1
+
+    def summary(self):
+        return (f"สำเร็จ {self.successes}, ผิดพลาดชั่วคราว {self.failures}, ลองใหม่ {self.retries}, "
+                f"ตัดวงจร {self.trips}, concurrency สุดท้าย {self.limit}/{self.max_concurrency}, "
+                f"หน่วง {self.delay:.2f} วินาที")
+
+class LatencyHistogram:
+    """histogram เวลาที่ใช้ (วินาที) แบบ bucket สะสมของ Prometheus - ขนาดคงที่ไม่ว่าจะรันนานแค่ไหน
+    percentile ประมาณจาก bucket แบบ histogram_quantile (ไม่เก็บค่าดิบ)"""
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """ค่าที่ตำแหน่ง q - interpolate เชิงเส้นภายใน bucket ที่มีอันดับนั้น (ขอบบนไม่เกินค่าสูงสุดที่เคยพบ)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = min(self.BUCKETS[i], self.max) if i < len(self.BUCKETS) else self.max
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = upper
+        return self.max
+
+    def merge(self, data):
+        if len(data['counts']) != len(self.counts):
+            # ไฟล์จากรุ่นที่ใช้ bucket ต่างกัน - รวมได้แค่จำนวนและผลรวม
+            self.counts[-1] += data['count']
+        else:
+            self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+        self.count += data['count']
+        self.sum += data['sum']
+        self.max = max(self.max, data.get('max', 0.0))
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'p50': round(self.percentile(0.5), 4),
+            'p95': round(self.percentile(0.95), 4),
+            'max': round(self.max, 4),
+            'counts': self.counts
+        }
+
+class ScrapeMetrics:
+    """ตัวเก็บ metrics ของการ scrape: เวลาแต่ละขั้นตอน (phase) ตัวนับ และค่าล่าสุด (gauge)
+    ส่งออกเป็น JSON และ Prometheus text format และแสดงความคืบหน้าพร้อม ETA ได้"""
+    PREFIX = 'tcas_scrape'
+    HELP = {
+        'pages': 'หน้าที่ดึงเสร็จ แยกตามชนิดและแหล่งที่มา',
+        'requests': 'request ที่ส่งไปยังเว็บ แยกตามช่องทางและ status',
+        'bytes': 'ขนาดเอกสารที่ดาวน์โหลด (ไบต์)',
+        'retries': 'จำนวนครั้งที่ลองใหม่',
+        'errors': 'ข้อผิดพลาด แยกตามชนิดและขั้นตอน',
+        'selector_misses': 'selector ที่ลองแล้วไม่พบ แยกตามชนิดหน้า'
+    }
+
+    def __init__(self, progress=False):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.progress = progress
+        self.total = 0
+        self.done = 0
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """จับเวลาขั้นตอนหนึ่ง (ใช้ได้ทั้งโค้ดปกติและโค้ดที่มี await ข้างใน)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def observe(self, name, seconds):
+        self.histograms.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def count(self, name, **labels):
+        """ผลรวมของตัวนับ name ทุก label ที่ตรงกับ labels"""
+        return sum(
+            value for (key, key_labels), value in self.counters.items()
+            if key == name and all(item in key_labels for item in labels.items())
+        )
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def pages_per_second(self):
+        elapsed = self.elapsed()
+        return self.count('pages', kind='detail') / elapsed if elapsed > 0 else 0.0
+
+    def start(self):
+        """เริ่มนับเวลาของรอบ (pages/sec และ ETA นับจากจุดนี้)"""
+        self._started = time.perf_counter()
+        self.done = 0
+
+    def set_total(self, total):
+        self.total = total
+
+    def advance(self):
+        """นับหลักสูตรที่เสร็จแล้ว และแสดงบรรทัดความคืบหน้าถ้าเปิดไว้"""
+        self.done += 1
+        if not self.progress:
+            return
+        rate = self.done / self.elapsed()
+        remaining = max(0, self.total - self.done)
+        eta = time.strftime('%H:%M:%S', time.gmtime(remaining / rate)) if rate > 0 else '-'
+        percent = f" ({self.done * 100 // self.total}%)" if self.total else ""
+        print(f"\n   ⏱️ {self.done}/{self.total}{percent} · {rate:.2f} หลักสูตร/วินาที · เหลืออีก ~{eta}")
+
+    def merge(self, data):
+        """รวม metrics ที่ส่งออกเป็น dict (เช่นจาก shard อื่น) เข้ากับชุดนี้"""
+        for counter in data.get('counters', []):
+            self.inc(counter['name'], counter['value'], **counter['labels'])
+        for name, histogram in data.get('phases', {}).items():
+            self.histograms.setdefault(name, LatencyHistogram()).merge(histogram)
+
+    @staticmethod
+    def load(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def to_dict(self):
+        return {
+            'elapsed_seconds': round(self.elapsed(), 3),
+            'pages_per_second': round(self.pages_per_second(), 4),
+            'gauges': self.gauges,
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+            'phases': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+        }
+
+    def to_prometheus(self):
+        """metrics ในรูปแบบ Prometheus text exposition (ใช้กับ node_exporter textfile collector ได้)"""
+        def label_text(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+        
+        lines = [
+            f"# TYPE {self.PREFIX}_elapsed_seconds gauge",
+            f"{self.PREFIX}_elapsed_seconds {self.elapsed():.3f}",
+            f"# TYPE {self.PREFIX}_pages_per_second gauge",
+            f"{self.PREFIX}_pages_per_second {self.pages_per_second():.4f}"
+        ]
+        for name, value in sorted(self.gauges.items()):
+            lines += [f"# TYPE {self.PREFIX}_{name} gauge", f"{self.PREFIX}_{name} {value}"]
+        
+        for name in sorted({name for name, _ in self.counters}):
+            metric = f"{self.PREFIX}_{name}_total"
+            if name in self.HELP:
+                lines.append(f"# HELP {metric} {self.HELP[name]}")
+            lines.append(f"# TYPE {metric} counter")
+            for (key, labels), value in sorted(self.counters.items()):
+                if key == name:
+                    lines.append(f"{metric}{label_text(labels)} {value}")
+        
+        metric = f"{self.PREFIX}_phase_seconds"
+        if self.histograms:
+            lines.append(f"# TYPE {metric} histogram")
+        for name, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(LatencyHistogram.BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{phase="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{phase="{name}"}} {histogram.sum:.4f}')
+            lines.append(f'{metric}_count{{phase="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path):
+        """เขียน <path>.json และ <path>.prom - คืนรายการไฟล์ที่เขียน"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(f"{path}.json", 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        with open(f"{path}.prom", 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        return [f"{path}.json", f"{path}.prom"]
+
+    def print_summary(self):
+        print(f"\n📈 เวลาแต่ละขั้นตอน ({self.elapsed():.1f} วินาที, {self.pages_per_second():.2f} หน้า/วินาที):")
+        for name, histogram in sorted(self.histograms.items(), key=lambda item: -item[1].sum):
+            print(f"   {name:<10} {histogram.count:5d} ครั้ง  รวม {histogram.sum:7.1f}s  "
+                  f"p50 {histogram.percentile(0.5):6.2f}s  p95 {histogram.percentile(0.95):6.2f}s")
+        print(f"   📦 {self.count('bytes') / 1024:.0f} KB · 🔁 ลองใหม่ {self.count('retries')} · "
+              f"❌ ผิดพลาด {self.count('errors')} · 🔎 selector ไม่พบ {self.count('selector_misses')}")
+
+class EnhancedTCASScraper:
+    # ใช้ selector ที่เฉพาะเจาะจงตามตัวอย่าง
+    SEARCH_SELECTORS = [
+        "input[placeholder='พิมพ์ชื่อมหาวิทยาลัย คณะ หรือหลักสูตร']",
+        "input[placeholder*='ค้นหา']",
+        "input[type='search']",
+        "input.search-input",
+        "#search-input"
+    ]
+    
+    # selector ของผลลัพธ์การค้นหา
+    RESULT_SELECTORS = [
+        ".t-programs > li",
+        ".program-list li",
+        ".search-results li",
+        ".results li",
+        "[data-testid='program-item']"
+    ]
+    
+    # selector ของข้อมูลรายละเอียดแต่ละฟิลด์
+    DETAIL_SELECTORS = {
+        'ประเภทหลักสูตร': [
+            "dt:has-text('ประเภทหลักสูตร') + dd",
+            "td:has-text('ประเภทหลักสูตร') + td",
+            ".program-type",
+            "[data-field='program_type']"
+        ],
+        'ค่าใช้จ่าย': [
+            "dt:has-text('ค่าใช้จ่าย') + dd",
+            "dt:has-text('ค่าธรรมเนียม') + dd",
+            "td:has-text('ค่าใช้จ่าย') + td",
+            ".fee-info",
+            ".tuition-fee",
+            "[data-field='fee']"
+        ]
+    }
+    
+    # ปุ่มหน้าถัดไป / โหลดเพิ่ม ของผลการค้นหา
+    NEXT_PAGE_SELECTORS = [
+        "a[rel='next']",
+        ".pagination .next a",
+        "li.next a",
+        "button:has-text('โหลดเพิ่ม')",
+        "button:has-text('ดูเพิ่มเติม')"
+    ]
+    
+    # resource ที่ไม่จำเป็นต่อการดึงข้อมูล (ตัดทิ้งในโหมดเร็ว)
+    BLOCKED_RESOURCE_TYPES = {'image', 'font', 'media'}
+    BLOCKED_URL_PATTERNS = [
+        'google-analytics.com',
+        'googletagmanager.com',
+        'doubleclick.net',
+        'facebook.net',
+        'connect.facebook',
+        'hotjar.com',
+        '/gtag/js'
+    ]
+
+    def __init__(self, concurrency=1, per_host_limit=None, delay=1.5, fast_mode=False, http_mode=False,
+                 cache=None, journal=None, selectors=None, pipeline=False, queue_size=None,
+                 parquet=None, adaptive=False, max_concurrency=None, retries=2, metrics=None, headless=False):
         self.programs_data = []
         self.base_url = "https://course.mytcas.com"
+        # จำนวนหน้าที่ดึงรายละเอียดพร้อมกัน (1 = ทีละหน้าแบบเดิม)
+        self.concurrency = max(1, int(concurrency))
+        # หน่วงเวลาหลังดึงแต่ละหน้า (วินาที)
+        self.delay = delay
+        # ปรับ concurrency/เวลาหน่วงตามการตอบของเว็บ (adaptive=True ให้เร็วกว่าค่าที่ตั้งได้)
+        self.rate = RateController(self.concurrency, delay, adaptive=adaptive, max_concurrency=max_concurrency)
+        # จำนวนครั้งที่ลองใหม่เมื่อเจอ timeout/429/5xx
+        self.retries = max(0, int(retries))
+        # จำนวน request พร้อมกันสูงสุดต่อ host (ค่าเริ่มต้นเท่ากับ concurrency สูงสุด)
+        self.per_host_limit = max(1, int(per_host_limit or self.rate.max_concurrency))
+        # โหมดเร็ว: ตัด resource ที่ไม่จำเป็นและรอเฉพาะ element ที่ต้องใช้
+        self.fast_mode = fast_mode
+        # โหมด HTTP: ดึงหน้ารายละเอียดด้วย HTTP client ก่อน ใช้เบราว์เซอร์เมื่อจำเป็นเท่านั้น
+        self.http_mode = http_mode
+        if self.http_mode and httpx is None:
+            print("⚠️ ไม่พบ httpx/lxml - ใช้เบราว์เซอร์ดึงข้อมูลแทน")
+            self.http_mode = False
+        # แคชหน้าเว็บบนดิสก์ (PageCache) - None = ดึงใหม่ทุกครั้ง
+        self.cache = cache
+        # บันทึกแบบทำต่อได้ (RunJournal) - None = เก็บผลไว้ในหน่วยความจำแบบเดิม
+        self.journal = journal
+        # สถิติ selector (SelectorRegistry) ใช้เรียงลำดับ fallback selector
+        self.selectors = selectors or SelectorRegistry()
+        # โหมด pipeline: ดึงรายละเอียดทันทีที่ค้นพบ พร้อมอ่านผลการค้นหาทุกหน้า
+        self.pipeline = pipeline
+        self.queue_size = queue_size
+        # เขียน Parquet ทีละแถวระหว่าง scrape (ParquetRowWriter) - None = ไม่เขียน
+        self.parquet = parquet
+        # เปิดเบราว์เซอร์แบบไม่แสดงหน้าต่าง (ใช้กับเซิร์ฟเวอร์/benchmark)
+        self.headless = headless
+        # เวลาแต่ละขั้นตอนและตัวนับต่างๆ (ScrapeMetrics)
+        self.metrics = metrics or ScrapeMetrics()
+        self._host_semaphores = {}
+        # ProgramIndex ของโหมด pipeline - คำค้นที่พบภายหลังใช้แก้ Parquet ตอนปิดไฟล์
+        self._program_index = None
+
+    async def _block_resources(self, route):
+        """ตัด request รูปภาพ ฟอนต์ มีเดีย และ analytics"""
+        request = route.request
+        if (request.resource_type in self.BLOCKED_RESOURCE_TYPES
+                or any(pattern in request.url for pattern in self.BLOCKED_URL_PATTERNS)):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _goto(self, page, url, settle_ms=2000):
+        """เปิดหน้าเว็บ - โหมดเร็วรอแค่ DOM พร้อม ไม่รอ network idle (timeout/429/5xx = RetryableError)"""
+        try:
+            with self.metrics.phase('goto'):
+                if self.fast_mode:
+                    response = await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+                else:
+                    response = await page.goto(url, wait_until='networkidle', timeout=30000)
+        except PlaywrightTimeoutError as e:
+            self.metrics.inc('requests', channel='browser', status='timeout')
+            raise RetryableError(f"timeout: {url}") from e
+        
+        if response is not None:
+            self.metrics.inc('requests', channel='browser', status=str(response.status))
+            # ขนาดเฉพาะตัวเอกสาร (Content-Length) ไม่รวม resource อื่นในหน้า
+            self.metrics.inc('bytes', int(response.headers.get('content-length') or 0), channel='browser')
+            if response.status == 429 or response.status >= 500:
+                raise RetryableError(f"HTTP {response.status}: {url}", status=response.status)
+        if not self.fast_mode:
+            with self.metrics.phase('wait'):
+                await page.wait_for_timeout(settle_ms)
+        return response
+
+    async def _race_selectors(self, page, selectors, timeout=5000):
+        """รอ selector หลายตัวพร้อมกัน แล้วคืน (selector, element) ตัวแรกที่พบ"""
+        with self.metrics.phase('selector'):
+            return await self._first_selector(page, selectors, timeout)
+
+    async def _first_selector(self, page, selectors, timeout):
+        tasks = {
+            asyncio.ensure_future(page.wait_for_selector(selector, timeout=timeout)): selector
+            for selector in selectors
+        }
+        priority = {selector: i for i, selector in enumerate(selectors)}
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # ถ้าเจอพร้อมกันหลายตัว เลือกตามลำดับความสำคัญเดิม
+                for task in sorted(done, key=lambda t: priority[tasks[t]]):
+                    if task.exception() is None and task.result():
+                        return tasks[task], task.result()
+            return None, None
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
     async def search_and_collect_programs(self, page, keyword):
         """ค้นหาและรวบรวมหลักสูตร - ใช้วิธีที่เฉพาะเจาะจง"""
+        with self.metrics.phase('search'):
+            return await self._search_programs(page, keyword)
+
+    async def _search_programs(self, page, keyword):
         programs = []
         
         try:
             print(f"\n🔍 ค้นหา: {keyword}")
             
-            # ไปหน้าหลัก
-            await page.goto(self.base_url, wait_until='networkidle', timeout=30000)
-            await page.wait_for_timeout(2000)
-            
-            # ใช้ selector ที่เฉพาะเจาะจงตามตัวอย่าง
-            search_selectors = [
-                "input[placeholder='พิมพ์ชื่อมหาวิทยาลัย คณะ หรือหลักสูตร']",
-                "input[placeholder*='ค้นหา']",
-                "input[type='search']",
-                "input.search-input",
-                "#search-input"
-            ]
-            
-            search_input = None
-            for selector in search_selectors:
-                try:
-                    search_input = await page.wait_for_selector(selector, timeout=5000)
-                    if search_input:
-                        print(f"  ✅ พบช่องค้นหา: {selector}")
-                        break
-                except:
-                    continue
+            # ใช้ผลการค้นหาจากแคชถ้ายังไม่หมดอายุ
+            cache_key = f"search:{self.base_url}:{keyword}"
+            if self.cache is not None:
+                entry = self.cache.get(cache_key)
+                if self.cache.is_fresh(entry):
+                    self.cache.hits += 1
+                    programs = json.loads(entry['body'])
+                    print(f"  ♻️ ใช้ผลการค้นหาจากแคช ({len(programs)} รายการ)")
+                    self.metrics.inc('pages', kind='search', via='cache')
+                    return programs
+                self.cache.misses += 1
             
-            if not search_input:
-                print("❌ ไม่พบช่องค้นหา")
+            if not await self._submit_search(page, keyword):
                 return []
             
-            # ทำการค้นหา
-            await search_input.fill("")
-            await page.wait_for_timeout(500)
-            await search_input.fill(keyword)
-            await search_input.press("Enter")
-            await page.wait_for_timeout(3000)
-            
-            # หาผลลัพธ์ด้วย selector หลายแบบ
-            result_selectors = [
-                ".t-programs > li",
-                ".program-list li",
-                ".search-results li",
-                ".results li",
-                "[data-testid='program-item']"
-            ]
-            
-            results = []
-            for selector in result_selectors:
-                try:
-                    results = await page.query_selector_all(selector)
-                    if results:
-                        print(f"  ✅ พบผลลัพธ์: {selector} ({len(results)} รายการ)")
-                        break
-                except:
-                    continue
-            
+            selector, results = await self._find_results(page)
             if not results:
                 print("  ❌ ไม่พบผลลัพธ์")
                 return []
             
             # ประมวลผลรายการที่พบ
-            for i, li in enumerate(results):
+            for i, item in enumerate(results):
                 try:
-                    # ดึงข้อมูลพื้นฐาน
-                    title_full = await li.inner_text()
-                    
-                    # หาลิงก์
-                    link_element = await li.query_selector("a")
-                    if not link_element:
+                    program_info = self._parse_result_item(keyword, item)
+                    if program_info is None:
                         continue
-                        
-                    link = await link_element.get_attribute("href")
-                    full_link = link if link.startswith("http") else f"{self.base_url}{link}"
-                    
-                    # แยกข้อมูลจาก title
-                    lines = [line.strip() for line in title_full.strip().splitlines() if line.strip()]
                     
-                    program_name = lines[0] if len(lines) >= 1 else ""
-                    faculty = lines[1].replace('›', ' > ') if len(lines) >= 2 else ""
-                    university = lines[2] if len(lines) >= 3 else ""
-                    
-                    programs.append({
-                        'keyword': keyword,
-                        'program_name': program_name,
-                        'university': university,
-                        'faculty': faculty,
-                        'title_full': title_full,
-                        'url': full_link
-                    })
-                    
-                    print(f"  📌 {i+1:2d}. {program_name[:40]}...")
+                    programs.append(program_info)
+                    print(f"  📌 {i+1:2d}. {program_info['program_name'][:40]}...")
                     
                 except Exception as e:
                     print(f"  ❌ ข้อผิดพลาดในรายการที่ {i+1}: {str(e)}")
                     continue
             
+            if self.cache is not None and programs:
+                self.cache.put(cache_key, json.dumps(programs, ensure_ascii=False))
+            
+            self.metrics.inc('pages', kind='search', via='browser')
             return programs
             
+        except RetryableError:
+            raise
         except Exception as e:
+            self.metrics.inc('errors', kind='other', phase='search')
             print(f"❌ ข้อผิดพลาดในการค้นหา {keyword}: {str(e)}")
             return []
 
+    async def _submit_search(self, page, keyword):
+        """เปิดหน้าหลัก หาช่องค้นหา แล้วค้นหาคำค้น - คืน False ถ้าไม่พบช่องค้นหา"""
+        # ไปหน้าหลัก
+        await self._goto(page, self.base_url)
+        
+        search_input = None
+        search_selectors = self.selectors.ranked('search_input', self.SEARCH_SELECTORS)
+        if self.fast_mode:
+            # รอทุก selector พร้อมกัน แทนการรอทีละตัว
+            started = time.perf_counter()
+            selector, search_input = await self._race_selectors(page, search_selectors)
+            self._record_race('search_input', search_selectors, selector, started)
+            if search_input:
+                print(f"  ✅ พบช่องค้นหา: {selector}")
+        else:
+            for selector in search_selectors:
+                started = time.perf_counter()
+                try:
+                    with self.metrics.phase('selector'):
+                        search_input = await page.wait_for_selector(selector, timeout=5000)
+                except:
+                    search_input = None
+                self._record_selector('search_input', selector, bool(search_input), started)
+                if search_input:
+                    print(f"  ✅ พบช่องค้นหา: {selector}")
+                    break
+        
+        if not search_input:
+            print("❌ ไม่พบช่องค้นหา")
+            return False
+        
+        # ทำการค้นหา
+        await search_input.fill("")
+        if not self.fast_mode:
+            with self.metrics.phase('wait'):
+                await page.wait_for_timeout(500)
+        await search_input.fill(keyword)
+        await search_input.press("Enter")
+        return True
+
+    async def _find_results(self, page):
+        """หา selector ของผลการค้นหา - คืน (selector, รายการ {'text', 'href'})"""
+        results = []
+        result_selectors = self.selectors.ranked('result_list', self.RESULT_SELECTORS)
+        if self.fast_mode:
+            # รอจนผลลัพธ์รายการแรกปรากฏ แทนการหน่วงเวลาตายตัว
+            started = time.perf_counter()
+            selector, _ = await self._race_selectors(page, result_selectors, timeout=15000)
+            self._record_race('result_list', result_selectors, selector, started)
+            if selector:
+                results = await page.evaluate(RESULT_LIST_JS, selector)
+                print(f"  ✅ พบผลลัพธ์: {selector} ({len(results)} รายการ)")
+                return selector, results
+        else:
+            with self.metrics.phase('wait'):
+                await page.wait_for_timeout(3000)
+            
+            # หาผลลัพธ์ด้วย selector หลายแบบ
+            for selector in result_selectors:
+                started = time.perf_counter()
+                try:
+                    with self.metrics.phase('selector'):
+                        results = await page.evaluate(RESULT_LIST_JS, selector)
+                except:
+                    results = []
+                self._record_selector('result_list', selector, bool(results), started)
+                if results:
+                    print(f"  ✅ พบผลลัพธ์: {selector} ({len(results)} รายการ)")
+                    return selector, results
+        
+        return None, []
+
+    def _parse_result_item(self, keyword, item):
+        """แปลงรายการผลการค้นหาเป็นข้อมูลหลักสูตร - คืน None ถ้าไม่มีลิงก์"""
+        # ดึงข้อมูลพื้นฐาน
+        title_full = item['text']
+        
+        # หาลิงก์
+        link = item['href']
+        if not link:
+            return None
+        
+        full_link = link if link.startswith("http") else f"{self.base_url}{link}"
+        
+        # แยกข้อมูลจาก title
+        lines = [line.strip() for line in title_full.strip().splitlines() if line.strip()]
+        
+        program_name = lines[0] if len(lines) >= 1 else ""
+        faculty = lines[1].replace('›', ' > ') if len(lines) >= 2 else ""
+        university = lines[2] if len(lines) >= 3 else ""
+        
+        return {
+            'keyword': keyword,
+            'program_name': program_name,
+            'university': university,
+            'faculty': faculty,
+            'title_full': title_full,
+            'url': full_link
+        }
+
+    async def _load_more_results(self, page, selector, items):
+        """โหลดผลลัพธ์เพิ่ม (เลื่อนหน้าจอ หรือกดหน้าถัดไป) - คืน False ถ้าไม่มีผลลัพธ์เพิ่มแล้ว"""
+        first_href = items[0]['href'] if items else None
+        changed = (selector, len(items), first_href)
+        
+        # infinite scroll: เลื่อนลงล่างสุดแล้วรอรายการเพิ่ม
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        try:
+            await page.wait_for_function(RESULTS_CHANGED_JS, arg=changed, timeout=3000)
+            return True
+        except:
+            pass
+        
+        # แบ่งหน้า: กดปุ่มหน้าถัดไป/โหลดเพิ่มแล้วรอรายการเปลี่ยน
+        for next_selector in self.NEXT_PAGE_SELECTORS:
+            button = await page.query_selector(next_selector)
+            if button and await button.is_visible():
+                await button.click()
+                try:
+                    await page.wait_for_function(RESULTS_CHANGED_JS, arg=changed, timeout=10000)
+                    return True
+                except:
+                    return False
+        
+        return False
+
+    async def iter_search_results(self, page, keyword, max_pages=50):
+        """async generator ของผลการค้นหาทุกรายการ (รวมหน้าถัดไป/infinite scroll)"""
+        print(f"\n🔍 ค้นหา: {keyword}")
+        
+        cache_key = f"search-all:{self.base_url}:{keyword}"
+        if self.cache is not None:
+            entry = self.cache.get(cache_key)
+            if self.cache.is_fresh(entry):
+                self.cache.hits += 1
+                programs = json.loads(entry['body'])
+                print(f"  ♻️ ใช้ผลการค้นหาจากแคช ({len(programs)} รายการ)")
+                self.metrics.inc('pages', kind='search', via='cache')
+                for program_info in programs:
+                    yield program_info
+                return
+            self.cache.misses += 1
+        
+        async def open_results():
+            if not await self._submit_search(page, keyword):
+                return False
+            return await self._find_results(page)
+        
+        programs = []
+        try:
+            # หน้าแรกของผลการค้นหาใช้ slot ของตัวควบคุมอัตราและลองใหม่ได้ (ยังไม่ได้ yield แถวใด)
+            found = await self._with_retries(keyword, open_results)
+            if found is None:
+                self.metrics.inc('errors', kind='retryable', phase='search')
+                return
+            if found is False:
+                return
+            selector, items = found
+            if not items:
+                print("  ❌ ไม่พบผลลัพธ์")
+                return
+            
+            seen = set()
+            for _ in range(max_pages):
+                for item in items:
+                    if not item['href'] or item['href'] in seen:
+                        continue
+                    seen.add(item['href'])
+                    
+                    program_info = self._parse_result_item(keyword, item)
+                    programs.append(program_info)
+                    print(f"  📌 {len(programs):2d}. {program_info['program_name'][:40]}...")
+                    yield program_info
+                
+                if not await self._load_more_results(page, selector, items):
+                    break
+                items = await page.evaluate(RESULT_LIST_JS, selector)
+            
+            print(f"  📚 {keyword}: ทั้งหมด {len(programs)} รายการ")
+            self.metrics.inc('pages', kind='search', via='browser')
+            if self.cache is not None and programs:
+                self.cache.put(cache_key, json.dumps(programs, ensure_ascii=False))
+        
+        except CircuitOpenError:
+            raise
+        except RetryableError as e:
+            # หน้าถัดไปหลัง yield แล้วลองใหม่ไม่ได้ - แจ้งตัวควบคุมอัตราให้ชะลอลง
+            self.metrics.inc('errors', kind='retryable', phase='search')
+            self.rate.on_failure()
+            print(f"❌ ข้อผิดพลาดในการค้นหา {keyword}: {str(e)}")
+        except Exception as e:
+            self.metrics.inc('errors', kind='other', phase='search')
+            print(f"❌ ข้อผิดพลาดในการค้นหา {keyword}: {str(e)}")
+
     async def scrape_program_details(self, page, program_info):
         """ดึงข้อมูลรายละเอียดจากหน้าของแต่ละโปรแกรม"""
+        with self.metrics.phase('detail'):
+            return await self._scrape_detail_page(page, program_info)
+
+    async def _scrape_detail_page(self, page, program_info):
         url = program_info['url']
         
         try:
             print(f"📄 กำลังดึง: {program_info['program_name'][:50]}...")
             
+            # ใช้หน้าจากแคชถ้ายังไม่หมดอายุ ไม่ต้องเปิดเบราว์เซอร์
+            if self.cache is not None and lxml_html is not None:
+                entry = self.cache.get(url)
+                if self.cache.is_fresh(entry):
+                    self.cache.hits += 1
+                    data = self._record_from_html(program_info, entry['body'])
+                    print(f"   ♻️ {data['มหาวิทยาลัย'][:25]} - {data['ค่าใช้จ่าย'][:30]}... (แคช)")
+                    self.metrics.inc('pages', kind='detail', via='cache')
+                    return data
+                self.cache.misses += 1
+            
             # เข้าหน้ารายละเอียด
-            await page.goto(url, wait_until='networkidle', timeout=30000)
-            await page.wait_for_timeout(2000)
+            await self._goto(page, url)
+            if self.fast_mode:
+                # รอจน element ของข้อมูลรายละเอียดตัวใดตัวหนึ่งปรากฏ
+                detail_ready = [s for selectors in self._ranked_detail_selectors().values() for s in selectors]
+                await self._race_selectors(page, detail_ready + ["table tr"])
             
             # สร้างข้อมูลพื้นฐาน
-            data = {
-                'คำค้น': program_info['keyword'],
-                'ชื่อหลักสูตร': program_info['program_name'],
-                'มหาวิทยาลัย': program_info['university'],
-                'คณะ': program_info['faculty'],
-                'ประเภทหลักสูตร': 'ไม่พบข้อมูล',
-                'ค่าใช้จ่าย': 'ไม่พบข้อมูล',
-                'ลิงก์': url,
-                'วันที่เก็บข้อมูล': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+            data = self._new_record(program_info)
             
-            # ดึงข้อมูลรายละเอียดด้วย selector ที่เฉพาะเจาะจง
-            detail_selectors = {
-                'ประเภทหลักสูตร': [
-                    "dt:has-text('ประเภทหลักสูตร') + dd",
-                    "td:has-text('ประเภทหลักสูตร') + td",
-                    ".program-type",
-                    "[data-field='program_type']"
-                ],
-                'ค่าใช้จ่าย': [
-                    "dt:has-text('ค่าใช้จ่าย') + dd",
-                    "dt:has-text('ค่าธรรมเนียม') + dd",
-                    "td:has-text('ค่าใช้จ่าย') + td",
-                    ".fee-info",
-                    ".tuition-fee",
-                    "[data-field='fee']"
-                ]
+            # ดึงทุกฟิลด์และแถวตารางด้วย page.evaluate ครั้งเดียว
+            detail_selectors = self._ranked_detail_selectors()
+            specs = {
+                field: [selector_spec(selector) for selector in selectors]
+                for field, selectors in detail_selectors.items()
             }
-            
-            # ลองดึงข้อมูลแต่ละฟิลด์
-            for field, selectors in detail_selectors.items():
-                for selector in selectors:
-                    try:
-                        element = await page.query_selector(selector)
-                        if element:
-                            text = await element.inner_text()
-                            if text.strip():
-                                data[field] = text.strip()
-                                break
-                    except:
-                        continue
+            started = time.perf_counter()
+            with self.metrics.phase('extract'):
+                extracted = await page.evaluate(DETAIL_EXTRACT_JS, {'fields': specs})
+            self._record_detail_matches(detail_selectors, extracted['matched'], started)
+            data.update(extracted['fields'])
             
             # ดึงข้อมูลเพิ่มเติมจากตาราง (หากมี)
-            try:
-                table_rows = await page.query_selector_all("table tr")
-                for row in table_rows:
-                    cells = await row.query_selector_all("td, th")
-                    if len(cells) >= 2:
-                        header = await cells[0].inner_text()
-                        value = await cells[1].inner_text()
-                        
-                        if "ประเภท" in header and data['ประเภทหลักสูตร'] == 'ไม่พบข้อมูล':
-                            data['ประเภทหลักสูตร'] = value.strip()
-                        elif any(word in header for word in ['ค่าใช้จ่าย', 'ธรรมเนียม', 'ค่าเรียน']) and data['ค่าใช้จ่าย'] == 'ไม่พบข้อมูล':
-                            data['ค่าใช้จ่าย'] = value.strip()
-            except:
-                pass
+            self._apply_table_rows(data, extracted['rows'])
+            
+            # เก็บ DOM ที่ render แล้วไว้ในแคช ใช้ตัวแยก HTML แบบ static ได้ในรอบถัดไป
+            if self.cache is not None:
+                self.cache.put(url, await page.content())
             
             print(f"   ✅ {data['มหาวิทยาลัย'][:25]} - {data['ค่าใช้จ่าย'][:30]}...")
+            self.metrics.inc('pages', kind='detail', via='browser')
             return data
             
+        except RetryableError:
+            raise
         except Exception as e:
+            self.metrics.inc('errors', kind='other', phase='detail')
             print(f"   ❌ ข้อผิดพลาด: {str(e)}")
             return None
 
-    async def run_scraping(self, keywords=None):
-        """เรียกใช้การ scraping"""
+    def _record_selector(self, page_type, selector, hit, started):
+        """บันทึกผลการลอง selector พร้อมเวลาที่ใช้"""
+        self.selectors.record(page_type, selector, hit, (time.perf_counter() - started) * 1000)
+        if not hit:
+            self.metrics.inc('selector_misses', page_type=page_type)
+
+    def _record_race(self, page_type, selectors, winner, started):
+        """บันทึกผลการรอ selector พร้อมกัน - ไม่มีตัวไหนพบ = miss ทุกตัว"""
+        if winner:
+            self._record_selector(page_type, winner, True, started)
+        else:
+            for selector in selectors:
+                self._record_selector(page_type, selector, False, started)
+
+    def _ranked_detail_selectors(self):
+        """DETAIL_SELECTORS ที่เรียงตามสถิติของแต่ละฟิลด์"""
+        return {
+            field: self.selectors.ranked(f'detail:{field}', selectors)
+            for field, selectors in self.DETAIL_SELECTORS.items()
+        }
+
+    def _record_detail_matches(self, detail_selectors, matched, started):
+        """selector ก่อนหน้าตัวที่ match ถือว่า miss (ถูกลองแล้วไม่พบ)"""
+        latency_ms = (time.perf_counter() - started) * 1000
+        for field, selectors in detail_selectors.items():
+            winner = matched.get(field)
+            for selector in selectors:
+                if selector == winner:
+                    self.selectors.record(f'detail:{field}', selector, True, latency_ms)
+                    break
+                self.selectors.record(f'detail:{field}', selector, False)
+                self.metrics.inc('selector_misses', page_type=f'detail:{field}')
+
+    def _store_row(self, program_info, data):
+        """เก็บแถวที่ดึงได้ - โหมด journal เขียนลงดิสก์ทันทีโดยไม่เก็บไว้ในหน่วยความจำ"""
+        # แถวที่ journal มีแล้ว (ดึงซ้ำหลังหยุดก่อนบันทึก done.txt) อยู่ใน Parquet แล้วตั้งแต่เริ่ม resume
+        if data and self.parquet is not None and not (self.journal is not None and self.journal.has_row(data['ลิงก์'])):
+            self.parquet.append(data)
+        self.metrics.advance()
+        if self.journal is not None:
+            self.journal.record(program_info['url'], data)
+            return None
+        return data
+
+    def collected_rows(self):
+        """แถวทั้งหมดที่ดึงได้ในรอบนี้ - โหมด journal อ่านทีละแถวจากดิสก์ (iterator)"""
+        if self.journal is not None:
+            return self._journal_rows()
+        return self.programs_data
+
+    def _journal_rows(self):
+        keywords = {
+            normalize_url(info['url']): info['keywords']
+            for info in self.journal.load_programs() or []
+            if info.get('keywords')
+        }
+        for row in self.journal.iter_rows():
+            if normalize_url(row['ลิงก์']) in keywords:
+                row['คำค้น'] = KEYWORD_SEPARATOR.join(keywords[normalize_url(row['ลิงก์'])])
+            yield row
+
+    def _new_record(self, program_info):
+        """สร้างแถวข้อมูลพื้นฐานของหลักสูตร"""
+        return {
+            'คำค้น': KEYWORD_SEPARATOR.join(program_info.get('keywords') or [program_info['keyword']]),
+            'ชื่อหลักสูตร': program_info['program_name'],
+            'มหาวิทยาลัย': program_info['university'],
+            'คณะ': program_info['faculty'],
+            'ประเภทหลักสูตร': NOT_FOUND,
+            'ค่าใช้จ่าย': NOT_FOUND,
+            'ลิงก์': program_info['url'],
+            'วันที่เก็บข้อมูล': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def _apply_table_rows(self, data, rows):
+        """เติมฟิลด์ที่ยังไม่พบจากคู่ (หัวตาราง, ค่า)"""
+        for header, value in rows:
+            if "ประเภท" in header and data['ประเภทหลักสูตร'] == NOT_FOUND:
+                data['ประเภทหลักสูตร'] = value.strip()
+            elif any(word in header for word in ['ค่าใช้จ่าย', 'ธรรมเนียม', 'ค่าเรียน']) and data['ค่าใช้จ่าย'] == NOT_FOUND:
+                data['ค่าใช้จ่าย'] = value.strip()
+
+    def _new_http_client(self):
+        """สร้าง HTTP client แบบ keep-alive ใช้ connection ร่วมกันทุก worker"""
+        return httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT, 'Accept-Language': 'th-TH,th;q=0.9'},
+            limits=httpx.Limits(max_connections=self.rate.max_concurrency,
+                                max_keepalive_connections=self.rate.max_concurrency),
+            timeout=30.0,
+            follow_redirects=True
+        )
+
+    def _record_from_html(self, program_info, html):
+        """สร้างแถวข้อมูลจาก HTML แบบ static"""
+        detail_selectors = self._ranked_detail_selectors()
+        started = time.perf_counter()
+        with self.metrics.phase('extract'):
+            fields, rows, matched = extract_details_from_html(html, detail_selectors)
+        self._record_detail_matches(detail_selectors, matched, started)
+        data = self._new_record(program_info)
+        data.update(fields)
+        self._apply_table_rows(data, rows)
+        return data
+
+    async def _fetch_html(self, client, url):
+        """ดึง HTML ผ่านแคช: ใหม่อยู่ใช้เลย, หมดอายุส่ง request แบบมีเงื่อนไข"""
+        entry = self.cache.get(url) if self.cache is not None else None
+        if self.cache is not None and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return entry['body']
+        
+        headers = self.cache.conditional_headers(entry) if self.cache is not None else {}
+        try:
+            with self.metrics.phase('fetch'):
+                response = await client.get(url, headers=headers)
+        except httpx.TimeoutException as e:
+            self.metrics.inc('requests', channel='http', status='timeout')
+            raise RetryableError(f"timeout: {url}") from e
+        
+        self.metrics.inc('requests', channel='http', status=str(response.status_code))
+        self.metrics.inc('bytes', len(response.content), channel='http')
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After', '')
+            raise RetryableError(
+                f"HTTP {response.status_code}: {url}",
+                status=response.status_code,
+                retry_after=float(retry_after) if retry_after.isdigit() else None
+            )
+        
+        # 304 = เนื้อหาไม่เปลี่ยน ใช้ของเดิมในแคชและต่ออายุ
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated += 1
+            self.cache.touch(url)
+            return entry['body']
+        
+        response.raise_for_status()
+        if self.cache is not None:
+            self.cache.misses += 1
+            self.cache.put(
+                url,
+                response.text,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+        return response.text
+
+    async def scrape_program_details_http(self, client, program_info):
+        """ดึงรายละเอียดผ่าน HTTP โดยตรง - คืน None ถ้า HTML แบบ static ไม่มีข้อมูล"""
+        url = program_info['url']
+        print(f"📄 กำลังดึง (HTTP): {program_info['program_name'][:50]}...")
+        
+        try:
+            html = await self._fetch_html(client, url)
+            data = self._record_from_html(program_info, html)
+        except RetryableError:
+            # เบราว์เซอร์ก็จะเจอปัญหาเดียวกัน - ให้ลองใหม่ทั้งหลักสูตรหลังหน่วงเวลา
+            raise
+        except Exception as e:
+            self.metrics.inc('errors', kind='other', phase='fetch')
+            print(f"   ⚠️ HTTP ล้มเหลว ({str(e)}) - ใช้เบราว์เซอร์แทน")
+            return None
+        
+        # หน้าที่ render ด้วย JavaScript จะไม่มีข้อมูลใน HTML ต้องใช้เบราว์เซอร์
+        if data['ประเภทหลักสูตร'] == NOT_FOUND and data['ค่าใช้จ่าย'] == NOT_FOUND:
+            print("   ↪️ ไม่พบข้อมูลใน HTML - ใช้เบราว์เซอร์แทน")
+            return None
+        
+        print(f"   ✅ {data['มหาวิทยาลัย'][:25]} - {data['ค่าใช้จ่าย'][:30]}...")
+        self.metrics.inc('pages', kind='detail', via='http')
+        return data
+
+    @asynccontextmanager
+    async def _host_budget(self, url):
+        """จำกัดจำนวน request พร้อมกันต่อ host"""
+        host = urlparse(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = semaphore
+        async with semaphore:
+            yield
+
+    async def _with_retries(self, label, fetch):
+        """เรียก fetch() ภายใต้ slot ของตัวควบคุมอัตรา ลองใหม่เมื่อเจอ RetryableError - คืน None ถ้าลองครบแล้วยังล้มเหลว"""
+        for attempt in range(self.retries + 1):
+            async with self.rate.slot():
+                try:
+                    result = await fetch()
+                except RetryableError as e:
+                    self.metrics.inc('errors', kind='retryable', status=str(e.status or 'timeout'))
+                    self.rate.on_failure()
+                    error = e
+                else:
+                    self.rate.on_success()
+                    return result
+            
+            if attempt < self.retries:
+                self.rate.retries += 1
+                self.metrics.inc('retries')
+                wait = self.rate.backoff(attempt, error.retry_after)
+                print(f"   🔁 {error} - ลองใหม่ใน {wait:.1f} วินาที ({attempt + 1}/{self.retries})")
+                with self.metrics.phase('backoff'):
+                    await asyncio.sleep(wait)
+        
+        print(f"   ❌ ลองครบ {self.retries + 1} ครั้งแล้วยังล้มเหลว: {label}")
+        return None
+
+    async def _scrape_program(self, program_info, client, pool, label):
+        """ดึงรายละเอียดหนึ่งหลักสูตร (HTTP ก่อนถ้าเปิดไว้ แล้วจึงใช้เบราว์เซอร์) และเก็บผล"""
+        async def fetch():
+            data = None
+            if client is not None:
+                data = await self.scrape_program_details_http(client, program_info)
+            
+            # หน้าเบราว์เซอร์สร้างเมื่อต้องใช้จริงเท่านั้น (โหมด HTTP อาจไม่ต้องใช้เลย)
+            if data is None:
+                worker_page = await pool.acquire()
+                try:
+                    data = await self.scrape_program_details(worker_page, program_info)
+                finally:
+                    pool.release(worker_page)
+            return data
+        
+        async with self._host_budget(program_info['url']):
+            print(label, end=" ")
+            data = await self._with_retries(program_info['url'], fetch)
+            data = self._store_row(program_info, data)
+            
+            # หน่วงเวลาป้องกัน rate limiting (ต่อ worker ปรับตามอัตราปัจจุบัน)
+            await self._pace()
+            return data
+
+    async def _pace(self, base=None):
+        """หน่วงเวลาตามตัวควบคุมอัตรา (นับเวลาที่รอเป็นขั้นตอน 'pace')"""
+        with self.metrics.phase('pace'):
+            await self.rate.pace(base)
+
+    async def scrape_details_concurrently(self, context, all_programs):
+        """ดึงรายละเอียดหลายหลักสูตรพร้อมกันด้วย worker pool ขนาดจำกัด"""
+        total = len(all_programs)
+        pool = PagePool(context, self.rate.max_concurrency)
+        self._host_semaphores = {}
+        self.rate.reset()
+        client = self._new_http_client() if self.http_mode else None
+        
+        # เก็บผลตามลำดับเดิมของรายการ ไม่ใช่ลำดับที่ดึงเสร็จ
+        results = [None] * total
+        
+        async def scrape_one(index, program_info):
+            results[index] = await self._scrape_program(program_info, client, pool, f"\n[{index + 1:2d}/{total}]")
+        
+        tasks = [asyncio.ensure_future(scrape_one(i, info)) for i, info in enumerate(all_programs)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # งานที่เหลือต้องหยุดก่อนปิด client/หน้าเบราว์เซอร์ที่ใช้อยู่ (เช่นเมื่อ CircuitOpenError)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if client is not None:
+                await client.aclose()
+            await pool.close()
+        
+        return [data for data in results if data]
+
+    async def run_pipeline(self, context, keywords):
+        """ค้นหาและดึงรายละเอียดไปพร้อมกัน: ผลการค้นหาเข้า queue ให้ worker ดึงทันทีที่พบ"""
+        # worker เท่ากับ concurrency สูงสุด - ตัวควบคุมอัตราจำกัดจำนวนที่ทำงานจริงพร้อมกัน
+        workers = self.rate.max_concurrency
+        queue = asyncio.Queue(maxsize=self.queue_size or workers * 2)
+        index = ProgramIndex()
+        self._program_index = index
+        pool = PagePool(context, workers)
+        self._host_semaphores = {}
+        self.rate.reset()
+        client = self._new_http_client() if self.http_mode else None
+        
+        # เก็บผลตามลำดับที่ค้นพบ (position) ไม่ใช่ลำดับที่ดึงเสร็จ
+        results = {}
+        
+        async def produce():
+            search_page = await context.new_page()
+            try:
+                for keyword in keywords:
+                    async for program_info in self.iter_search_results(search_page, keyword):
+                        if not index.add(program_info):
+                            continue
+                        if self.journal is not None and self.journal.is_done(program_info['url']):
+                            continue
+                        self.metrics.set_total(len(index))
+                        # queue เต็ม = รอ worker (backpressure)
+                        await queue.put((len(index) - 1, index.get(program_info['url'])))
+                    await self._pace(KEYWORD_DELAY)
+            finally:
+                await search_page.close()
+                for _ in range(workers):
+                    await queue.put(None)
+        
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                position, program_info = item
+                data = await self._scrape_program(program_info, client, pool, f"\n[{position + 1:2d}/{len(index)}+]")
+                if data:
+                    results[position] = data
+        
+        tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(consume()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if client is not None:
+                await client.aclose()
+            await pool.close()
+        
+        # คำค้นที่พบภายหลังอาจมาหลังจากดึงหลักสูตรนั้นไปแล้ว - อัปเดตให้ครบ
+        all_programs = index.programs()
+        if self.journal is not None:
+            self.journal.save_programs(all_programs)
+        for position in sorted(results):
+            data = results[position]
+            data['คำค้น'] = KEYWORD_SEPARATOR.join(all_programs[position]['keywords'])
+            self.programs_data.append(data)
+        
+        if index.added > len(index):
+            print(f"\n🔗 รวมหลักสูตรซ้ำข้ามคำค้น: {index.added} → {len(index)} หลักสูตร")
+
+    async def _collect_programs(self, page, keywords):
+        """ขั้นตอนค้นหา: รวบรวมหลักสูตรจากทุกคำค้นโดยไม่ซ้ำ URL"""
+        index = ProgramIndex()
+        self.rate.reset()
+        for keyword in keywords:
+            programs = await self._with_retries(keyword, lambda: self.search_and_collect_programs(page, keyword))
+            if programs is None:
+                # ลองครบแล้วยังล้มเหลว - นับเป็นข้อผิดพลาดของการค้นหา (ให้ shard นี้รันซ้ำได้)
+                self.metrics.inc('errors', kind='retryable', phase='search')
+            for program_info in programs or []:
+                index.add(program_info)
+            await self._pace(KEYWORD_DELAY)
+        
+        if index.added > len(index):
+            print(f"\n🔗 รวมหลักสูตรซ้ำข้ามคำค้น: {index.added} → {len(index)} หลักสูตร")
+        return index.programs()
+
+    async def collect_programs(self, keywords):
+        """เปิดเบราว์เซอร์เพื่อค้นหาอย่างเดียว คืนรายการหลักสูตร (ใช้แบ่ง URL ให้หลาย process)"""
+        async with async_playwright() as p:
+            browser, context = await self._open_browser(p)
+            try:
+                page = await context.new_page()
+                return await self._collect_programs(page, keywords)
+            finally:
+                await browser.close()
+
+    async def run_scraping(self, keywords=None, programs=None):
+        """เรียกใช้การ scraping (ส่ง programs มาเพื่อข้ามขั้นตอนค้นหา)"""
         if keywords is None:
             keywords = ["วิศวกรรม ปัญญาประดิษฐ์", "วิศวกรรม คอมพิวเตอร์"]
         
@@ -205,52 +1809,129 @@ class EnhancedTCASScraper:
         print("   ✅ มี fallback selector หลายตัว")
         print("="*70)
         
+        self.metrics.start()
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context(
-                locale='th-TH',
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
+            browser, context = await self._open_browser(p)
+            
+            if self.pipeline and programs is None:
+                try:
+                    await self.run_pipeline(context, keywords)
+                finally:
+                    await browser.close()
+                return self._finish_run()
+            
             page = await context.new_page()
             
             try:
-                all_programs = []
+                all_programs = programs
+                if all_programs is None and self.journal is not None:
+                    all_programs = self.journal.load_programs()
                 
-                # ขั้นตอนที่ 1: รวบรวมลิงก์ทั้งหมด
-                for keyword in keywords:
-                    programs = await self.search_and_collect_programs(page, keyword)
-                    all_programs.extend(programs)
-                    await asyncio.sleep(2)
+                # ขั้นตอนที่ 1: รวบรวมลิงก์ทั้งหมด (ข้ามได้ถ้าทำต่อจาก journal หรือได้รายการมาแล้ว)
+                if all_programs is None:
+                    all_programs = await self._collect_programs(page, keywords)
+                
+                if self.journal is not None and all_programs and self.journal.load_programs() is None:
+                    self.journal.save_programs(all_programs)
                 
                 if not all_programs:
                     print("❌ ไม่พบหลักสูตรใดๆ")
                     return 0
                 
+                if self.journal is not None:
+                    pending = [info for info in all_programs if not self.journal.is_done(info['url'])]
+                    if len(pending) < len(all_programs):
+                        print(f"\n⏭️ ข้าม {len(all_programs) - len(pending)} หลักสูตรที่ดึงเสร็จแล้วใน run {self.journal.run_id}")
+                    all_programs = pending
+                
                 print(f"\n📋 เริ่มดึงข้อมูลรายละเอียด {len(all_programs)} หลักสูตร...")
+                self.metrics.set_total(len(all_programs))
                 
                 # ขั้นตอนที่ 2: ดึงข้อมูลรายละเอียดแต่ละหลักสูตร
-                for i, program_info in enumerate(all_programs, 1):
-                    print(f"\n[{i:2d}/{len(all_programs)}]", end=" ")
-                    
-                    data = await self.scrape_program_details(page, program_info)
-                    if data:
-                        self.programs_data.append(data)
-                    
-                    # หน่วงเวลาป้องกัน rate limiting
-                    await asyncio.sleep(1.5)
+                if self.rate.max_concurrency > 1 or self.http_mode:
+                    results = await self.scrape_details_concurrently(context, all_programs)
+                    self.programs_data.extend(results)
+                else:
+                    for i, program_info in enumerate(all_programs, 1):
+                        print(f"\n[{i:2d}/{len(all_programs)}]", end=" ")
+                        
+                        data = await self._with_retries(
+                            program_info['url'], lambda: self.scrape_program_details(page, program_info)
+                        )
+                        data = self._store_row(program_info, data)
+                        if data:
+                            self.programs_data.append(data)
+                        
+                        # หน่วงเวลาป้องกัน rate limiting (ปรับตามอัตราปัจจุบัน)
+                        await self._pace()
                 
             finally:
                 await browser.close()
         
+        return self._finish_run()
+
+    async def _open_browser(self, p):
+        """เปิดเบราว์เซอร์และ context สำหรับการ scrape"""
+        browser = await p.chromium.launch(headless=self.headless)
+        context = await browser.new_context(
+            locale='th-TH',
+            user_agent=USER_AGENT
+        )
+        if self.fast_mode:
+            await context.route("**/*", self._block_resources)
+        return browser, context
+
+    def _finish_run(self):
+        """สรุปท้ายรอบและคืนจำนวนแถวที่ดึงได้"""
+        if self.cache is not None:
+            print(f"\n♻️ แคช: ใช้ซ้ำ {self.cache.hits}, ตรวจสอบแล้วไม่เปลี่ยน {self.cache.revalidated}, ดึงใหม่ {self.cache.misses}")
+        if self.rate.failures or self.rate.limit != self.rate.max_concurrency or self.rate.delay != self.rate.base_delay:
+            print(f"\n⚙️ อัตราการดึง: {self.rate.summary()}")
+        self.metrics.set('concurrency_limit', self.rate.limit)
+        self.metrics.set('delay_seconds', self.rate.delay)
+        self.metrics.set('circuit_trips', self.rate.trips)
+        self.metrics.print_summary()
+        
+        self.selectors.save()
+        if self.selectors.report():
+            self.selectors.print_report()
+        
+        if self.journal is not None:
+            return self.journal.row_count
         return len(self.programs_data)
 
-    def save_to_excel(self, filename='enhanced_tcas_data'):
+    def keyword_updates(self):
+        """คำค้นสุดท้ายของแต่ละหลักสูตร (key = URL ที่ normalize แล้ว) สำหรับ ParquetRowWriter.close
+        มีเฉพาะโหมด pipeline ที่คำค้นซึ่งพบภายหลังมาหลังเขียนแถวไปแล้ว - โหมดอื่นคืน None"""
+        if self._program_index is None:
+            return None
+        return {normalize_url(info['url']): info['keywords'] for info in self._program_index.programs()}
+
+    def to_dataframe(self, explode_keywords=False):
+        """แปลงแถวที่ดึงได้เป็น DataFrame - explode_keywords=True แยกเป็นหนึ่งแถวต่อคำค้น
+        สร้างทีละ EXPORT_CHUNK_ROWS แถว: โหมด journal มีแถวแบบ dict ในหน่วยความจำแค่ช่วงเดียว"""
+        rows = iter(self.collected_rows())
+        frames = []
+        while True:
+            chunk = list(islice(rows, EXPORT_CHUNK_ROWS))
+            if not chunk:
+                break
+            frames.append(pd.DataFrame(chunk))
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else (frames[0] if frames else pd.DataFrame())
+        if len(df) > 0:
+            df = normalize_fees(df)
+        if explode_keywords and len(df) > 0:
+            df['คำค้น'] = df['คำค้น'].str.split(KEYWORD_SEPARATOR, regex=False)
+            df = df.explode('คำค้น', ignore_index=True)
+        return df
+
+    def save_to_excel(self, filename='enhanced_tcas_data', explode_keywords=False):
         """บันทึกเป็น Excel"""
-        if not self.programs_data:
+        df = self.to_dataframe(explode_keywords)
+        if len(df) == 0:
             print("❌ ไม่มีข้อมูลที่จะบันทึก")
             return None
         
-        df = pd.DataFrame(self.programs_data)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{filename}_{timestamp}.xlsx"
         
@@ -263,7 +1944,7 @@ class EnhancedTCASScraper:
         # แสดงสรุป
         if len(df) > 0:
             print(f"\n📈 สรุปตามคำค้น:")
-            keyword_counts = df['คำค้น'].value_counts()
+            keyword_counts = df['คำค้น'].str.split(KEYWORD_SEPARATOR, regex=False).explode().value_counts()
             for keyword, count in keyword_counts.items():
                 emoji = "🤖" if "ปัญญาประดิษฐ์" in keyword else "💻"
                 print(f"   {emoji} {keyword}: {count} รายการ")
@@ -271,6 +1952,9 @@ class EnhancedTCASScraper:
             # นับที่มีค่าใช้จ่าย
             with_fee = len(df[df['ค่าใช้จ่าย'] != 'ไม่พบข้อมูล'])
             print(f"\n💰 มีข้อมูลค่าใช้จ่าย: {with_fee}/{len(df)} รายการ")
+            if df[FEE_ANNUAL].notna().any():
+                print(f"   📏 ค่าใช้จ่ายต่อปี (ประมาณ): ต่ำสุด {df[FEE_ANNUAL].min():,.0f} / "
+                      f"มัธยฐาน {df[FEE_ANNUAL].median():,.0f} / สูงสุด {df[FEE_ANNUAL].max():,.0f} บาท")
             
             # แสดงตัวอย่างข้อมูล
             print(f"\n📋 ตัวอย่างข้อมูล:")
@@ -281,12 +1965,12 @@ class EnhancedTCASScraper:
         
         return df
 
-    def save_to_csv(self, filename='enhanced_tcas_data'):
+    def save_to_csv(self, filename='enhanced_tcas_data', explode_keywords=False):
         """บันทึกเป็น CSV สำรอง"""
-        if not self.programs_data:
+        df = self.to_dataframe(explode_keywords)
+        if len(df) == 0:
             return None
         
-        df = pd.DataFrame(self.programs_data)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{filename}_{timestamp}.csv"
         
@@ -294,13 +1978,236 @@ class EnhancedTCASScraper:
         print(f"💾 บันทึก CSV สำรอง: {filename}")
         return df
 
-async def main():
-    """ฟังก์ชันหลัก"""
-    print("🎯 Enhanced TCAS Scraper")
-    print("📚 ปรับปรุงจากตัวอย่างที่ให้มา")
-    print("="*50)
+def _run_shard(run_dir, shard, options):
+    """รัน shard หนึ่งใน process แยก (มีเบราว์เซอร์ของตัวเอง) - บันทึกผลลง journal ของ shard"""
+    cache_path = options.pop('cache_path', None)
+    cache = PageCache(cache_path) if cache_path else None
+    journal = RunJournal(f"shard-{shard['id']}", root=run_dir)
+    journal.save_meta(keywords=shard['keywords'], shard=shard['id'])
     
-    # ให้ผู้ใช้เลือกคำค้นหา
+    scraper = EnhancedTCASScraper(cache=cache, journal=journal, **options)
+    try:
+        rows = asyncio.run(scraper.run_scraping(shard['keywords'], programs=shard.get('programs')))
+        # หลักสูตรที่ลองครบแล้วยังดึงไม่ได้ (ยังไม่อยู่ใน done.txt) และการค้นหาที่ล้มเหลว
+        failed = sum(1 for info in journal.load_programs() or [] if not journal.is_done(info['url']))
+        search_errors = scraper.metrics.count('errors', phase='search')
+        if search_errors and os.path.exists(journal.programs_path):
+            # รายการหลักสูตรไม่ครบ - ให้ --rerun-failed ค้นหาใหม่ (หลักสูตรที่ดึงเสร็จแล้วยังถูกข้าม)
+            os.remove(journal.programs_path)
+        return {'rows': rows, 'failed': failed, 'search_errors': search_errors}
+    finally:
+        scraper.metrics.save(os.path.join(journal.dir, 'metrics'))
+        journal.close()
+        if cache is not None:
+            cache.close()
+
+class ShardedCrawl:
+    """แบ่งงาน scrape ให้หลาย process ตามคำค้นหรือตาม URL แล้วรวมผลเป็นชุดเดียว"""
+
+    def __init__(self, run_id=None, shards=2, options=None, root='runs'):
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.dir = os.path.join(root, self.run_id)
+        self.manifest_path = os.path.join(self.dir, 'shards.json')
+        self.shards = shards
+        self.options = options or {}
+        self.manifest = {'run_id': self.run_id, 'shards': []}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            self.shards = len(self.manifest['shards'])
+            self.options = self.manifest.get('options', self.options)
+
+    def _save_manifest(self):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+
+    def _cap_shards(self):
+        """แต่ละ shard ได้ per-host limit อย่างน้อย 1 - จำนวน shard จึงต้องไม่เกิน limit ไม่อย่างนั้นรวมกันเกิน budget"""
+        per_host = self.options.get('per_host_limit') or self.options.get('concurrency', 1)
+        if self.shards > per_host:
+            print(f"⚠️ --shards {self.shards} มากกว่า per-host limit ({per_host}) - ใช้ {per_host} shard")
+            self.shards = per_host
+
+    def shard_options(self):
+        """แบ่ง rate budget: ทุก shard รวมกันไม่เกิน per-host limit และอัตราเดียวกับการรัน process เดียว"""
+        options = dict(self.options)
+        per_host = options.get('per_host_limit') or options.get('concurrency', 1)
+        shard_per_host = max(1, per_host // self.shards)
+        options['per_host_limit'] = shard_per_host
+        options['concurrency'] = max(1, min(options.get('concurrency', 1), shard_per_host))
+        if options.get('max_concurrency'):
+            options['max_concurrency'] = max(options['concurrency'], options['max_concurrency'] // self.shards)
+        # shard ละ 1 slot แต่มีหลาย shard: ยืดเวลาหน่วงให้อัตรารวมเท่าเดิม
+        options['delay'] = options.get('delay', 1.5) * self.shards * shard_per_host / per_host
+        return options
+
+    def plan_keywords(self, keywords):
+        """แบ่งคำค้นแบบ round-robin"""
+        self._cap_shards()
+        self.manifest['mode'] = 'keyword'
+        self.manifest['shards'] = [
+            {'id': i, 'keywords': keywords[i::self.shards], 'status': 'pending', 'rows': 0}
+            for i in range(min(self.shards, len(keywords)))
+        ]
+        self.shards = len(self.manifest['shards'])
+        self.manifest['options'] = self.options
+        self._save_manifest()
+
+    def plan_urls(self, keywords, programs):
+        """แบ่งหลักสูตรที่ไม่ซ้ำแล้วตาม hash ของ URL (หลักสูตรเดิมอยู่ shard เดิมเสมอ)"""
+        self._cap_shards()
+        self.manifest['mode'] = 'url'
+        buckets = [[] for _ in range(self.shards)]
+        for program_info in programs:
+            buckets[zlib.crc32(normalize_url(program_info['url']).encode('utf-8')) % self.shards].append(program_info)
+        self.manifest['shards'] = [
+            {'id': i, 'keywords': keywords, 'programs': bucket, 'status': 'pending', 'rows': 0}
+            for i, bucket in enumerate(buckets)
+        ]
+        self.manifest['options'] = self.options
+        self._save_manifest()
+
+    def failed_shards(self):
+        return [shard['id'] for shard in self.manifest['shards'] if shard['status'] != 'ok']
+
+    def run(self, only=None):
+        """รันทุก shard (หรือเฉพาะ shard ใน only) พร้อมกัน - คืนรายการ shard ที่ล้มเหลว"""
+        targets = [shard for shard in self.manifest['shards'] if only is None or shard['id'] in only]
+        if not targets:
+            return []
+        
+        print(f"\n🧩 รัน {len(targets)} shard ({self.manifest['mode']}) ใน run {self.run_id}")
+        options = self.shard_options()
+        
+        # spawn: แต่ละ process เริ่มใหม่ ไม่แชร์ event loop/เบราว์เซอร์กับ process หลัก
+        with ProcessPoolExecutor(max_workers=len(targets), mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {
+                shard['id']: pool.submit(_run_shard, self.dir, shard, dict(options))
+                for shard in targets
+            }
+            for shard in targets:
+                try:
+                    result = futures[shard['id']].result()
+                except Exception as e:
+                    shard['status'] = 'failed'
+                    shard['error'] = str(e)
+                else:
+                    shard['rows'] = result['rows']
+                    shard['status'], error = self._shard_status(shard, result)
+                    if error:
+                        shard['error'] = error
+                    else:
+                        shard.pop('error', None)
+                self._save_manifest()
+        
+        self.print_report()
+        return self.failed_shards()
+
+    @staticmethod
+    def _shard_status(shard, result):
+        """สถานะของ shard ที่รันจบ: 'failed' ถ้าไม่ได้แถวเลยทั้งที่มีงาน, 'partial' ถ้าบางหลักสูตรดึงไม่ได้
+        (ทั้งสองสถานะรันซ้ำได้ด้วย --rerun-failed - journal ของ shard ข้ามหลักสูตรที่ดึงเสร็จแล้ว)"""
+        has_work = shard.get('programs') is None or len(shard['programs']) > 0
+        if result['rows'] == 0 and (has_work or result['search_errors']):
+            return 'failed', f"ไม่ได้ข้อมูล (ค้นหาล้มเหลว {result['search_errors']} ครั้ง)"
+        if result['failed'] or result['search_errors']:
+            return 'partial', f"ดึงไม่ได้ {result['failed']} หลักสูตร ค้นหาล้มเหลว {result['search_errors']} ครั้ง"
+        return 'ok', None
+
+    def print_report(self):
+        print("\n🧩 สถานะ shard:")
+        for shard in self.manifest['shards']:
+            icon = {"ok": "✅", "partial": "⚠️"}.get(shard['status'], "❌")
+            size = len(shard['programs']) if shard.get('programs') is not None else len(shard['keywords'])
+            unit = "หลักสูตร" if shard.get('programs') is not None else "คำค้น"
+            print(f"   {icon} shard {shard['id']}: {size} {unit}, ได้ {shard['rows']} แถว {shard.get('error', '')}")
+        
+        failed = self.failed_shards()
+        if failed:
+            print(f"   ⏯️ รันเฉพาะ shard ที่ล้มเหลวได้ด้วย: python scrap.py --rerun-failed {self.run_id}")
+
+    def merge(self):
+        """รวมผลทุก shard: ไม่ซ้ำ URL รวมคำค้น และเรียงลำดับคงที่"""
+        merged = {}
+        for shard in self.manifest['shards']:
+            journal = RunJournal(f"shard-{shard['id']}", root=self.dir)
+            for row in journal.iter_rows():
+                key = normalize_url(row['ลิงก์'])
+                existing = merged.get(key)
+                if existing is None:
+                    merged[key] = row
+                    continue
+                keywords = existing['คำค้น'].split(KEYWORD_SEPARATOR)
+                for keyword in row['คำค้น'].split(KEYWORD_SEPARATOR):
+                    if keyword not in keywords:
+                        keywords.append(keyword)
+                existing['คำค้น'] = KEYWORD_SEPARATOR.join(keywords)
+            journal.close()
+        
+        return sorted(merged.values(), key=lambda row: (row['มหาวิทยาลัย'], row['ชื่อหลักสูตร'], normalize_url(row['ลิงก์'])))
+
+def parse_args():
+    """อ่านตัวเลือกจาก command line"""
+    parser = argparse.ArgumentParser(description="Enhanced TCAS Scraper")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="จำนวนหน้าที่ดึงรายละเอียดพร้อมกัน (ค่าเริ่มต้น 1)")
+    parser.add_argument("--per-host", type=int, default=None,
+                        help="จำนวน request พร้อมกันสูงสุดต่อ host")
+    parser.add_argument("--delay", type=float, default=1.5,
+                        help="หน่วงเวลาหลังดึงแต่ละหน้า (วินาที)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="ปรับ concurrency และเวลาหน่วงอัตโนมัติ: เพิ่มเมื่อเว็บตอบปกติ ลดเมื่อเจอ timeout/429/5xx")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="concurrency สูงสุดในโหมด --adaptive (ค่าเริ่มต้น 4 เท่าของ --concurrency)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="จำนวนครั้งที่ลองใหม่เมื่อเจอ timeout/429/5xx (รอแบบ exponential backoff)")
+    parser.add_argument("--headless", action="store_true",
+                        help="เปิดเบราว์เซอร์แบบไม่แสดงหน้าต่าง")
+    parser.add_argument("--fast", action="store_true",
+                        help="โหมดเร็ว: ตัดรูป/ฟอนต์/analytics และรอเฉพาะ element ที่ต้องใช้")
+    parser.add_argument("--http", action="store_true",
+                        help="ดึงหน้ารายละเอียดผ่าน HTTP ก่อน ใช้เบราว์เซอร์เมื่อไม่พบข้อมูล")
+    parser.add_argument("--cache", nargs="?", const="tcas_cache.sqlite", default=None,
+                        help="เปิดใช้แคชหน้าเว็บบนดิสก์ (ค่าเริ่มต้น tcas_cache.sqlite)")
+    parser.add_argument("--cache-ttl", type=float, default=24,
+                        help="อายุแคชก่อนต้องตรวจสอบซ้ำ (ชั่วโมง)")
+    parser.add_argument("--cache-max-mb", type=float, default=200,
+                        help="ขนาดแคชสูงสุด (MB) เกินแล้วลบรายการที่ไม่ได้ใช้นานที่สุด")
+    parser.add_argument("--formats", default="excel,csv",
+                        help="รูปแบบไฟล์ผลลัพธ์ คั่นด้วยจุลภาค: parquet, excel, csv (ค่าเริ่มต้น excel,csv)")
+    parser.add_argument("--parquet-dir", default="tcas_parquet",
+                        help="โฟลเดอร์เก็บไฟล์ Parquet (แบ่งโฟลเดอร์ย่อยตามวันที่เก็บข้อมูล)")
+    parser.add_argument("--explode-keywords", action="store_true",
+                        help="ไฟล์ผลลัพธ์แยกหนึ่งแถวต่อคำค้น (ค่าเริ่มต้นรวมคำค้นไว้ในช่องเดียว)")
+    parser.add_argument("--selector-stats", metavar="PATH", default="selector_stats.json",
+                        help="ไฟล์เก็บสถิติ selector ข้ามรอบ (ใช้เรียงลำดับ fallback selector)")
+    parser.add_argument("--selector-report", action="store_true",
+                        help="แสดงสถิติ selector และ selector ที่หยุดทำงาน แล้วจบโปรแกรม")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="ดึงรายละเอียดทันทีที่ค้นพบ และอ่านผลการค้นหาทุกหน้า")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="ขนาด queue ระหว่างการค้นหากับการดึงรายละเอียด (ค่าเริ่มต้น 2 เท่าของ concurrency)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="จำนวน process ที่ scrape พร้อมกัน (แต่ละ process มีเบราว์เซอร์ของตัวเอง)")
+    parser.add_argument("--shard-by", choices=["keyword", "url"], default="keyword",
+                        help="แบ่งงานตามคำค้น หรือค้นหาก่อนแล้วแบ่งตาม URL ที่ไม่ซ้ำ")
+    parser.add_argument("--rerun-failed", metavar="RUN_ID", default=None,
+                        help="รันเฉพาะ shard ที่ล้มเหลวของ run เดิม แล้วรวมผลใหม่")
+    parser.add_argument("--metrics", metavar="PATH", default="scrape_metrics",
+                        help="บันทึก metrics ท้ายรอบเป็น PATH.json และ PATH.prom (Prometheus text format)")
+    parser.add_argument("--snapshots", nargs="?", const="tcas_snapshots.sqlite", default=None,
+                        help="นำผลรอบนี้เข้าประวัติค่าใช้จ่าย (เก็บเฉพาะหลักสูตรที่เปลี่ยน, ค่าเริ่มต้น tcas_snapshots.sqlite)")
+    parser.add_argument("--progress", action="store_true",
+                        help="แสดงความคืบหน้า อัตราการดึง และเวลาที่เหลือโดยประมาณระหว่าง scrape")
+    parser.add_argument("--journal", action="store_true",
+                        help="บันทึกทุกแถวลงดิสก์ทันที (ทำต่อได้ด้วย --resume)")
+    parser.add_argument("--resume", metavar="RUN_ID", default=None,
+                        help="ทำต่อจาก run ที่หยุดกลางคัน โดยข้าม URL ที่ดึงเสร็จแล้ว")
+    return parser.parse_args()
+
+def choose_keywords():
+    """ให้ผู้ใช้เลือกคำค้นหา"""
     print("🔍 เลือกคำค้นหา:")
     print("1. วิศวกรรม ปัญญาประดิษฐ์")
     print("2. วิศวกรรม คอมพิวเตอร์")
@@ -322,21 +2229,139 @@ async def main():
     else:
         keywords = ["วิศวกรรม ปัญญาประดิษฐ์"]
     
+    return keywords
+
+async def run_sharded(scraper, crawl, args, keywords):
+    """โหมดหลาย process: วางแผน shard (หรือใช้แผนเดิม) รัน แล้วรวมผลไว้ใน scraper"""
+    only = None
+    if crawl is None:
+        crawl = ShardedCrawl(shards=args.shards, options={
+            'concurrency': args.concurrency,
+            'per_host_limit': args.per_host,
+            'delay': args.delay,
+            'fast_mode': args.fast,
+            'http_mode': args.http,
+            'headless': args.headless,
+            'adaptive': args.adaptive,
+            'max_concurrency': args.max_concurrency,
+            'retries': args.retries,
+            'cache_path': args.cache
+        })
+        if args.shard_by == 'url':
+            crawl.plan_urls(keywords, await scraper.collect_programs(keywords))
+        else:
+            crawl.plan_keywords(keywords)
+    else:
+        only = crawl.failed_shards()
+    
+    await asyncio.to_thread(crawl.run, only)
+    scraper.programs_data = crawl.merge()
+    for shard in crawl.manifest['shards']:
+        path = os.path.join(crawl.dir, f"shard-{shard['id']}", 'metrics.json')
+        if os.path.exists(path):
+            scraper.metrics.merge(ScrapeMetrics.load(path))
+    if scraper.parquet is not None:
+        for row in scraper.programs_data:
+            scraper.parquet.append(row)
+    return len(scraper.programs_data)
+
+async def main():
+    """ฟังก์ชันหลัก"""
+    args = parse_args()
+    
+    selectors = SelectorRegistry(args.selector_stats)
+    if args.selector_report:
+        selectors.print_report()
+        return
+    
+    print("🎯 Enhanced TCAS Scraper")
+    print("📚 ปรับปรุงจากตัวอย่างที่ให้มา")
+    print("="*50)
+    
+    journal = None
+    crawl = None
+    if args.rerun_failed:
+        crawl = ShardedCrawl(args.rerun_failed)
+        if not crawl.manifest['shards']:
+            print(f"❌ ไม่พบ run: {args.rerun_failed}")
+            return
+        keywords = list(dict.fromkeys(k for shard in crawl.manifest['shards'] for k in shard['keywords']))
+        print(f"🧩 รัน shard ที่ล้มเหลวของ run {crawl.run_id}: {crawl.failed_shards()}")
+    elif args.resume:
+        if not RunJournal.exists(args.resume):
+            print(f"❌ ไม่พบ run: {args.resume}")
+            return
+        journal = RunJournal(args.resume)
+        keywords = journal.load_meta().get('keywords', [])
+        print(f"⏯️ ทำต่อจาก run {journal.run_id} (ดึงเสร็จแล้ว {journal.row_count} รายการ)")
+    else:
+        keywords = choose_keywords()
+        if args.journal and args.shards <= 1:
+            journal = RunJournal()
+            journal.save_meta(keywords=keywords, created_at=datetime.now().isoformat())
+            print(f"📝 บันทึก run: {journal.run_id}")
+    
     print(f"🎯 จะค้นหา: {', '.join(keywords)}")
     print("="*50)
     
-    scraper = EnhancedTCASScraper()
+    formats = {f.strip() for f in args.formats.split(',') if f.strip()}
+    parquet = None
+    if 'parquet' in formats:
+        if pq is None:
+            print("⚠️ ไม่พบ pyarrow - ข้ามการบันทึก Parquet")
+        else:
+            parquet = ParquetRowWriter(args.parquet_dir)
+    
+    cache = None
+    if args.cache:
+        cache = PageCache(args.cache, ttl=args.cache_ttl * 3600, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    
+    scraper = EnhancedTCASScraper(
+        concurrency=args.concurrency,
+        per_host_limit=args.per_host,
+        delay=args.delay,
+        fast_mode=args.fast,
+        http_mode=args.http,
+        cache=cache,
+        journal=journal,
+        selectors=selectors,
+        pipeline=args.pipeline,
+        queue_size=args.queue_size,
+        parquet=parquet,
+        adaptive=args.adaptive,
+        max_concurrency=args.max_concurrency,
+        retries=args.retries,
+        metrics=ScrapeMetrics(progress=args.progress),
+        headless=args.headless
+    )
+    if parquet is not None and args.resume:
+        # แถวที่ดึงไว้ก่อนหยุด - Parquet ของรอบที่ทำต่อจึงมีครบทุกแถวเหมือน CSV/Excel
+        for row in scraper.collected_rows():
+            parquet.append(row)
     
     try:
         # เริ่มการ scraping
-        found_count = await scraper.run_scraping(keywords)
+        if crawl is not None or args.shards > 1:
+            found_count = await run_sharded(scraper, crawl, args, keywords)
+        else:
+            found_count = await scraper.run_scraping(keywords)
         
         if found_count > 0:
             print(f"\n🎉 เสร็จสิ้น! ดึงข้อมูลได้ {found_count} หลักสูตร")
             
-            # บันทึกข้อมูล
-            df = scraper.save_to_excel()
-            scraper.save_to_csv()  # สำรอง
+            # บันทึกข้อมูล (Parquet เขียนไปแล้วระหว่าง scrape - ปิดไฟล์และแก้คำค้น)
+            df = None
+            if parquet is not None:
+                for path in parquet.close(scraper.keyword_updates()):
+                    print(f"\n💾 บันทึก Parquet: {path}")
+                print(f"📊 จำนวนข้อมูล: {parquet.rows_written} รายการ")
+            if 'excel' in formats:
+                df = scraper.save_to_excel(explode_keywords=args.explode_keywords)
+            if 'csv' in formats:
+                csv_df = scraper.save_to_csv(explode_keywords=args.explode_keywords)  # สำรอง
+                df = df if df is not None else csv_df
+            if df is None:
+                df = scraper.to_dataframe()
             
             print("\n✅ ไฟล์พร้อมใช้งาน!")
             
@@ -345,15 +2370,49 @@ async def main():
                 print(f"   📚 จำนวนหลักสูตรทั้งหมด: {len(df)}")
                 print(f"   🏫 จำนวนมหาวิทยาลัย: {df['มหาวิทยาลัย'].nunique()}")
                 print(f"   💰 มีข้อมูลค่าใช้จ่าย: {len(df[df['ค่าใช้จ่าย'] != 'ไม่พบข้อมูล'])}")
+            
+            if args.snapshots and df is not None and len(df) > 0:
+                # import เฉพาะเมื่อใช้ - snapshot_store ดึง dashboard_data (ฝั่งแดชบอร์ด) มาด้วย
+                from snapshot_store import SnapshotStore
+                snapshots = SnapshotStore(args.snapshots)
+                try:
+                    run = snapshots.ingest(df, source='scrap.py')
+                    if run is not None:
+                        print(f"🕰️ บันทึกประวัติ: เปลี่ยน {run['changed']} จาก {run['rows']} หลักสูตร ({args.snapshots})")
+                except ValueError as e:
+                    print(f"⚠️ ข้ามการบันทึกประวัติ: {str(e)}")
+                finally:
+                    snapshots.close()
         else:
             print("\n❌ ไม่มีข้อมูลที่ดึงได้")
     
-    except KeyboardInterrupt:
+    except CircuitOpenError as e:
+        print(f"\n🛑 หยุดการทำงาน: {str(e)} - เว็บอาจจำกัดการเข้าถึง ลองใหม่ภายหลัง")
+        if journal is not None:
+            print(f"⏯️ ทำต่อได้ด้วย: python scrap.py --resume {journal.run_id}")
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n⏹️ หยุดการทำงานโดยผู้ใช้")
+        if journal is not None:
+            print(f"⏯️ ทำต่อได้ด้วย: python scrap.py --resume {journal.run_id}")
     except Exception as e:
         print(f"\n❌ เกิดข้อผิดพลาด: {str(e)}")
         import traceback
         print(f"📋 รายละเอียด: {traceback.format_exc()}")
+        if journal is not None:
+            print(f"⏯️ ทำต่อได้ด้วย: python scrap.py --resume {journal.run_id}")
+    finally:
+        if args.metrics:
+            for path in scraper.metrics.save(args.metrics):
+                print(f"📈 บันทึก metrics: {path}")
+        if parquet is not None:
+            # หยุดกลางทาง: ปิดไฟล์ให้อ่านได้ แถวที่ดึงได้แล้วจึงไม่หาย
+            published = len(parquet.paths)
+            for path in parquet.close(scraper.keyword_updates())[published:]:
+                print(f"💾 บันทึก Parquet (บางส่วน): {path}")
+        if cache is not None:
+            cache.close()
+        if journal is not None:
+            journal.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
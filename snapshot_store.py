@@ -0,0 +1,227 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import pandas as pd
+from dashboard_data import PARTITION_COLUMNS, open_source
+from fee_normalizer import FEE_ANNUAL, normalize_fees
+
+# ฐานข้อมูลประวัติ (ตั้งค่าผ่าน environment variable ได้ - แดชบอร์ดใช้ค่านี้)
+SNAPSHOT_DB_ENV = 'TCAS_SNAPSHOT_DB'
+DEFAULT_SNAPSHOT_DB = 'tcas_snapshots.sqlite'
+
+# หลักสูตรหนึ่งระบุด้วยลิงก์ของหน้ารายละเอียด
+KEY_COLUMN = 'ลิงก์'
+DATE_COLUMN = 'วันที่เก็บข้อมูล'
+FEE_COLUMN = 'ค่าใช้จ่าย'
+# ไม่นับเป็นการเปลี่ยนแปลงของหลักสูตร: เวลาที่เก็บ และคำค้นที่ค้นเจอ (ขึ้นกับคำค้นของแต่ละรอบ)
+IGNORED_COLUMNS = [DATE_COLUMN, 'คำค้น'] + PARTITION_COLUMNS
+
+
+class SnapshotStore:
+    """ประวัติข้อมูลหลักสูตรจากการ scrape หลายรอบ (SQLite) ใช้ลิงก์เป็น key
+    เก็บเฉพาะแถวที่เปลี่ยนจากรอบก่อน ขนาดและเวลาค้นหาจึงโตตามจำนวนการเปลี่ยนแปลง ไม่ใช่จำนวนรอบ"""
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_DB):
+        self.path = path
+        # แดชบอร์ดเรียกจากหลาย thread - ใช้ connection เดียวคู่กับ lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL,
+                scraped_at TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                changed INTEGER NOT NULL,
+                UNIQUE (source, scraped_at)
+            );
+            CREATE TABLE IF NOT EXISTS versions (
+                url TEXT NOT NULL,
+                valid_from TEXT NOT NULL,
+                run_id INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                name TEXT,
+                university TEXT,
+                fee TEXT,
+                fee_annual REAL,
+                previous_fee TEXT,
+                previous_fee_annual REAL,
+                fee_changed INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (url, valid_from)
+            );
+            CREATE INDEX IF NOT EXISTS idx_versions_fee_changed ON versions (fee_changed, valid_from);
+            CREATE TABLE IF NOT EXISTS latest (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                fee TEXT,
+                fee_annual REAL,
+                valid_from TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def ingest(self, df, source, scraped_at=None):
+        """นำเข้าผลการ scrape หนึ่งรอบ - เทียบกับสถานะล่าสุดของแต่ละลิงก์แล้วเก็บเฉพาะแถวที่เปลี่ยน
+        คืน dict สรุปรอบ หรือ None ถ้ารอบนี้เคยนำเข้าแล้ว"""
+        df = df.dropna(subset=[KEY_COLUMN]).drop_duplicates(KEY_COLUMN, keep='last')
+        if FEE_COLUMN in df.columns:
+            # แปลงค่าใช้จ่ายใหม่ทุกครั้ง - ไฟล์จาก scrap.py รุ่นเก่าอาจไม่มีหรือแปลงไม่เหมือนกัน
+            df = normalize_fees(df)
+        scraped_at = scraped_at or _run_time(df)
+        columns = [c for c in df.columns if c not in IGNORED_COLUMNS]
+
+        with self._lock:
+            if self.conn.execute(
+                "SELECT 1 FROM runs WHERE source = ? AND scraped_at = ?", (source, scraped_at)
+            ).fetchone():
+                return None
+            last_run = self.conn.execute("SELECT MAX(scraped_at) FROM runs").fetchone()[0]
+            if last_run is not None and scraped_at < last_run:
+                raise ValueError(f"รอบ {scraped_at} เก่ากว่ารอบล่าสุดที่นำเข้าแล้ว ({last_run}) - ต้องนำเข้าตามลำดับเวลา")
+
+            latest = {
+                url: (content_hash, fee, fee_annual)
+                for url, content_hash, fee, fee_annual in self.conn.execute(
+                    "SELECT url, content_hash, fee, fee_annual FROM latest"
+                )
+            }
+            cursor = self.conn.execute(
+                "INSERT INTO runs (source, scraped_at, rows, changed) VALUES (?, ?, ?, 0)",
+                (source, scraped_at, len(df))
+            )
+            run_id = cursor.lastrowid
+
+            versions = []
+            for record in df[columns].astype('object').where(df[columns].notna(), None).to_dict('records'):
+                data = json.dumps(record, ensure_ascii=False, sort_keys=True, default=str)
+                content_hash = hashlib.sha256(data.encode('utf-8')).hexdigest()
+                url = record[KEY_COLUMN]
+                previous = latest.get(url)
+                if previous is not None and previous[0] == content_hash:
+                    continue
+
+                fee = record.get(FEE_COLUMN)
+                fee_annual = _to_float(record.get(FEE_ANNUAL))
+                fee_changed = previous is not None and (previous[1] != fee or previous[2] != fee_annual)
+                versions.append((
+                    url, scraped_at, run_id, content_hash,
+                    record.get('ชื่อหลักสูตร'), record.get('มหาวิทยาลัย'),
+                    fee, fee_annual,
+                    previous[1] if previous else None, previous[2] if previous else None,
+                    int(fee_changed), data
+                ))
+
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO versions
+                   (url, valid_from, run_id, content_hash, name, university, fee, fee_annual,
+                    previous_fee, previous_fee_annual, fee_changed, data)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                versions
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO latest (url, content_hash, fee, fee_annual, valid_from) VALUES (?, ?, ?, ?, ?)",
+                [(v[0], v[3], v[6], v[7], v[1]) for v in versions]
+            )
+            self.conn.execute("UPDATE runs SET changed = ? WHERE run_id = ?", (len(versions), run_id))
+            self.conn.commit()
+        return {'run_id': run_id, 'scraped_at': scraped_at, 'rows': len(df), 'changed': len(versions)}
+
+    def fee_history(self, url):
+        """ค่าใช้จ่ายของหลักสูตรทุกครั้งที่ข้อมูลเปลี่ยน เรียงตามเวลา (valid_from, name, university, fee, fee_annual)"""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT valid_from, name, university, fee, fee_annual FROM versions WHERE url = ? ORDER BY valid_from",
+                self.conn, params=(url,)
+            )
+
+    def fee_changes_since(self, since):
+        """หลักสูตรที่ค่าใช้จ่ายเปลี่ยนตั้งแต่วันที่ since (ข้อความ YYYY-MM-DD หรือ datetime) ล่าสุดก่อน"""
+        since = pd.Timestamp(since).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            return pd.read_sql_query(
+                """SELECT url, name, university, valid_from, previous_fee, previous_fee_annual, fee, fee_annual
+                   FROM versions WHERE fee_changed = 1 AND valid_from >= ?
+                   ORDER BY valid_from DESC""",
+                self.conn, params=(since,)
+            )
+
+    def programs(self):
+        """หลักสูตรทั้งหมดที่เคยพบ พร้อมชื่อและมหาวิทยาลัยล่าสุด"""
+        with self._lock:
+            return pd.read_sql_query(
+                """SELECT v.url, v.name, v.university FROM latest l
+                   JOIN versions v ON v.url = l.url AND v.valid_from = l.valid_from
+                   ORDER BY v.university, v.name""",
+                self.conn
+            )
+
+    def runs(self):
+        """รอบที่นำเข้าแล้ว พร้อมจำนวนแถวและจำนวนแถวที่เปลี่ยน"""
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM runs ORDER BY scraped_at", self.conn)
+
+    def close(self):
+        self.conn.close()
+
+
+def ingest_path(store, path):
+    """นำเข้าไฟล์ผลลัพธ์ของ scrap.py (CSV/Parquet/Arrow) - โฟลเดอร์ Parquet แบ่งตามวันที่นำเข้าวันละรอบ"""
+    df = open_source(path, memory_map=False).read()
+    if os.path.isdir(path):
+        days = pd.to_datetime(df[DATE_COLUMN]).dt.strftime('%Y-%m-%d')
+        groups = [group for _, group in df.groupby(days, sort=True)]
+    else:
+        groups = [df]
+    return [store.ingest(group, source=os.path.abspath(path)) for group in groups]
+
+
+def _run_time(df):
+    """เวลาของรอบ: เวลาเก็บข้อมูลแถวแรกของรอบ"""
+    return pd.to_datetime(df[DATE_COLUMN]).min().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _to_float(value):
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ประวัติข้อมูลหลักสูตรจากการ scrape หลายรอบ")
+    parser.add_argument("--db", default=os.environ.get(SNAPSHOT_DB_ENV, DEFAULT_SNAPSHOT_DB),
+                        help="ไฟล์ฐานข้อมูลประวัติ (ค่าเริ่มต้น tcas_snapshots.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="นำเข้าไฟล์ผลลัพธ์ของ scrap.py (เรียงตามเวลา)")
+    ingest.add_argument("paths", nargs="+")
+    history = commands.add_parser("history", help="ประวัติค่าใช้จ่ายของหลักสูตร")
+    history.add_argument("url")
+    changed = commands.add_parser("changed", help="หลักสูตรที่ค่าใช้จ่ายเปลี่ยนตั้งแต่วันที่กำหนด")
+    changed.add_argument("--since", required=True, help="YYYY-MM-DD")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    store = SnapshotStore(args.db)
+    try:
+        if args.command == "ingest":
+            for path in sorted(args.paths, key=os.path.basename):
+                for run in ingest_path(store, path):
+                    if run is None:
+                        print(f"⏭️ {path}: นำเข้าแล้ว")
+                    else:
+                        print(f"📥 {path} ({run['scraped_at']}): {run['rows']} แถว เปลี่ยน {run['changed']} แถว")
+        elif args.command == "history":
+            print(store.fee_history(args.url).to_string(index=False))
+        else:
+            print(store.fee_changes_since(args.since).to_string(index=False))
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
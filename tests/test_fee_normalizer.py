@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from fee_normalizer import (CONFIDENCE_HIGH, CONFIDENCE_LOW, CONFIDENCE_MEDIUM, CONFIDENCE_NONE, FEE_AMOUNT,
+                            FEE_ANNUAL, FEE_CONFIDENCE, FEE_UNIT, UNIT_PROGRAM, UNIT_SEMESTER, UNIT_YEAR,
+                            normalize_fees)
+
+# (ข้อความค่าใช้จ่าย, จำนวนเงิน, หน่วย, ค่าต่อปี, ความเชื่อมั่น)
+CASES = [
+    ('25,000 บาท/ภาคการศึกษา', 25000, UNIT_SEMESTER, 50000, CONFIDENCE_HIGH),
+    ('ภาคละ 30,000 บาท', 30000, UNIT_SEMESTER, 60000, CONFIDENCE_HIGH),
+    ('30,000 บาท ต่อภาค', 30000, UNIT_SEMESTER, 60000, CONFIDENCE_HIGH),
+    ('เทอมละ 18,500 บาท', 18500, UNIT_SEMESTER, 37000, CONFIDENCE_HIGH),
+    ('ปีละ 120,000 บาท', 120000, UNIT_YEAR, 120000, CONFIDENCE_HIGH),
+    ('Tuition 90,000 baht per year', 90000, UNIT_YEAR, 90000, CONFIDENCE_HIGH),
+    ('ตลอดหลักสูตร 400,000 บาท', 400000, UNIT_PROGRAM, 100000, CONFIDENCE_HIGH),
+    ('เหมาจ่าย 160,000 บาท', 160000, UNIT_PROGRAM, 40000, CONFIDENCE_HIGH),
+    ('เหมาจ่ายภาคการศึกษาละ 20,000 บาท', 20000, UNIT_SEMESTER, 40000, CONFIDENCE_HIGH),
+    ('21,000 บาท', 21000, None, 42000, CONFIDENCE_MEDIUM),
+    ('20,000 - 25,000 บาท/ภาคการศึกษา', 25000, UNIT_SEMESTER, 50000, CONFIDENCE_MEDIUM),
+    ('ภาคการศึกษาละ 25000', 25000, UNIT_SEMESTER, 50000, CONFIDENCE_LOW),
+    ('ค่าเทอม 2,567', 2567, UNIT_SEMESTER, 5134, CONFIDENCE_LOW),
+    ('ปีการศึกษา 2567 ภาคการศึกษาละ 25000', 25000, UNIT_SEMESTER, 50000, CONFIDENCE_LOW),
+    ('2567', None, None, None, CONFIDENCE_NONE),
+    ('ไม่พบข้อมูล', None, None, None, CONFIDENCE_NONE),
+    (None, None, None, None, CONFIDENCE_NONE),
+]
+
+
+@pytest.fixture(scope='module')
+def normalized():
+    return normalize_fees(pd.DataFrame({'ค่าใช้จ่าย': [case[0] for case in CASES]}))
+
+
+@pytest.mark.parametrize('i', range(len(CASES)), ids=[str(case[0]) for case in CASES])
+def test_normalize_fees(normalized, i):
+    _, amount, unit, annual, confidence = CASES[i]
+    row = normalized.iloc[i]
+    assert (None if pd.isna(row[FEE_AMOUNT]) else row[FEE_AMOUNT]) == amount
+    assert (None if pd.isna(row[FEE_UNIT]) else row[FEE_UNIT]) == unit
+    assert (None if pd.isna(row[FEE_ANNUAL]) else row[FEE_ANNUAL]) == annual
+    assert row[FEE_CONFIDENCE] == confidence
+
+
+def test_normalize_fees_keeps_input_columns():
+    df = pd.DataFrame({'ค่าใช้จ่าย': ['ปีละ 1,000 บาท'], 'ลิงก์': ['https://a']})
+    result = normalize_fees(df)
+    assert list(result.columns[:2]) == ['ค่าใช้จ่าย', 'ลิงก์']
+    assert FEE_ANNUAL not in df.columns
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+from dashboard_data import TableQuery, open_directory
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+@pytest.fixture
+def directory(tmp_path):
+    """ผลจาก scrap.py สองรอบ: CSV (วันที่เป็นข้อความ) และ Parquet (timestamp + dictionary)"""
+    pd.DataFrame({
+        'ลิงก์': ['https://a', 'https://b'],
+        'วันที่เก็บข้อมูล': ['2025-01-01 10:00:00', '2025-01-01 10:00:00'],
+        'มหาวิทยาลัย': ['มหิดล', 'เกษตรศาสตร์'],
+    }).to_csv(tmp_path / 'enhanced_tcas_data_20250101_100000.csv', index=False, encoding='utf-8-sig')
+    partition = tmp_path / 'tcas_parquet' / 'scrape_date=2025-01-02'
+    partition.mkdir(parents=True)
+    pq.write_table(pa.table({
+        'ลิงก์': ['https://c', 'https://d'],
+        'วันที่เก็บข้อมูล': pa.array(pd.to_datetime(['2025-01-02 10:00:00'] * 2).to_pydatetime(), type=pa.timestamp('s')),
+        'มหาวิทยาลัย': pa.array(['มหิดล', 'จุฬาลงกรณ์']).dictionary_encode(),
+    }), partition / 'enhanced_tcas_data_20250102_100000.parquet')
+    return tmp_path
+
+
+def test_mixed_formats_share_one_date_dtype(directory):
+    source = open_directory(str(directory))
+    df = source.read(['วันที่เก็บข้อมูล', 'มหาวิทยาลัย'])
+    assert pd.api.types.is_datetime64_any_dtype(df['วันที่เก็บข้อมูล'])
+    assert sorted(df['มหาวิทยาลัย'].astype(str)) == ['จุฬาลงกรณ์', 'มหิดล', 'มหิดล', 'เกษตรศาสตร์']
+
+
+def test_mixed_formats_sort_by_date(directory):
+    sort_by = [{'column_id': 'วันที่เก็บข้อมูล', 'direction': 'desc'}]
+    rows, total = TableQuery().page(open_directory(str(directory)), 0, 10, sort_by, '')
+    assert total == 4
+    assert [row['ลิงก์'] for row in rows][:2] == ['https://c', 'https://d']
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+from dashboard_data import TableQuery, open_source, parse_filter_query
+
+
+@pytest.fixture
+def source(tmp_path):
+    """CSV ที่มีค่าว่างในคอลัมน์ข้อความ หมวดหมู่ และตัวเลข"""
+    path = tmp_path / 'enhanced_tcas_data_20250101_000000.csv'
+    pd.DataFrame({
+        'มหาวิทยาลัย': ['มหิดล', 'มหิดล', None, 'จุฬาลงกรณ์', 'มหิดล'],
+        'ค่าใช้จ่าย_หน่วย': ['ปี', None, 'ปี', 'ปี', 'ภาคการศึกษา'],
+        'ค่าใช้จ่าย_ต่อปี': [50000.0, None, 40000.0, 60000.0, 30000.0],
+    }).to_csv(path, index=False, encoding='utf-8-sig')
+    return open_source(str(path))
+
+
+def test_parse_filter_query():
+    assert parse_filter_query('{มหาวิทยาลัย} icontains มหิดล && {ค่าใช้จ่าย_ต่อปี} >= 50000 && {x} = "1"') == [
+        ('มหาวิทยาลัย', 'contains', 'มหิดล', False),
+        ('ค่าใช้จ่าย_ต่อปี', 'ge', 50000.0, True),
+        ('x', 'eq', '1', True),
+    ]
+
+
+@pytest.mark.parametrize('filter_query, expected', [
+    ('{มหาวิทยาลัย} icontains มหิดล && {ค่าใช้จ่าย_หน่วย} = ปี', [0]),
+    ('{มหาวิทยาลัย} != จุฬาลงกรณ์ && {ค่าใช้จ่าย_หน่วย} contains ปี', [0]),
+    ('{ค่าใช้จ่าย_ต่อปี} >= 40000 && {มหาวิทยาลัย} icontains มหิดล', [0]),
+    ('{ค่าใช้จ่าย_หน่วย} = ปี && {ค่าใช้จ่าย_ต่อปี} < 65000 && {มหาวิทยาลัย} != มหิดล', [3]),
+    ('{ค่าใช้จ่าย_ต่อปี} > 0 && {ค่าใช้จ่าย_หน่วย} != ปี', [4]),
+])
+def test_order_combines_clauses_over_missing_values(source, filter_query, expected):
+    assert TableQuery()._order(source, [], filter_query).tolist() == expected
+
+
+def test_page_sorts_filtered_rows(source):
+    sort_by = [{'column_id': 'ค่าใช้จ่าย_ต่อปี', 'direction': 'desc'}]
+    rows, total = TableQuery().page(source, 0, 10, sort_by, '{มหาวิทยาลัย} icontains มหิดล && {ค่าใช้จ่าย_ต่อปี} > 0')
+    assert total == 2
+    assert [row['ค่าใช้จ่าย_ต่อปี'] for row in rows] == [50000.0, 30000.0]
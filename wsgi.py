@@ -0,0 +1,23 @@
+"""จุดเริ่มสำหรับรันแดชบอร์ดบน WSGI server แบบหลาย worker เช่น
+
+    gunicorn -w 4 -b 0.0.0.0:8051 --preload wsgi:server
+
+แปลงข้อมูล (TCAS_DATA_PATH) เป็นไฟล์ Arrow IPC ไม่บีบอัดพร้อมผลสรุป top-N ครั้งเดียว
+ทุก worker memory-map ไฟล์เดียวกัน - ข้อมูลอยู่ใน page cache ของระบบชุดเดียว ไม่ได้คัดลอกไปทุก process
+"""
+import os
+from dashboard_data import DATA_PATH_ENV, MEMORY_MAP_ENV, WATCH_DIR_ENV, prepare_shared
+
+# ไฟล์ข้อมูลร่วม (TCAS_SHARED_PATH ค่าเริ่มต้น tcas_shared.arrow) - สร้างใหม่เมื่อข้อมูลต้นทางเปลี่ยน
+os.environ[DATA_PATH_ENV] = prepare_shared()
+os.environ[MEMORY_MAP_ENV] = '1'
+# แต่ละ worker มีสำเนาข้อมูลของตัวเองถ้าใช้ DataWatcher - โหมดนี้อัปเดตข้อมูลด้วยการ reload worker
+os.environ.pop(WATCH_DIR_ENV, None)
+
+from dashboard import app, server
+
+# server คือ WSGI application ที่ gunicorn โหลด (wsgi:server)
+__all__ = ['app', 'server']
+
+if __name__ == '__main__':
+    app.run(port=8051)